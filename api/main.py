@@ -1,28 +1,29 @@
+import asyncio
 import os
 import sys
-from fastapi import FastAPI, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import BaseModel
 import uuid
-import shutil
-from typing import Optional, List
+from typing import AsyncIterator, Iterator, Optional, List, Tuple
 
 # Add the parent directory to the Python path
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
 sys.path.insert(0, parent_dir)
 
-# Try to import TTSAgent, but handle import errors for optional dependencies
+from src.config import Config
+from src.output.store import create_audio_store
+
+# Try to import the agent registry, but handle import errors for optional dependencies
 try:
-    from src.agent import TTSAgent
+    from src.registry import AgentRegistry
     has_tts_agent = True
 except ImportError as e:
     print(f"Warning: TTSAgent import failed: {e}")
     print("Some TTS services may not be available.")
     has_tts_agent = False
 
-from src.config import Config
-
 # Create FastAPI app
 app = FastAPI(
     title="English-Japanese TTS API",
@@ -37,11 +38,24 @@ class TTSRequest(BaseModel):
     english_voice_id: str = "Joanna"  # Default English voice
     japanese_voice_id: str = "Mizuki"  # Default Japanese voice
     audio_format: str = "wav"  # Default format
+    sample_rate: Optional[int] = None  # Output sample rate in Hz (default: 16000)
 
 class TTSResponse(BaseModel):
     audio_url: str
     segments: List[str]
     request_id: str
+    cache_hit: bool = False  # True if the audio was served from the render cache
+
+class DocumentResponse(BaseModel):
+    audio_url: str
+    segments: List[str]
+    request_id: str
+    reused_segments: int  # Segments whose audio was kept from the previous revision
+
+class TextSynthesisResponse(BaseModel):
+    audio_url: str
+    segment_count: int  # Language segments synthesized
+    request_id: str
 
 class VoiceInfo(BaseModel):
     id: str
@@ -53,39 +67,105 @@ class VoicesResponse(BaseModel):
     voices: List[VoiceInfo]
 
 # Setup
+# Default directory of the disk audio store (TTS_AUDIO_STORE=disk)
 TEMP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "temp")
-os.makedirs(TEMP_DIR, exist_ok=True)
+
+# Generated audio waiting to be fetched; kept in memory by default
+config = Config()
+audio_store = create_audio_store(config, TEMP_DIR)
 
 # Available voices
 AWS_POLLY_ENGLISH_VOICES = ["Matthew", "Joanna", "Kimberly", "Salli", "Joey"]
 AWS_POLLY_JAPANESE_VOICES = ["Takumi", "Mizuki", "Kazuha"]
 GOOGLE_CLOUD_ENGLISH_VOICES = ["en-US-Standard-A", "en-US-Standard-B", "en-US-Standard-C"]
 GOOGLE_CLOUD_JAPANESE_VOICES = ["ja-JP-Standard-A", "ja-JP-Standard-B", "ja-JP-Standard-C"]
+LOCAL_SYNTHETIC_ENGLISH_VOICES = ["synthetic-en-1", "synthetic-en-2"]
+LOCAL_SYNTHETIC_JAPANESE_VOICES = ["synthetic-ja-1", "synthetic-ja-2"]
+
+# Output sample rates clients can request (audio is resampled from the provider's native rate)
+SUPPORTED_SAMPLE_RATES = [8000, 16000, 22050, 24000, 44100, 48000]
+
+# Audio URLs contain a unique request ID, so in cacheable mode their content never changes
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+NO_CACHE_CONTROL = "no-cache, no-store, must-revalidate"
+
+# Long-lived agents (and provider clients) shared by all requests in this process
+agent_registry = AgentRegistry() if has_tts_agent else None
+
+def check_sample_rate(sample_rate: Optional[int]):
+    """Reject output sample rates the service does not offer."""
+    if sample_rate is not None and sample_rate not in SUPPORTED_SAMPLE_RATES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported sample rate {sample_rate}; choose one of {SUPPORTED_SAMPLE_RATES}"
+        )
+
+async def purge_expired_audio(interval_seconds: float):
+    """Periodically remove expired audio from the audio store."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await asyncio.to_thread(audio_store.purge_expired)
+        except Exception as e:
+            print(f"Error purging expired audio: {e}")
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Return True if an If-None-Match header value names etag (weak comparison)."""
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in tags)
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single-range Range header into inclusive (start, end) byte offsets.
+
+    Returns None (serve the whole file) if there is no usable range: a missing header,
+    another unit, or several ranges.
+
+    Raises:
+        HTTPException: 416 if the range lies outside the file.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_text, _, end_text = header[len("bytes="):].strip().partition("-")
+    try:
+        if start_text:
+            start = int(start_text)
+            end = min(int(end_text), size - 1) if end_text else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start, end = max(0, size - int(end_text)), size - 1
+    except ValueError:
+        return None
+    if start < 0 or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+def iter_body(body: AsyncIterator[bytes], loop: asyncio.AbstractEventLoop) -> Iterator[bytes]:
+    """Read a request body from a worker thread, one chunk at a time as it arrives on the event loop."""
+    async def next_chunk() -> bytes:
+        return await body.__anext__()
 
-# Helper function to create config
-def create_config(tts_service: str, english_voice_id: str, 
-                 japanese_voice_id: str) -> Config:
-    """Create a Config object based on user selections."""
-    config = Config()
-    config.tts_service = tts_service
-    config.english_voice_id = english_voice_id
-    config.japanese_voice_id = japanese_voice_id
-    return config
-
-# Helper function to clean up old files
-def cleanup_old_files(directory: str, max_age_minutes: int = 5):
-    """Remove files older than max_age_minutes from directory."""
-    import time
-    now = time.time()
-    for filename in os.listdir(directory):
-        file_path = os.path.join(directory, filename)
-        if os.path.isdir(file_path):
-            try:
-                # Check if directory is older than max_age_minutes
-                if os.stat(file_path).st_mtime < now - max_age_minutes * 60:
-                    shutil.rmtree(file_path, ignore_errors=True)
-            except Exception as e:
-                print(f"Error deleting directory {file_path}: {e}")
+    while True:
+        try:
+            yield asyncio.run_coroutine_threadsafe(next_chunk(), loop).result()
+        except StopAsyncIteration:
+            return
+
+def iter_file(path: str, start: int, length: int, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """Yield length bytes of a file from offset start."""
+    with open(path, "rb") as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
 
 # Routes
 @app.get("/")
@@ -96,6 +176,28 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/stats")
+async def get_stats():
+    """Get synthesis cache, request coalescing, retry, encoder, render cache, part cache and document session counters for each
+    TTS service used by this process, and the audio store's size and eviction counters"""
+    stats = {"audio_store": audio_store.stats()}
+    if not has_tts_agent:
+        return stats
+    stats.update({
+        service: {
+            "cache": agent.speech_service.cache_stats(),
+            "single_flight": agent.speech_service.single_flight_stats(),
+            "retries": agent.speech_service.retry_stats(),
+            # The encoder pool is shared by all services in the process
+            "encoder": agent.encoder_pool.stats(),
+            "render_cache": agent.render_cache.stats() if agent.render_cache else None,
+            "part_cache": agent.part_cache.stats() if agent.part_cache else None,
+            "document_sessions": agent.document_sessions.stats() if agent.document_sessions else None
+        }
+        for service, agent in agent_registry.agents().items()
+    })
+    return stats
+
 @app.get("/voices", response_model=VoicesResponse)
 async def get_voices():
     """Get available voices for all services"""
@@ -134,10 +236,17 @@ async def get_voices():
             gender = "female" if voice.endswith("A") or voice.endswith("C") else "male"
             voices.append(VoiceInfo(id=voice, language="ja-JP", gender=gender, service="google_cloud"))
     
+    # Add the offline synthetic voices (tones, for load testing) only when explicitly enabled
+    if os.getenv("TTS_SERVICE") == "local_synthetic":
+        for voice in LOCAL_SYNTHETIC_ENGLISH_VOICES:
+            voices.append(VoiceInfo(id=voice, language="en-US", service="local_synthetic"))
+        for voice in LOCAL_SYNTHETIC_JAPANESE_VOICES:
+            voices.append(VoiceInfo(id=voice, language="ja-JP", service="local_synthetic"))
+    
     return VoicesResponse(voices=voices)
 
 @app.post("/synthesize", response_model=TTSResponse)
-async def synthesize_speech(request: TTSRequest, background_tasks: BackgroundTasks):
+async def synthesize_speech(request: TTSRequest):
     """
     Synthesize text to speech
     
@@ -151,80 +260,249 @@ async def synthesize_speech(request: TTSRequest, background_tasks: BackgroundTas
             detail="TTS services are not available. Required dependencies may be missing."
         )
     
+    check_sample_rate(request.sample_rate)
+    
     # Generate a unique ID for this request
     request_id = str(uuid.uuid4())
-    
-    # Create output directory if it doesn't exist
-    output_dir = os.path.join(TEMP_DIR, request_id)
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # Generate output path
-    output_path = os.path.join(output_dir, f"output.{request.audio_format}")
+    filename = f"output.{request.audio_format}"
     
     try:
-        # Create config and initialize agent
-        config = create_config(
-            request.tts_service, 
-            request.english_voice_id,
-            request.japanese_voice_id
-        )
-        agent = TTSAgent(config)
+        # Reuse the agent for this service; building one the first time creates
+        # provider clients, so keep it off the event loop
+        agent = await asyncio.to_thread(agent_registry.get, request.tts_service)
         
-        # Synthesize audio
-        audio_path, segments = agent.synthesize(request.text, output_path)
-        
-        # Schedule cleanup of old files
-        background_tasks.add_task(cleanup_old_files, TEMP_DIR)
+        # Synthesize audio straight into the audio store, without blocking other
+        # requests on this worker; nothing is stored if synthesis fails
+        async with audio_store.awriter(request_id, filename) as output:
+            result = await agent.asynthesize(
+                request.text,
+                output,
+                english_voice_id=request.english_voice_id,
+                japanese_voice_id=request.japanese_voice_id,
+                audio_format=request.audio_format,
+                sample_rate=request.sample_rate
+            )
         
         # Generate URL for the audio file
-        audio_url = f"/audio/{request_id}/output.{request.audio_format}"
+        audio_url = f"/audio/{request_id}/{filename}"
         
         return TTSResponse(
             audio_url=audio_url,
-            segments=segments,
+            segments=result[1],
+            request_id=request_id,
+            cache_hit=result.cache_hit
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.put("/documents/{document_id}", response_model=DocumentResponse)
+async def synthesize_document(document_id: str, request: TTSRequest):
+    """
+    Synthesize a revision of a document
+    
+    - Segments unchanged since the document's previous revision reuse their audio, so
+      re-rendering after a small edit only synthesizes the edited segments
+    - Returns a URL to the generated audio file, like /synthesize
+    """
+    if not has_tts_agent:
+        raise HTTPException(
+            status_code=503, 
+            detail="TTS services are not available. Required dependencies may be missing."
+        )
+    check_sample_rate(request.sample_rate)
+    
+    request_id = str(uuid.uuid4())
+    filename = f"output.{request.audio_format}"
+    
+    try:
+        agent = await asyncio.to_thread(agent_registry.get, request.tts_service)
+        async with audio_store.awriter(request_id, filename) as output:
+            result = await asyncio.to_thread(
+                agent.synthesize_document,
+                document_id,
+                request.text,
+                output,
+                english_voice_id=request.english_voice_id,
+                japanese_voice_id=request.japanese_voice_id,
+                audio_format=request.audio_format,
+                sample_rate=request.sample_rate
+            )
+        
+        return DocumentResponse(
+            audio_url=f"/audio/{request_id}/{filename}",
+            segments=result[1],
+            request_id=request_id,
+            reused_segments=result.reused_segments
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/documents/{document_id}")
+async def delete_document(document_id: str, tts_service: str = "aws_polly"):
+    """Forget the previous revision of a document"""
+    if not has_tts_agent:
+        raise HTTPException(status_code=404, detail="Document not found")
+    agent = agent_registry.agents().get(tts_service)
+    if agent is None or agent.document_sessions is None or not agent.document_sessions.discard(document_id):
+        raise HTTPException(status_code=404, detail="Document not found")
+    return {"message": f"Document {document_id} deleted successfully"}
+
+@app.post("/synthesize/text", response_model=TextSynthesisResponse)
+async def synthesize_text_body(request: Request, tts_service: str = "aws_polly",
+                               english_voice_id: str = "Joanna", japanese_voice_id: str = "Mizuki",
+                               audio_format: str = "wav", sample_rate: Optional[int] = None):
+    """
+    Synthesize a UTF-8 plain-text request body, for texts too large to send as JSON
+    
+    - The body is read as synthesis progresses and never held in memory as a whole
+    - The audio is written to disk, whichever audio store is configured
+    - Options are query parameters, with the same names and defaults as /synthesize
+    - Returns a URL to the generated audio file and the number of language segments
+    """
+    if not has_tts_agent:
+        raise HTTPException(
+            status_code=503, 
+            detail="TTS services are not available. Required dependencies may be missing."
+        )
+    check_sample_rate(sample_rate)
+    
+    request_id = str(uuid.uuid4())
+    filename = f"output.{audio_format}"
+    
+    try:
+        agent = await asyncio.to_thread(agent_registry.get, tts_service)
+        body = iter_body(request.stream(), asyncio.get_running_loop())
+        async with audio_store.awriter(request_id, filename, disk=True) as output:
+            _, segment_count = await asyncio.to_thread(
+                agent.synthesize_file,
+                body,
+                output,
+                english_voice_id=english_voice_id,
+                japanese_voice_id=japanese_voice_id,
+                audio_format=audio_format,
+                sample_rate=sample_rate
+            )
+        
+        return TextSynthesisResponse(
+            audio_url=f"/audio/{request_id}/{filename}",
+            segment_count=segment_count,
             request_id=request_id
         )
     except Exception as e:
-        # Clean up if there was an error
-        shutil.rmtree(output_dir, ignore_errors=True)
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/audio/{request_id}/{filename}")
-async def get_audio(request_id: str, filename: str, background_tasks: BackgroundTasks):
-    """Serve the generated audio file and delete it after access"""
-    audio_dir = os.path.join(TEMP_DIR, request_id)
-    file_path = os.path.join(audio_dir, filename)
+@app.post("/synthesize/stream")
+async def synthesize_speech_stream(request: TTSRequest):
+    """
+    Synthesize text to speech and stream the audio as it is generated
     
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="Audio file not found")
+    - Returns a WAV stream (chunked transfer) that starts as soon as the first segment is ready
+    - Only the wav audio format is supported
+    """
+    if not has_tts_agent:
+        raise HTTPException(
+            status_code=503, 
+            detail="TTS services are not available. Required dependencies may be missing."
+        )
+    if request.audio_format.lower() != "wav":
+        raise HTTPException(status_code=400, detail="Streaming only supports the wav audio format")
+    check_sample_rate(request.sample_rate)
     
-    # Schedule deletion of the file after it's served
-    background_tasks.add_task(shutil.rmtree, audio_dir, ignore_errors=True)
+    try:
+        agent = await asyncio.to_thread(agent_registry.get, request.tts_service)
+        stream = agent.astream(
+            request.text,
+            english_voice_id=request.english_voice_id,
+            japanese_voice_id=request.japanese_voice_id,
+            sample_rate=request.sample_rate
+        )
+        # Wait for the first chunk so errors before any audio still produce an error response
+        first_chunk = await stream.__anext__()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    async def body():
+        yield first_chunk
+        async for chunk in stream:
+            yield chunk
     
-    return FileResponse(
-        file_path,
+    return StreamingResponse(
+        body(),
+        media_type="audio/wav",
         headers={"Cache-Control": "no-cache, no-store, must-revalidate"}
     )
 
+@app.get("/audio/{request_id}/{filename}")
+async def get_audio(request_id: str, filename: str, request: Request, background_tasks: BackgroundTasks):
+    """
+    Serve the generated audio file
+    
+    - Supports If-None-Match (304) and single byte ranges (206) using an ETag derived from the audio content
+    - By default the file is deleted once it has been served in full; with TTS_AUDIO_CACHEABLE it is
+      served with immutable caching headers and kept until it expires
+    """
+    audio = await asyncio.to_thread(audio_store.get, request_id, filename)
+    if audio is None:
+        raise HTTPException(status_code=404, detail="Audio file not found")
+    
+    headers = {
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if config.audio_cacheable else NO_CACHE_CONTROL,
+        "ETag": audio.etag,
+        "Accept-Ranges": "bytes"
+    }
+    if etag_matches(request.headers.get("if-none-match"), audio.etag):
+        return Response(status_code=304, headers=headers)
+    
+    # If-Range: only honour the range if the client's copy is still current
+    if_range = request.headers.get("if-range")
+    byte_range = None
+    if if_range is None or if_range.strip() == audio.etag:
+        byte_range = parse_range(request.headers.get("range"), audio.size)
+    
+    if byte_range is not None:
+        start, end = byte_range
+        length = end - start + 1
+        headers["Content-Range"] = f"bytes {start}-{end}/{audio.size}"
+        headers["Content-Length"] = str(length)
+        if audio.path is not None:
+            return StreamingResponse(
+                iter_file(audio.path, start, length), status_code=206, media_type=audio.media_type, headers=headers
+            )
+        return Response(audio.data[start:end + 1], status_code=206, media_type=audio.media_type, headers=headers)
+    
+    if not config.audio_cacheable:
+        # Schedule deletion of the file after it's served in full
+        background_tasks.add_task(audio_store.delete, request_id)
+    
+    if audio.path is not None:
+        return FileResponse(audio.path, media_type=audio.media_type, headers=headers)
+    return Response(audio.data, media_type=audio.media_type, headers=headers)
+
 @app.delete("/audio/{request_id}")
 async def delete_audio(request_id: str):
     """Delete audio files for a specific request ID"""
-    audio_dir = os.path.join(TEMP_DIR, request_id)
-    
-    if not os.path.exists(audio_dir):
-        raise HTTPException(status_code=404, detail="Audio directory not found")
-    
     try:
-        shutil.rmtree(audio_dir)
-        return {"message": f"Audio files for request {request_id} deleted successfully"}
+        deleted = audio_store.delete(request_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting audio files: {str(e)}")
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Audio directory not found")
+    return {"message": f"Audio files for request {request_id} deleted successfully"}
 
 # Startup event
 @app.on_event("startup")
 async def startup_event():
-    # Clean up any temporary files from previous runs
-    cleanup_old_files(TEMP_DIR, max_age_minutes=5)
+    # Clean up any expired audio left by previous runs (disk store), then keep purging
+    # periodically instead of after every request
+    audio_store.purge_expired()
+    app.state.purge_task = asyncio.create_task(
+        purge_expired_audio(config.audio_store_purge_interval_seconds)
+    )
+
+# Shutdown event
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.purge_task.cancel()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,229 @@
+"""Benchmarks for the text-to-audio pipeline.
+
+Measures latency percentiles, throughput and peak memory (tracemalloc) of each stage:
+- detect:     LanguageDetector.segment_by_language
+- merge:      OutputManager.merge_segments
+- export:     OutputManager.export_audio (wav)
+- synthesize: TTSAgent.synthesize end to end
+
+on mixed English/Japanese corpora of increasing size (sentence, paragraph, chapter, book).
+The provider is the offline local_synthetic backend with no simulated latency, so the
+numbers reflect this code rather than the network.
+
+Usage:
+    python benchmarks/bench_pipeline.py                    # run, save results, compare to baseline
+    python benchmarks/bench_pipeline.py --update-baseline  # run and record a new baseline
+    python benchmarks/bench_pipeline.py --corpora sentence paragraph
+
+The exit status is 1 if any stage regressed against the baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+# Add the project root to Python path
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.agent import TTSAgent
+from src.config import Config
+
+SAMPLE_TEXTS_DIR = os.path.join(PROJECT_ROOT, "demo", "sample_texts")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, "results.json")
+
+# How many times each corpus is run through each stage
+REPEATS = {"sentence": 50, "paragraph": 20, "chapter": 5, "book": 1}
+
+# Milliseconds of synthetic audio per character of text
+MS_PER_CHAR = 2
+
+
+def build_corpora() -> Dict[str, str]:
+    """Build the benchmark corpora from the demo sample texts."""
+    paragraph = "\n".join(
+        open(os.path.join(SAMPLE_TEXTS_DIR, name), encoding="utf-8").read().strip()
+        for name in sorted(os.listdir(SAMPLE_TEXTS_DIR))
+        if name.endswith(".txt")
+    )
+    return {
+        "sentence": "Hello! 今日は天気が良いですね。",
+        "paragraph": paragraph,
+        "chapter": "\n".join([paragraph] * 10),
+        "book": "\n".join([paragraph] * 50),
+    }
+
+
+def create_agent() -> TTSAgent:
+    config = Config()
+    config.tts_service = "local_synthetic"
+    config.synthetic_latency_ms = 0
+    config.synthetic_jitter_ms = 0
+    config.synthetic_error_rate = 0
+    config.synthetic_ms_per_char = MS_PER_CHAR
+    # Measure synthesis work on every run instead of cache hits
+    config.cache_enabled = False
+    return TTSAgent(config)
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def measure(func: Callable[[], None], repeat: int) -> Dict[str, float]:
+    """Time func over repeat runs, then measure its peak traced memory in one extra run."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "runs": repeat,
+        "p50_ms": percentile(timings, 0.50) * 1000,
+        "p95_ms": percentile(timings, 0.95) * 1000,
+        "max_ms": max(timings) * 1000,
+        "peak_memory_bytes": peak,
+    }
+
+
+def bench_corpus(agent: TTSAgent, text: str, repeat: int, temp_dir: str) -> Dict[str, Dict[str, float]]:
+    processed_text = agent.text_parser.preprocess_text(text)
+    language_segments = agent.language_detector.segment_by_language(processed_text)
+    audio_segments = agent.speech_service.synthesize_all(language_segments)
+    merged_audio = agent.output_manager.merge_segments(audio_segments)
+    audio_seconds = len(merged_audio) / (agent.output_manager.sample_rate * agent.output_manager.sample_width)
+    output_path = os.path.join(temp_dir, "output.wav")
+
+    stages = {
+        "detect": (lambda: agent.language_detector.segment_by_language(processed_text), len(text), "chars_per_s"),
+        "merge": (lambda: agent.output_manager.merge_segments(audio_segments), audio_seconds, "audio_s_per_s"),
+        "export": (lambda: agent.output_manager.export_audio(merged_audio, output_path, "wav"),
+                   audio_seconds, "audio_s_per_s"),
+        "synthesize": (lambda: agent.synthesize(text, output_path), len(text), "chars_per_s"),
+    }
+
+    results = {}
+    for name, (func, amount, unit) in stages.items():
+        stats = measure(func, repeat)
+        stats[unit] = amount / (stats["p50_ms"] / 1000) if stats["p50_ms"] else float("inf")
+        stats["segments"] = len(language_segments)
+        results[name] = stats
+    return results
+
+
+def compare(results: Dict, baseline: Dict, time_tolerance: float, memory_tolerance: float,
+            min_delta_ms: float, min_delta_bytes: int) -> List[str]:
+    """Return a message for every stage that is slower or uses more memory than its baseline."""
+    regressions = []
+    for corpus, stages in results.items():
+        for stage, stats in stages.items():
+            base = baseline.get(corpus, {}).get(stage)
+            if base is None:
+                continue
+            current_ms, base_ms = stats["p50_ms"], base["p50_ms"]
+            if current_ms > base_ms * (1 + time_tolerance) and current_ms - base_ms > min_delta_ms:
+                regressions.append(
+                    f"{corpus}/{stage}: p50 {current_ms:.1f} ms vs baseline {base_ms:.1f} ms "
+                    f"(+{(current_ms / base_ms - 1) * 100:.0f}%)"
+                )
+            current_mem, base_mem = stats["peak_memory_bytes"], base["peak_memory_bytes"]
+            if current_mem > base_mem * (1 + memory_tolerance) and current_mem - base_mem > min_delta_bytes:
+                regressions.append(
+                    f"{corpus}/{stage}: peak memory {current_mem / 2**20:.1f} MiB vs baseline "
+                    f"{base_mem / 2**20:.1f} MiB (+{(current_mem / base_mem - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def print_table(results: Dict) -> None:
+    print(f"{'corpus':<10} {'stage':<11} {'p50 ms':>10} {'p95 ms':>10} {'peak MiB':>9}  throughput")
+    for corpus, stages in results.items():
+        for stage, stats in stages.items():
+            unit = "chars_per_s" if "chars_per_s" in stats else "audio_s_per_s"
+            print(f"{corpus:<10} {stage:<11} {stats['p50_ms']:>10.2f} {stats['p95_ms']:>10.2f} "
+                  f"{stats['peak_memory_bytes'] / 2**20:>9.2f}  {stats[unit]:,.0f} {unit}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the text-to-audio pipeline.")
+    parser.add_argument("--corpora", nargs="+", choices=list(REPEATS), default=list(REPEATS))
+    parser.add_argument("--repeat-scale", type=float, default=1.0,
+                        help="Multiply the number of runs per corpus by this factor")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Where to save the results as JSON")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline results to compare against")
+    parser.add_argument("--update-baseline", action="store_true", help="Save the results as the new baseline")
+    parser.add_argument("--time-tolerance", type=float, default=0.5,
+                        help="Allowed relative increase of p50 latency (default: 0.5 = 50%%)")
+    parser.add_argument("--memory-tolerance", type=float, default=0.2,
+                        help="Allowed relative increase of peak memory (default: 0.2 = 20%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0,
+                        help="Ignore latency increases smaller than this")
+    parser.add_argument("--min-delta-mb", type=float, default=1.0,
+                        help="Ignore peak memory increases smaller than this")
+    args = parser.parse_args(argv)
+
+    agent = create_agent()
+    corpora = build_corpora()
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for corpus in args.corpora:
+            repeat = max(1, int(REPEATS[corpus] * args.repeat_scale))
+            results[corpus] = bench_corpus(agent, corpora[corpus], repeat, temp_dir)
+
+    print_table(results)
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "ms_per_char": MS_PER_CHAR,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to record one.")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance,
+                          args.min_delta_ms, int(args.min_delta_mb * 2**20))
+    if regressions:
+        print("\nREGRESSIONS against baseline:")
+        for message in regressions:
+            print(f"  FAIL {message}")
+        return 1
+    print("\nNo regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,35 @@
+import asyncio
+import os
+import shutil
+from collections import deque
+from concurrent.futures import wait
+from typing import AsyncIterable, AsyncIterator, BinaryIO, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
+from src.cache import RenderCache, TwoTierCache, make_cache_key
 from src.config import Config
-from src.text.parser import TextParser
+from src.text.parser import DEFAULT_CHUNK_SIZE, TextParser
+from src.text.planner import ChunkPlanner
 from src.text.segmenter import TextSegmenter
 from src.language.detector import LanguageDetector
 from src.speech.service import SpeechService
+from src.output.encoder import shared_encoder_pool
 from src.output.manager import OutputManager
+from src.output.postprocess import PostProcessor
+from src.output.resample import Resampler, resample
+from src.session import DocumentSession, DocumentSessionStore
+
+# Characters of streamed text segmented by language and planned at a time (synthesize_file)
+TEXT_BLOCK_LENGTH = 16 * 1024
+
+class SynthesisResult(tuple):
+    """(output_path, segments) of a synthesis, noting whether it was served from the render cache
+    and how many segments were reused from a document session."""
+
+    def __new__(cls, output_path, segments, cache_hit: bool = False, reused_segments: int = 0):
+        result = super().__new__(cls, (output_path, segments))
+        result.cache_hit = cache_hit
+        result.reused_segments = reused_segments
+        return result
+
 
 class TTSAgent:
     def __init__(self, config: Config):
@@ -12,12 +38,448 @@ class TTSAgent:
         self.text_segmenter = TextSegmenter()
         self.language_detector = LanguageDetector(config)
         self.speech_service = SpeechService(config)
+        self.chunk_planner = ChunkPlanner.from_config(
+            config, self.text_segmenter, self.speech_service.max_text_length, self.speech_service.text_length
+        )
         self.output_manager = OutputManager()
+        self.encoder_pool = shared_encoder_pool(config.encoder_workers or None)
+        self.postprocessor = PostProcessor.from_config(config)
+        self.render_cache = RenderCache.from_config(config)
+        self.part_cache = TwoTierCache.parts_from_config(config)
+        self.document_sessions = DocumentSessionStore.from_config(config)
+
+    def synthesize(self, text: str, output_path: Union[str, BinaryIO],
+                   english_voice_id: Optional[str] = None, japanese_voice_id: Optional[str] = None,
+                   audio_format: Optional[str] = None, sample_rate: Optional[int] = None):
+        """Synthesize text to an audio file.
+
+        Segments are written to the file in order as they are synthesized, so memory use
+        does not grow with the length of the text. Writing and encoding run on the shared
+        encoder pool, overlapping with the synthesis of the following segments. Audio is
+        requested from the provider at its native rate and resampled to sample_rate.
+
+        Args:
+            text: The text to synthesize
+            output_path: Path to save the audio file, or a writable, seekable binary file
+                object (e.g. io.BytesIO) to write it to
+            english_voice_id: Voice for English segments (default: the configured English voice)
+            japanese_voice_id: Voice for Japanese segments (default: the configured Japanese voice)
+            audio_format: Output format (wav, mp3, ogg, flac); by default taken from the extension
+                of output_path, falling back to wav (and always wav for file objects)
+            sample_rate: Sample rate of the output in Hz (default: 16kHz)
+
+        Returns:
+            A SynthesisResult: (output_path, segments) where segments describes each language
+            segment, with cache_hit set if the file was copied from the render cache
+        """
+        audio_format = self._audio_format(output_path, audio_format)
+        render_key = self._render_key(text, english_voice_id, japanese_voice_id, audio_format, sample_rate)
+        if render_key is not None:
+            segments = self._write_cached_output(render_key, output_path)
+            if segments is not None:
+                return SynthesisResult(output_path, segments, cache_hit=True)
+        start = self._output_position(output_path)
+
+        language_segments = self._segment(text)
+        requests = self._requests(language_segments, english_voice_id, japanese_voice_id)
+        sink = self.output_manager.open_sink(output_path, audio_format, sample_rate, self.part_cache)
+        audio_segments = self.speech_service.iter_synthesize_all(
+            [(lang, text) for _, lang, text in requests], english_voice_id, japanese_voice_id
+        )
+        gaps = (gap_ms for gap_ms, _, _ in requests)
+        self._write_segments(sink, zip(gaps, audio_segments))
+        segments = [f"{lang}: {text}" for lang, text in language_segments]
+        if render_key is not None:
+            self._cache_output(render_key, output_path, start, segments)
+        return SynthesisResult(output_path, segments)
+
+    async def asynthesize(self, text: str, output_path: Union[str, BinaryIO],
+                          english_voice_id: Optional[str] = None, japanese_voice_id: Optional[str] = None,
+                          audio_format: Optional[str] = None, sample_rate: Optional[int] = None):
+        """Asynchronous version of synthesize for use inside an event loop.
+
+        Provider calls are awaited concurrently; text processing runs on a worker thread
+        and file writes on the encoder pool, so the event loop stays responsive.
+        """
+        audio_format = self._audio_format(output_path, audio_format)
+        render_key = self._render_key(text, english_voice_id, japanese_voice_id, audio_format, sample_rate)
+        if render_key is not None:
+            segments = await asyncio.to_thread(self._write_cached_output, render_key, output_path)
+            if segments is not None:
+                return SynthesisResult(output_path, segments, cache_hit=True)
+        start = self._output_position(output_path)
+
+        language_segments = await asyncio.to_thread(self._segment, text)
+        requests = self._requests(language_segments, english_voice_id, japanese_voice_id)
+        sink = await self.encoder_pool.run(
+            self.output_manager.open_sink, output_path, audio_format, sample_rate, self.part_cache
+        )
+
+        async def audio_segments() -> AsyncIterator[Tuple[int, bytes]]:
+            request_index = 0
+            async for audio_data in self.speech_service.aiter_synthesize_all(
+                [(lang, text) for _, lang, text in requests], english_voice_id, japanese_voice_id
+            ):
+                yield requests[request_index][0], audio_data
+                request_index += 1
+
+        await self._awrite_segments(sink, audio_segments())
+        segments = [f"{lang}: {text}" for lang, text in language_segments]
+        if render_key is not None:
+            await asyncio.to_thread(self._cache_output, render_key, output_path, start, segments)
+        return SynthesisResult(output_path, segments)
+
+    def synthesize_document(self, document_id: str, text: str, output_path: Union[str, BinaryIO],
+                            english_voice_id: Optional[str] = None, japanese_voice_id: Optional[str] = None,
+                            audio_format: Optional[str] = None, sample_rate: Optional[int] = None):
+        """Synthesize a revision of a document, reusing the audio of segments unchanged since the last one.
+
+        The text is cut into segments with ChunkPlanner.plan_stable, whose boundaries only
+        depend on nearby text, so an edit leaves the other segments as they were. The
+        document's last render is kept in a DocumentSession (see src.session); its segments
+        are aligned with the new ones by key (language, text, voice and service), and only
+        inserted or changed segments are sent to the TTS service. The output is written from
+        the kept and the new audio in order, with the pauses between segments recomputed.
+        With document sessions disabled (TTS_DOCUMENT_SESSION_MB=0) every segment is synthesized.
+
+        Args:
+            document_id: Identifies the document across revisions
+            text: The text of this revision
+            output_path: Path to save the audio file, or a writable, seekable binary file object
+            english_voice_id: Voice for English segments (default: the configured English voice)
+            japanese_voice_id: Voice for Japanese segments (default: the configured Japanese voice)
+            audio_format: Output format (see synthesize)
+            sample_rate: Sample rate of the output in Hz (default: 16kHz)
+
+        Returns:
+            A SynthesisResult: (output_path, segments), with reused_segments set to the number
+            of segments whose audio was reused
+        """
+        audio_format = self._audio_format(output_path, audio_format)
+        processed_text = self.text_parser.preprocess_text(text)
+        language_segments = self.chunk_planner.plan_stable(self.language_detector.segment_by_language(processed_text))
+        keys = self._session_keys(language_segments, english_voice_id, japanese_voice_id)
+        session = self.document_sessions.get(document_id) if self.document_sessions is not None else None
+        audio = session.reusable_audio(keys) if session is not None else [None] * len(keys)
+        missing = [language_segments[index] for index, audio_data in enumerate(audio) if audio_data is None]
+        reused_segments = len(audio) - len(missing)
+
+        def audio_segments() -> Iterator[Tuple[int, bytes]]:
+            # Per segment, without SSML batching, so each segment's audio can be kept on its own
+            fresh = self.speech_service.iter_synthesize_all(missing, english_voice_id, japanese_voice_id)
+            for index in range(len(audio)):
+                if audio[index] is None:
+                    audio[index] = next(fresh)
+                yield self._gap_ms(language_segments, index), audio[index]
+
+        sink = self.output_manager.open_sink(output_path, audio_format, sample_rate, self.part_cache)
+        self._write_segments(sink, audio_segments())
+        if self.document_sessions is not None:
+            self.document_sessions.put(document_id, DocumentSession(language_segments, keys, audio))
+            self.document_sessions.record(reused_segments, len(missing))
+        segments = [f"{lang}: {text}" for lang, text in language_segments]
+        return SynthesisResult(output_path, segments, reused_segments=reused_segments)
+
+    def synthesize_file(self, source: Union[str, BinaryIO, TextIO, Iterable[Union[str, bytes]]],
+                        output_path: Union[str, BinaryIO],
+                        english_voice_id: Optional[str] = None, japanese_voice_id: Optional[str] = None,
+                        audio_format: Optional[str] = None, sample_rate: Optional[int] = None,
+                        chunk_size: int = DEFAULT_CHUNK_SIZE) -> Tuple[Union[str, BinaryIO], int]:
+        """Synthesize text that is read as it is needed, for inputs too large to hold in memory.
+
+        The text is read in chunks of chunk_size (TextParser.iter_text), split into sentences
+        as they complete (TextSegmenter.iter_sentences), and segmented by language and planned
+        about TEXT_BLOCK_LENGTH characters at a time, so the text read ahead of synthesis stays
+        within a few blocks. The last language segment of a block is carried into the next one,
+        so a run of one language is not cut at block boundaries. Otherwise this works like
+        synthesize; the render cache is not used, since its key needs the whole text.
+
+        Args:
+            source: Path of a UTF-8 text file, a text or binary file object, or an iterable of
+                str or UTF-8 bytes chunks (e.g. an HTTP request body)
+            output_path: Path to save the audio file, or a writable, seekable binary file object
+            english_voice_id: Voice for English segments (default: the configured English voice)
+            japanese_voice_id: Voice for Japanese segments (default: the configured Japanese voice)
+            audio_format: Output format (see synthesize)
+            sample_rate: Sample rate of the output in Hz (default: 16kHz)
+            chunk_size: Characters (or bytes) read from source at a time
 
-    def synthesize(self, text: str, output_path: str):
+        Returns:
+            (output_path, number of language segments synthesized)
+        """
+        audio_format = self._audio_format(output_path, audio_format)
+        # Pause before each request, queued as requests are handed to the speech service
+        gaps = deque()
+        segment_count = 0
+
+        def requests() -> Iterator[Tuple[str, str]]:
+            nonlocal segment_count
+            previous = None
+            for language_segments in self._iter_plans(source, chunk_size):
+                for gap_ms, lang, text in self._requests(
+                    language_segments, english_voice_id, japanese_voice_id, previous
+                ):
+                    gaps.append(gap_ms)
+                    yield lang, text
+                segment_count += len(language_segments)
+                previous = language_segments[-1]
+
+        sink = self.output_manager.open_sink(output_path, audio_format, sample_rate, self.part_cache)
+        audio_segments = self.speech_service.iter_synthesize_all(requests(), english_voice_id, japanese_voice_id)
+        self._write_segments(sink, ((gaps.popleft(), audio_data) for audio_data in audio_segments))
+        return output_path, segment_count
+
+    async def astream(self, text: str, english_voice_id: Optional[str] = None,
+                      japanese_voice_id: Optional[str] = None,
+                      sample_rate: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Synthesize text as a WAV byte stream for progressive playback.
+
+        The WAV header (with an open-ended length) is yielded once the first audio arrives.
+        Each segment's PCM follows (preceded by the pause between segments) chunk by chunk
+        as the TTS service delivers it, once all segments before it are complete. With
+        post-processing, segments go through PostProcessor.stream: leading silence is
+        trimmed and the level is set from the first loud chunk, but trailing silence is kept.
+
+        Args:
+            text: The text to synthesize
+            english_voice_id: Voice for English segments (default: the configured English voice)
+            japanese_voice_id: Voice for Japanese segments (default: the configured Japanese voice)
+            sample_rate: Sample rate of the stream in Hz (default: 16kHz)
+
+        Yields:
+            Chunks of a 16-bit, mono WAV stream
+        """
+        language_segments = await asyncio.to_thread(self._segment, text)
+        requests = self._requests(language_segments, english_voice_id, japanese_voice_id)
+        source_rate = self.speech_service.sample_rate
+        sample_rate = sample_rate or self.output_manager.sample_rate
+        # Each segment is post-processed and resampled chunk by chunk as it arrives
+        resampler = None
+        segment_stream = None
+        current_index = None
+        async for index, chunk in self.speech_service.aiter_synthesize_all_chunks(
+            [(lang, text) for _, lang, text in requests], english_voice_id, japanese_voice_id
+        ):
+            if current_index is None:
+                yield self.output_manager.streaming_wav_header(sample_rate)
+            elif index != current_index:
+                if resampler is not None and resampler.pending():
+                    yield resampler.flush().tobytes()
+                yield self.output_manager.silence(requests[index][0], sample_rate)
+            if index != current_index:
+                if self.postprocessor is not None:
+                    segment_stream = self.postprocessor.stream(source_rate)
+                if source_rate != sample_rate:
+                    resampler = Resampler(source_rate, sample_rate)
+            current_index = index
+            if segment_stream is not None:
+                chunk = segment_stream.process(chunk).tobytes()
+                if not chunk:
+                    continue
+            if resampler is not None:
+                chunk = resampler.process(chunk).tobytes()
+                if not chunk:
+                    continue
+            yield chunk
+        if current_index is None:
+            yield self.output_manager.streaming_wav_header(sample_rate)
+        elif resampler is not None and resampler.pending():
+            yield resampler.flush().tobytes()
+
+    def _render_key(self, text: str, english_voice_id: Optional[str], japanese_voice_id: Optional[str],
+                    audio_format: str, sample_rate: Optional[int]) -> Optional[str]:
+        """Return the render cache key of a request, or None if the render cache is disabled."""
+        if self.render_cache is None:
+            return None
+        service = self.speech_service
+        if self.postprocessor is None:
+            processing = ("silence", self.output_manager.silence_ms)
+        else:
+            postprocessor = self.postprocessor
+            policy = postprocessor.gap_policy
+            processing = (
+                "postprocess", postprocessor.target_dbfs, postprocessor.trim_threshold_dbfs,
+                postprocessor.max_gain_db, postprocessor.frame_ms, postprocessor.padding_ms,
+                policy.sentence_gap_ms, policy.clause_gap_ms, policy.continuation_gap_ms,
+                policy.language_change_gap_ms,
+            )
+        planner = self.chunk_planner
+        return self.render_cache.request_key(
+            text, service.tts_service_name,
+            english_voice_id or service.english_voice_id, japanese_voice_id or service.japanese_voice_id,
+            audio_format, sample_rate or self.output_manager.sample_rate,
+            planner.policy, planner.max_length, planner.first_chunk_length, service.ssml_batching,
+            self.config.neutral_attach, self.part_cache is not None, *processing
+        )
+
+    @staticmethod
+    def _output_position(output_path: Union[str, BinaryIO]) -> int:
+        return 0 if isinstance(output_path, str) else output_path.tell()
+
+    def _write_cached_output(self, render_key: str, output_path: Union[str, BinaryIO]) -> Optional[List[str]]:
+        """Copy a cached render to output_path; return its segments, or None on a miss."""
+        cached = self.render_cache.get(render_key)
+        if cached is None:
+            return None
+        audio_file, segments = cached
+        with audio_file:
+            if isinstance(output_path, str):
+                with open(output_path, "wb") as file:
+                    shutil.copyfileobj(audio_file, file)
+            else:
+                shutil.copyfileobj(audio_file, output_path)
+        return segments
+
+    def _cache_output(self, render_key: str, output_path: Union[str, BinaryIO], start: int,
+                      segments: List[str]) -> None:
+        # Copied in blocks, so an output spilled to disk is never read into memory as a whole
+        if isinstance(output_path, str):
+            with open(output_path, "rb") as file:
+                self.render_cache.put(render_key, file, segments)
+        else:
+            output_path.seek(start)
+            self.render_cache.put(render_key, output_path, segments)
+
+    def _segment(self, text: str):
         processed_text = self.text_parser.preprocess_text(text)
-        language_segments = self.language_detector.segment_by_language(processed_text)
-        audio_segments = self.speech_service.synthesize_all(language_segments)
-        merged_audio = self.output_manager.merge_segments(audio_segments)
-        self.output_manager.export_audio(merged_audio, output_path, "wav")
-        return output_path, [f"{lang}: {text}" for lang, text in language_segments]
+        return self.chunk_planner.plan(self.language_detector.segment_by_language(processed_text))
+
+    def _requests(self, language_segments, english_voice_id: Optional[str], japanese_voice_id: Optional[str],
+                  previous: Optional[Tuple[str, str]] = None):
+        """Return the provider requests of language_segments: (gap_ms, language, text) tuples,
+        where gap_ms is the pause before the request.
+
+        With SSML batching, runs of segments become one request whose <break> tags hold the
+        pauses between them; under the latency policy the first segment stays on its own.
+        previous is the segment before language_segments, if they continue a text.
+        """
+        context = [previous] + language_segments if previous else language_segments
+        offset = len(context) - len(language_segments)
+        gaps_ms = [self._gap_ms(context, offset + index) for index in range(len(language_segments))]
+        requests = self.speech_service.batch_segments(
+            language_segments, gaps_ms, english_voice_id, japanese_voice_id,
+            max_length=self.chunk_planner.max_length,
+            separate_first=self.chunk_planner.policy == "latency" and previous is None
+        )
+        return [(gaps_ms[index], lang, text) for index, lang, text in requests]
+
+    def _session_keys(self, language_segments, english_voice_id: Optional[str],
+                      japanese_voice_id: Optional[str]):
+        """Return the document session key of each segment: what its synthesized audio depends on."""
+        service = self.speech_service
+        english_voice_id = english_voice_id or service.english_voice_id
+        japanese_voice_id = japanese_voice_id or service.japanese_voice_id
+        return [
+            make_cache_key(
+                "session", service.tts_service_name,
+                english_voice_id if language.startswith("en") else japanese_voice_id,
+                language, text, service.sample_rate
+            )
+            for language, text in language_segments
+        ]
+
+    def _iter_plans(self, source, chunk_size: int) -> Iterator[List[Tuple[str, str]]]:
+        """Yield the planned (language, text) chunks of streamed text, one block at a time."""
+        sentences = self.text_segmenter.iter_sentences(self.text_parser.iter_text(source, chunk_size))
+        block: List[str] = []
+        block_length = 0
+        # The last language segment of the previous block, which may continue in this one
+        carried = ""
+        continued = False
+        for sentence in sentences:
+            block.append(sentence)
+            block_length += len(sentence) + 1
+            if block_length < TEXT_BLOCK_LENGTH:
+                continue
+            language_segments = self.language_detector.segment_by_language(" ".join([carried] + block))
+            block, block_length = [], 0
+            carried = ""
+            if language_segments and len(language_segments[-1][1]) < TEXT_BLOCK_LENGTH:
+                carried = language_segments.pop()[1]
+            if language_segments:
+                yield self.chunk_planner.plan(language_segments, continued)
+                continued = True
+        language_segments = self.language_detector.segment_by_language(" ".join([carried] + block))
+        if language_segments:
+            yield self.chunk_planner.plan(language_segments, continued)
+
+    def _gap_ms(self, language_segments, index: int) -> int:
+        """Return the pause before segment index."""
+        if index == 0:
+            return 0
+        if self.postprocessor is None:
+            return self.output_manager.silence_ms
+        previous_language, previous_text = language_segments[index - 1]
+        return self.postprocessor.gap_ms(previous_text, previous_language, language_segments[index][0])
+
+    def _write_segments(self, sink, audio_segments: Iterable[Tuple[int, bytes]]) -> None:
+        """Write (gap_ms, audio_data) segments to sink in order on the encoder pool, then close it.
+
+        Each write overlaps with producing the next segment. If anything fails, including
+        the iterator, the sink is aborted and the error re-raised.
+        """
+        writing = None
+        try:
+            for gap_ms, audio_data in audio_segments:
+                # Keep one write in flight: segments must reach the sink in order
+                if writing is not None:
+                    writing.result()
+                writing = self._submit_write(sink, gap_ms, audio_data)
+            if writing is not None:
+                writing.result()
+            self.encoder_pool.submit(sink.close).result()
+        except BaseException:
+            self._abort_sink(sink, writing)
+            raise
+
+    async def _awrite_segments(self, sink, audio_segments: AsyncIterable[Tuple[int, bytes]]) -> None:
+        """Async version of _write_segments, for segments produced on the event loop."""
+        writing = None
+        try:
+            async for gap_ms, audio_data in audio_segments:
+                # Keep one write in flight: segments must reach the sink in order
+                if writing is not None:
+                    await asyncio.wrap_future(writing)
+                writing = self._submit_write(sink, gap_ms, audio_data)
+            if writing is not None:
+                await asyncio.wrap_future(writing)
+            await self.encoder_pool.run(sink.close)
+        except BaseException:
+            # A write may still be running if this task was cancelled; let it finish first
+            await asyncio.to_thread(self._abort_sink, sink, writing)
+            raise
+
+    def _submit_write(self, sink, gap_ms: int, audio_data: bytes):
+        source_rate = self.speech_service.sample_rate
+        return self.encoder_pool.submit(
+            self._write_segment, sink, gap_ms, audio_data, source_rate,
+            audio_seconds=self._audio_seconds(gap_ms, audio_data, source_rate)
+        )
+
+    def _write_segment(self, sink, gap_ms: int, audio_data: bytes, source_rate: int):
+        if gap_ms:
+            sink.write_silence(gap_ms)
+        if self.postprocessor is not None:
+            audio_data = self.postprocessor.process(audio_data, source_rate)
+        if source_rate != sink.sample_rate:
+            audio_data = resample(audio_data, source_rate, sink.sample_rate)
+        sink.write(audio_data)
+
+    @staticmethod
+    def _abort_sink(sink, writing):
+        if writing is not None:
+            wait([writing])
+        sink.abort()
+
+    def _audio_seconds(self, gap_ms: int, audio_data: bytes, sample_rate: int) -> float:
+        manager = self.output_manager
+        return len(audio_data) / (sample_rate * manager.sample_width * manager.channels) + gap_ms / 1000
+
+    @staticmethod
+    def _audio_format(output_path: Union[str, BinaryIO], audio_format: Optional[str]) -> str:
+        if audio_format:
+            return audio_format
+        if not isinstance(output_path, str):
+            return "wav"
+        extension = os.path.splitext(output_path)[1].lstrip(".").lower()
+        return extension if extension in ("wav", "mp3", "ogg", "flac") else "wav"
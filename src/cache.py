@@ -0,0 +1,323 @@
+"""Content-addressed caches for synthesized audio.
+
+Two tiers are provided:
+- MemoryLRUCache: a per-process LRU bounded by the total size of stored values.
+- DiskCache: a directory of files named by key, bounded by total size on disk.
+  Entries are written to a temporary file and renamed into place, so several
+  processes (e.g. uvicorn workers) can share one cache directory safely.
+
+TwoTierCache puts the memory tier in front of the disk tier and keeps hit/miss counters.
+RenderCache stores finished output files on disk, keyed by the whole request, and
+copies them in and out in blocks.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import BinaryIO, Callable, Dict, List, Optional, Tuple
+
+_HEX_DIGITS = frozenset("0123456789abcdef")
+
+
+def make_cache_key(*parts) -> str:
+    """Build a stable hex key from the given parts.
+
+    Args:
+        parts: Values identifying the cached item. None is treated as an empty string.
+
+    Returns:
+        SHA-256 hex digest of the parts.
+    """
+    joined = "\x1f".join("" if part is None else str(part) for part in parts)
+    return hashlib.sha256(joined.encode("utf-8")).hexdigest()
+
+
+class MemoryLRUCache:
+    def __init__(self, max_bytes: int):
+        """Initialize an in-memory LRU cache.
+
+        Args:
+            max_bytes: Maximum total size of stored values. Values larger than this are not stored.
+        """
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= len(old)
+            self._entries[key] = value
+            self.current_bytes += len(value)
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskCache:
+    def __init__(self, directory: str, max_bytes: int):
+        """Initialize an on-disk cache.
+
+        Args:
+            directory: Directory to store entries in. Created if missing.
+            max_bytes: Maximum total size of entries. When exceeded, the least recently
+                      used entries are removed until the cache is back under 90% of the limit.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # Only tracks this process' writes between scans; a full scan before evicting
+        # picks up entries written by other processes.
+        self._approx_bytes = self._scan_size()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = f.read()
+            # The modification time doubles as the last-access time for eviction
+            os.utime(path)
+            return value
+        except FileNotFoundError:
+            return None
+
+    def open(self, key: str) -> Optional[BinaryIO]:
+        """Like get, but return the entry as an open binary file, for entries too large to read at once."""
+        path = self._path(key)
+        try:
+            file = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        os.utime(path)
+        return file
+
+    def put(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        self._store(key, len(value), lambda f: f.write(value))
+
+    def put_file(self, key: str, file: BinaryIO) -> bool:
+        """Store the rest of a seekable binary file, copying it in blocks.
+
+        Returns:
+            Whether it was stored: files larger than the cache are skipped before any is read.
+        """
+        position = file.tell()
+        size = file.seek(0, os.SEEK_END) - position
+        file.seek(position)
+        if size > self.max_bytes:
+            return False
+        self._store(key, size, lambda f: shutil.copyfileobj(file, f))
+        return True
+
+    def _store(self, key: str, size: int, write: Callable[[BinaryIO], object]) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except Exception:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        with self._lock:
+            self._approx_bytes += size
+            if self._approx_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        # Only the two-hex-digit shard directories and the files in them are entries, so
+        # nothing else that ends up in the directory is counted or evicted
+        for shard in os.scandir(self.directory):
+            if len(shard.name) != 2 or not set(shard.name) <= _HEX_DIGITS or not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.startswith(".tmp-") or not entry.is_file():
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield entry.path, stat.st_size, stat.st_mtime
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self) -> None:
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                # Already evicted by another process
+                pass
+            except OSError:
+                # Replaced by something that is not a cache file; leave it alone
+                continue
+            total -= size
+        self._approx_bytes = total
+
+
+class TwoTierCache:
+    def __init__(self, memory: MemoryLRUCache, disk: Optional[DiskCache] = None):
+        """Initialize a cache with a memory tier in front of an optional disk tier.
+
+        Args:
+            memory: The in-memory tier.
+            disk: The persistent tier, or None for a memory-only cache.
+        """
+        self.memory = memory
+        self.disk = disk
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("memory_hits")
+            return value
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.put(key, value)
+                self._count("disk_hits")
+                return value
+        self._count("misses")
+        return None
+
+    def put(self, key: str, value: bytes) -> None:
+        self.memory.put(key, value)
+        if self.disk is not None:
+            self.disk.put(key, value)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters for this process.
+
+        Returns:
+            Dictionary with memory_hits, disk_hits, hits, misses and the number of memory entries.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats["hits"] = stats["memory_hits"] + stats["disk_hits"]
+        stats["memory_entries"] = len(self.memory)
+        return stats
+
+    @classmethod
+    def from_config(cls, config) -> Optional["TwoTierCache"]:
+        """Build the synthesis cache described by config, or None if caching is disabled."""
+        if not config.cache_enabled:
+            return None
+        memory = MemoryLRUCache(config.cache_memory_mb * 1024 * 1024)
+        disk = DiskCache(config.cache_dir, config.cache_disk_mb * 1024 * 1024) if config.cache_dir else None
+        return cls(memory, disk)
+
+    @classmethod
+    def parts_from_config(cls, config) -> Optional["TwoTierCache"]:
+        """Build the cache of encoded output parts, or None if it is disabled.
+
+        Its disk tier lives in config.part_cache_dir, by default a '-parts' sibling of the
+        synthesis cache directory (never inside it, where the synthesis cache would count
+        and evict its files).
+        """
+        if not config.part_cache_enabled:
+            return None
+        memory = MemoryLRUCache(config.part_cache_memory_mb * 1024 * 1024)
+        directory = config.part_cache_dir
+        if directory is None and config.cache_dir:
+            directory = os.path.normpath(config.cache_dir) + "-parts"
+        disk = DiskCache(directory, config.part_cache_disk_mb * 1024 * 1024) if directory else None
+        return cls(memory, disk)
+
+
+class RenderCache:
+    """Cache of finished, encoded output files keyed by a canonical hash of the request.
+
+    A hit returns the stored file as-is, so repeated requests skip segmentation,
+    synthesis, merging and encoding entirely.
+    """
+
+    def __init__(self, disk: DiskCache):
+        """Initialize the cache.
+
+        Args:
+            disk: Content-addressed store for the output files and their segment lists.
+        """
+        self.disk = disk
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def request_key(text: str, *settings) -> str:
+        """Build the key of a request.
+
+        Args:
+            text: The text to synthesize; runs of whitespace are normalized.
+            settings: Everything else that affects the output (service, voices, format, ...).
+        """
+        return make_cache_key("render", " ".join(text.split()), *settings)
+
+    def get(self, key: str) -> Optional[Tuple[BinaryIO, List[str]]]:
+        """Return (open audio file, segments) for a request key, or None.
+
+        The file is read from disk as the caller copies it; the caller closes it.
+        """
+        segments = self.disk.get(make_cache_key(key, "segments"))
+        audio_file = self.disk.open(key) if segments is not None else None
+        with self._lock:
+            self._stats["hits" if audio_file is not None else "misses"] += 1
+        if audio_file is None:
+            return None
+        return audio_file, json.loads(segments.decode("utf-8"))
+
+    def put(self, key: str, audio_file: BinaryIO, segments: List[str]) -> None:
+        """Store the output file of a request, from the current position of audio_file, and its
+        segment descriptions. Outputs larger than the cache are not stored.
+        """
+        if self.disk.put_file(key, audio_file):
+            self.disk.put(make_cache_key(key, "segments"), json.dumps(segments, ensure_ascii=False).encode("utf-8"))
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters for this process."""
+        with self._lock:
+            return dict(self._stats)
+
+    @classmethod
+    def from_config(cls, config) -> Optional["RenderCache"]:
+        """Build the render cache described by config, or None if it is disabled."""
+        if not config.render_cache_dir:
+            return None
+        return cls(DiskCache(config.render_cache_dir, config.render_cache_mb * 1024 * 1024))
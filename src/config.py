@@ -4,9 +4,105 @@ class Config:
     def __init__(self):
         self.english_voice_id = os.environ.get("ENGLISH_VOICE_ID", "Emma")
         self.japanese_voice_id = os.environ.get("JAPANESE_VOICE_ID", "Takumi")
-        self.tts_service = os.environ.get("TTS_SERVICE", "aws_polly") # Options: aws_polly, google_cloud
+        self.tts_service = os.environ.get("TTS_SERVICE", "aws_polly") # Options: aws_polly, google_cloud, local_synthetic
         
         # AWS credentials
         self.aws_access_key_id = os.environ.get("AWS_ACCESS_KEY_ID")
         self.aws_secret_access_key = os.environ.get("AWS_SECRET_ACCESS_KEY")
         self.aws_region_name = os.environ.get("AWS_REGION_NAME", "us-east-1")
+
+        # Google Cloud credentials
+        self.google_cloud_credentials_path = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
+
+        # Concurrency: number of segments of one request sent to the TTS service in parallel
+        # (1 = sequential)
+        self.max_workers = int(os.environ.get("TTS_MAX_WORKERS", "4"))
+        # Keep-alive HTTP connections kept open to the TTS service per process, and threads
+        # running provider calls for all requests
+        self.max_pool_connections = int(os.environ.get("TTS_MAX_POOL_CONNECTIONS", "32"))
+        # Threads writing and encoding output files, shared by the process (0: one per CPU core)
+        self.encoder_workers = int(os.environ.get("TTS_ENCODER_WORKERS", "0"))
+
+        # Synthesis cache: in-memory LRU tier, plus an on-disk tier when TTS_CACHE_DIR is set
+        self.cache_enabled = os.environ.get("TTS_CACHE_ENABLED", "true").lower() == "true"
+        self.cache_memory_mb = int(os.environ.get("TTS_CACHE_MEMORY_MB", "64"))
+        self.cache_dir = os.environ.get("TTS_CACHE_DIR")
+        self.cache_disk_mb = int(os.environ.get("TTS_CACHE_DISK_MB", "1024"))
+
+        # Cache of separately encoded output parts, joined at frame boundaries to build mp3 files
+        self.part_cache_enabled = os.environ.get("TTS_PART_CACHE", "false").lower() == "true"
+        self.part_cache_memory_mb = int(os.environ.get("TTS_PART_CACHE_MEMORY_MB", "64"))
+        # On-disk tier of the part cache (default: TTS_CACHE_DIR with a "-parts" suffix, if set)
+        self.part_cache_dir = os.environ.get("TTS_PART_CACHE_DIR")
+        self.part_cache_disk_mb = int(os.environ.get("TTS_PART_CACHE_DISK_MB", "1024"))
+
+        # Cache of finished output files for repeated identical requests (disabled if unset)
+        self.render_cache_dir = os.environ.get("TTS_RENDER_CACHE_DIR")
+        self.render_cache_mb = int(os.environ.get("TTS_RENDER_CACHE_MB", "1024"))
+        # Audio kept by document sessions (TTSAgent.synthesize_document), so re-rendering an
+        # edited document only synthesizes the segments that changed (0: sessions disabled)
+        self.document_session_mb = int(os.environ.get("TTS_DOCUMENT_SESSION_MB", "256"))
+
+        # Client-side rate limit shared by all requests in the process
+        # (unset: the provider's default quota, 0: unlimited)
+        rate_limit_tps = os.environ.get("TTS_RATE_LIMIT_TPS")
+        self.rate_limit_tps = float(rate_limit_tps) if rate_limit_tps else None
+        rate_limit_burst = os.environ.get("TTS_RATE_LIMIT_BURST")
+        self.rate_limit_burst = int(rate_limit_burst) if rate_limit_burst else None
+
+        # Retries of throttled, 5xx and timed-out requests, with exponential backoff and jitter
+        self.max_retries = int(os.environ.get("TTS_MAX_RETRIES", "3"))
+        self.retry_base_delay = float(os.environ.get("TTS_RETRY_BASE_DELAY", "0.1"))
+        self.retry_max_delay = float(os.environ.get("TTS_RETRY_MAX_DELAY", "5.0"))
+        # Retries allowed per request on average, across all requests in the process
+        self.retry_budget_ratio = float(os.environ.get("TTS_RETRY_BUDGET_RATIO", "0.2"))
+
+        # Optional post-processing of each segment: silence trimming, loudness levelling and
+        # pauses chosen from punctuation and language changes (instead of a fixed 500 ms).
+        # Streamed audio is levelled from each segment's first loud chunk and keeps trailing silence
+        self.postprocess_enabled = os.environ.get("TTS_POSTPROCESS", "false").lower() == "true"
+        self.postprocess_target_dbfs = float(os.environ.get("TTS_POSTPROCESS_TARGET_DBFS", "-20"))
+        self.postprocess_trim_threshold_dbfs = float(os.environ.get("TTS_POSTPROCESS_TRIM_DBFS", "-45"))
+        self.sentence_gap_ms = int(os.environ.get("TTS_SENTENCE_GAP_MS", "500"))
+        self.clause_gap_ms = int(os.environ.get("TTS_CLAUSE_GAP_MS", "250"))
+        self.continuation_gap_ms = int(os.environ.get("TTS_CONTINUATION_GAP_MS", "100"))
+        self.language_change_gap_ms = int(os.environ.get("TTS_LANGUAGE_CHANGE_GAP_MS", "150"))
+
+        # Where the API keeps generated audio until it is fetched: "memory" (bounded by
+        # TTS_AUDIO_STORE_MB) or "disk" (under TTS_AUDIO_STORE_DIR, default api/temp)
+        self.audio_store = os.environ.get("TTS_AUDIO_STORE", "memory")
+        self.audio_store_mb = int(os.environ.get("TTS_AUDIO_STORE_MB", "256"))
+        # Audio larger than this is moved to the disk store directory while it is written,
+        # instead of being held in memory (0: only audio larger than TTS_AUDIO_STORE_MB)
+        self.audio_store_spill_mb = int(os.environ.get("TTS_AUDIO_STORE_SPILL_MB", "16"))
+        self.audio_store_dir = os.environ.get("TTS_AUDIO_STORE_DIR")
+        self.audio_store_ttl_seconds = float(os.environ.get("TTS_AUDIO_STORE_TTL_SECONDS", "300"))
+        self.audio_store_disk_mb = int(os.environ.get("TTS_AUDIO_STORE_DISK_MB", "1024"))
+        # How often expired audio is purged
+        self.audio_store_purge_interval_seconds = float(os.environ.get("TTS_AUDIO_STORE_PURGE_INTERVAL_SECONDS", "30"))
+        # Serve generated audio with immutable caching headers and keep it until it expires,
+        # instead of deleting it after the first full download
+        self.audio_cacheable = os.environ.get("TTS_AUDIO_CACHEABLE", "false").lower() == "true"
+
+        # How text is cut into provider calls: "throughput" packs each language's text into as
+        # few calls as the provider's per-call limit allows; "latency" also keeps the first call
+        # short (TTS_FIRST_CHUNK_LENGTH) so the first audio arrives sooner
+        self.chunk_policy = os.environ.get("TTS_CHUNK_POLICY", "throughput")
+        self.first_chunk_length = int(os.environ.get("TTS_FIRST_CHUNK_LENGTH", "100"))
+        # Lower per-call text limit than the provider's (0: the provider's limit)
+        self.max_chunk_length = int(os.environ.get("TTS_MAX_CHUNK_LENGTH", "0"))
+        # Send runs of segments (including language changes) as one SSML request, with the
+        # pauses between them as <break> tags, where the provider and voices allow it
+        self.ssml_batching = os.environ.get("TTS_SSML_BATCHING", "false").lower() == "true"
+
+        # Language of neutral characters (spaces, digits, punctuation) between runs of different
+        # languages within a sentence: "previous" (the run before them) or "next" (the run after)
+        self.neutral_attach = os.environ.get("TTS_NEUTRAL_ATTACH", "previous")
+
+        # Offline synthetic backend (TTS_SERVICE=local_synthetic) for load and performance testing
+        self.synthetic_latency_ms = float(os.environ.get("TTS_SYNTHETIC_LATENCY_MS", "100"))
+        self.synthetic_jitter_ms = float(os.environ.get("TTS_SYNTHETIC_JITTER_MS", "0"))
+        self.synthetic_error_rate = float(os.environ.get("TTS_SYNTHETIC_ERROR_RATE", "0"))
+        self.synthetic_ms_per_char = float(os.environ.get("TTS_SYNTHETIC_MS_PER_CHAR", "60"))
+        synthetic_seed = os.environ.get("TTS_SYNTHETIC_SEED")
+        self.synthetic_seed = int(synthetic_seed) if synthetic_seed else None
@@ -1,71 +1,137 @@
+import functools
+import re
 from typing import List, Tuple
+import numpy as np
 from src.config import Config
-from langdetect import detect
-import re
+
+# Script classes of code points, as single characters so a whole text can be classified
+# with one table lookup and scanned with a regular expression: Latin and other alphabets (English), Japanese (kana, kanji,
+# full-width letters), sentence ends, and neutral characters (spaces, digits,
+# punctuation, symbols) which take the language of a neighbouring run
+ENGLISH = "e"
+JAPANESE = "j"
+SENTENCE_END = "s"
+NEUTRAL = "n"
+
+# Characters that end a sentence
+SENTENCE_END_CHARS = "。．.!?\n"
+
+# Code points covered by the script table; characters beyond it are neutral
+_TABLE_SIZE = 0x32400
+
+# Language runs. A run takes any neutral characters before its first letter, and every
+# sentence that follows until a letter of the other language appears (neutral-only
+# sentences included); anything outside the table counts as neutral.
+_RUN_PATTERNS = {
+    # Neutral characters between two runs stay with the run before them
+    "previous": (
+        r"(?P<en>[^ej]*e[^j]*)"
+        r"|(?P<ja>[^ej]*j[^e]*)"
+        r"|(?P<neutral>[^ej]+)"
+    ),
+    # Neutral characters between two runs go to the run after them, except for those up to
+    # the end of the run's last sentence
+    "next": (
+        r"(?P<en>[^ej]*e(?:[^j]*e)?(?:[^ej]*s)?(?:[^ej]*\Z)?)"
+        r"|(?P<ja>[^ej]*j(?:[^e]*j)?(?:[^ej]*s)?(?:[^ej]*\Z)?)"
+        r"|(?P<neutral>[^ej]+)"
+    ),
+}
+
+# Japanese sentence ends, which are not followed by a space; sentences in a segment are
+# separated by a single space
+_JAPANESE_SENTENCE_ENDS = ("。", "．")
+
+
+@functools.lru_cache(maxsize=1)
+def script_table() -> str:
+    """Return the script class of every code point below _TABLE_SIZE, then the class of those above."""
+    classes = []
+    for code_point in range(_TABLE_SIZE):
+        char = chr(code_point)
+        if not char.isalpha():
+            classes.append(NEUTRAL)
+        elif code_point >= 0x3040:
+            classes.append(JAPANESE)
+        else:
+            classes.append(ENGLISH)
+    # Kanji iteration and closing marks below the kana block
+    for char in "々〆〇":
+        classes[ord(char)] = JAPANESE
+    for char in SENTENCE_END_CHARS:
+        classes[ord(char)] = SENTENCE_END
+    # Code points beyond the table are looked up here
+    classes.append(NEUTRAL)
+    return "".join(classes)
+
+
+@functools.lru_cache(maxsize=1)
+def _script_array() -> np.ndarray:
+    return np.frombuffer(script_table().encode("ascii"), dtype=np.uint8)
+
+
+def classify(text: str) -> str:
+    """Return a string of the script class of each character of text (see script_table)."""
+    table = _script_array()
+    # Lone surrogates (e.g. from JSON escapes) are classified as neutral characters
+    code_points = np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+    return table[np.minimum(code_points, len(table) - 1)].tobytes().decode("ascii")
+
 
 class LanguageDetector:
     def __init__(self, config: Config):
+        """Initialize the detector.
+
+        Args:
+            config: Config; neutral_attach chooses whether neutral characters between two
+                runs ("previous" or "next") take the language of the run before or after them.
+
+        Raises:
+            ValueError: If config.neutral_attach is not a known rule.
+        """
         self.config = config
+        if config.neutral_attach not in _RUN_PATTERNS:
+            raise ValueError(
+                f"Invalid neutral_attach {config.neutral_attach!r}; choose one of {sorted(_RUN_PATTERNS)}"
+            )
+        self._runs = re.compile(_RUN_PATTERNS[config.neutral_attach])
 
     def detect_language(self, text_segment: str) -> str:
         """Detect the language of a text segment.
-        
+
         Args:
             text_segment: Text to detect language for
-            
+
         Returns:
             Language code ('en' for English, 'ja' for Japanese)
         """
-        try:
-            # Clean the text segment
-            text_segment = text_segment.strip()
-            if not text_segment:
-                return "en"
-                
-            # Detect if text contains Japanese characters
-            if any(ord(char) > 0x3040 for char in text_segment):
-                return "ja"
-                
-            # For non-Japanese text, treat as English
-            return "en"
-        except:
-            return "en"
+        # Any Japanese character makes the segment Japanese
+        return "ja" if JAPANESE in classify(text_segment) else "en"
 
     def segment_by_language(self, text: str) -> List[Tuple[str, str]]:
         """Split text into segments based on detected language.
-        
+
+        The text is classified in one pass through a precomputed script table, then split
+        into runs of one language in one regular expression scan, so a sentence mixing
+        scripts (e.g. "東京 is great") is split between the voices. Consecutive sentences of
+        one language form one segment, separated by a space, with runs of whitespace
+        (including newlines) collapsed to one space. Neutral characters between
+        runs follow config.neutral_attach; text without letters joins the segment before
+        it (or after it, at the start of the text).
+
         Args:
             text: Input text that may contain multiple languages
-            
+
         Returns:
             List of (language_code, text_segment) tuples
         """
-        # Split text into sentences first
-        sentences = re.split(r'([。．.!?\n])', text)
-        
-        # Recombine sentences with their punctuation
-        sentences = [''.join(i) for i in zip(sentences[::2], sentences[1::2] + [''])]
-        
-        # Remove empty sentences and strip whitespace
-        sentences = [s.strip() for s in sentences if s.strip()]
-        
         segments = []
-        current_lang = None
-        current_text = []
-        
-        for sentence in sentences:
-            lang = self.detect_language(sentence)
-            
-            # If language changes or it's the first segment, start a new segment
-            if lang != current_lang and current_text:
-                segments.append((current_lang, ' '.join(current_text)))
-                current_text = []
-            
-            current_lang = lang
-            current_text.append(sentence)
-        
-        # Add the last segment
-        if current_text:
-            segments.append((current_lang, ' '.join(current_text)))
-        
+        for run in self._runs.finditer(classify(text)):
+            piece = text[run.start():run.end()]
+            for end in _JAPANESE_SENTENCE_ENDS:
+                piece = piece.replace(end, end + " ")
+            piece = " ".join(piece.split())
+            if piece:
+                # Only text without letters is neutral, and it is read as English
+                segments.append(("en" if run.lastgroup == "neutral" else run.lastgroup, piece))
         return segments
@@ -0,0 +1,92 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class EncoderPool:
+    """Worker threads dedicated to writing and encoding audio output.
+
+    Keeping encoding off the threads that drive synthesis lets one request's encoding
+    overlap with other requests' provider calls. The in-process codecs (libsndfile via
+    soundfile) release the GIL while encoding, so the pool is sized to the CPU cores.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        """Create the pool.
+
+        Args:
+            max_workers: Number of encoder threads (default: the number of CPU cores).
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="encoder")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._stats = {"tasks": 0, "audio_seconds": 0.0, "encode_seconds": 0.0}
+
+    def submit(self, func: Callable, *args, audio_seconds: float = 0.0) -> Future:
+        """Run func(*args) on an encoder thread.
+
+        Args:
+            func: Function that writes or encodes audio.
+            args: Arguments for func.
+            audio_seconds: Duration of the audio func processes, for the throughput metrics.
+
+        Returns:
+            A Future for the result of func.
+        """
+        with self._lock:
+            self._queued += 1
+        return self._executor.submit(self._run, func, args, audio_seconds)
+
+    async def run(self, func: Callable, *args, audio_seconds: float = 0.0) -> Any:
+        """Asynchronous version of submit that waits for the result."""
+        return await asyncio.wrap_future(self.submit(func, *args, audio_seconds=audio_seconds))
+
+    def _run(self, func: Callable, args, audio_seconds: float) -> Any:
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._active -= 1
+                self._stats["tasks"] += 1
+                self._stats["audio_seconds"] += audio_seconds
+                self._stats["encode_seconds"] += elapsed
+
+    def stats(self) -> Dict[str, float]:
+        """Return the pool size, current queue depth and cumulative encoding throughput.
+
+        encode_seconds_per_audio_second is the encoder time spent per second of audio
+        written; values well below 1 mean encoding keeps up with real time comfortably.
+        """
+        with self._lock:
+            stats = dict(self._stats, workers=self.max_workers, queue_depth=self._queued, active=self._active)
+        audio_seconds = stats["audio_seconds"]
+        stats["encode_seconds_per_audio_second"] = stats["encode_seconds"] / audio_seconds if audio_seconds else 0.0
+        return stats
+
+
+_shared_lock = threading.Lock()
+_shared_pool: Optional[EncoderPool] = None
+
+
+def shared_encoder_pool(max_workers: Optional[int] = None) -> EncoderPool:
+    """Return the process-wide encoder pool, creating it on first use.
+
+    Args:
+        max_workers: Number of encoder threads (default: the number of CPU cores);
+            only used when the pool is created.
+    """
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = EncoderPool(max_workers)
+        return _shared_pool
@@ -1,8 +1,80 @@
-import wave
-from pydub import AudioSegment
-import io
+import struct
+from typing import BinaryIO, Union
+import numpy as np
+from src.output.sink import (
+    AudioSink, EncodedFileSink, Mp3PartSink, SoundFileSink, WavFileSink, soundfile_supports
+)
 
 class OutputManager:
+    # Output format: 16-bit, mono PCM, at 16kHz unless another rate is requested
+    sample_rate = 16000
+    sample_width = 2
+    channels = 1
+    # Pause inserted between segments
+    silence_ms = 500
+
+    def silence(self, duration_ms: int = None, sample_rate: int = None) -> bytes:
+        """Return PCM silence (16-bit, mono).
+
+        Args:
+            duration_ms: Duration in milliseconds (default: the pause between segments)
+            sample_rate: Sample rate in Hz (default: 16kHz)
+        """
+        if duration_ms is None:
+            duration_ms = self.silence_ms
+        sample_rate = sample_rate or self.sample_rate
+        return bytes(sample_rate * duration_ms // 1000 * self.sample_width * self.channels)
+
+    def streaming_wav_header(self, sample_rate: int = None) -> bytes:
+        """Return a WAV header for a stream whose length is not known in advance.
+
+        The RIFF and data chunk sizes are set to the maximum value, which players treat as
+        "read until the end of the stream".
+
+        Args:
+            sample_rate: Sample rate in Hz (default: 16kHz)
+        """
+        sample_rate = sample_rate or self.sample_rate
+        byte_rate = sample_rate * self.sample_width * self.channels
+        block_align = self.sample_width * self.channels
+        return (
+            b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE"
+            + b"fmt " + struct.pack("<IHHIIHH", 16, 1, self.channels, sample_rate,
+                                    byte_rate, block_align, self.sample_width * 8)
+            + b"data" + struct.pack("<I", 0xFFFFFFFF)
+        )
+
+    def open_sink(self, output_path: Union[str, BinaryIO], format: str, sample_rate: int = None,
+                  part_cache=None) -> AudioSink:
+        """Open an incremental writer for the output file.
+
+        Args:
+            output_path: Path to save the audio file, or a writable, seekable binary file object
+            format: Output format (wav, mp3, ogg, flac)
+            sample_rate: Sample rate of the audio in Hz (default: 16kHz)
+            part_cache: Cache of encoded parts; if given, mp3 files are assembled from cached,
+                separately encoded segments (see Mp3PartSink)
+
+        Returns:
+            An AudioSink that writes PCM audio (16-bit, mono) to output_path as it
+            arrives; close it to finish the file
+
+        Raises:
+            ValueError: If the format is not supported
+        """
+        format = format.lower()
+        sample_rate = sample_rate or self.sample_rate
+        if format == "wav":
+            return WavFileSink(output_path, sample_rate)
+        if format in ("mp3", "ogg", "flac"):
+            # Encode in-process where libsndfile supports the format; start ffmpeg otherwise
+            if soundfile_supports(format):
+                if format == "mp3" and part_cache is not None:
+                    return Mp3PartSink(output_path, part_cache, sample_rate)
+                return SoundFileSink(output_path, format, sample_rate)
+            return EncodedFileSink(output_path, format, sample_rate)
+        raise ValueError(f"Unsupported format: {format}")
+
     def merge_segments(self, audio_segments):
         """Stitch audio segments with natural transitions.
         
@@ -12,71 +84,48 @@ class OutputManager:
         Returns:
             Merged audio data as bytes with silence between segments
         """
-        # Convert each PCM segment to AudioSegment
-        segments = []
-        for audio_data in audio_segments:
-            # Convert PCM to WAV format in memory
-            wav_data = io.BytesIO()
-            with wave.open(wav_data, "wb") as wf:
-                wf.setnchannels(1)  # mono
-                wf.setsampwidth(2)  # 16-bit
-                wf.setframerate(16000)  # 16kHz
-                wf.writeframes(audio_data)
-            
-            # Create AudioSegment from WAV data
-            wav_data.seek(0)
-            segment = AudioSegment.from_wav(wav_data)
-            segments.append(segment)
-        
-        # Create a short silence
-        silence = AudioSegment.silent(duration=500)  # 500ms silence
-        
-        # Merge segments with silence between them
-        merged = segments[0] if segments else AudioSegment.empty()
-        for segment in segments[1:]:
-            merged = merged + silence + segment
-        
-        # Convert back to PCM format
-        wav_data = io.BytesIO()
-        merged.export(wav_data, format="wav")
-        wav_data.seek(0)
-        
-        # Read the WAV data and extract just the PCM portion
-        with wave.open(wav_data, "rb") as wf:
-            return wf.readframes(wf.getnframes())
+        return self.merge_segments_array(audio_segments).tobytes()
+
+    def merge_segments_array(self, audio_segments) -> np.ndarray:
+        """Stitch audio segments into a single int16 sample array.
+
+        The final length is computed up front and each segment is copied once into a
+        preallocated buffer; the silence between segments is left as zeros. Prefer this
+        over merge_segments when the result is consumed as an array or buffer, since it
+        avoids a copy of the merged audio.
+
+        Args:
+            audio_segments: List of raw PCM audio data (16kHz, 16-bit, mono)
+
+        Returns:
+            Merged audio as a little-endian int16 NumPy array with silence between segments
+        """
+        gap = self.sample_rate * self.silence_ms // 1000
+        lengths = [len(audio_data) // self.sample_width for audio_data in audio_segments]
+        total = sum(lengths) + gap * max(0, len(audio_segments) - 1)
+
+        merged = np.zeros(total, dtype="<i2")
+        position = 0
+        for index, (audio_data, length) in enumerate(zip(audio_segments, lengths)):
+            if index:
+                position += gap
+            merged[position:position + length] = np.frombuffer(audio_data, dtype="<i2", count=length)
+            position += length
+        return merged
 
-    def export_audio(self, audio_data: bytes, output_path: str, format: str):
+    def export_audio(self, audio_data: bytes, output_path: str, format: str, sample_rate: int = None):
         """Export audio data to the specified format.
         
         Args:
-            audio_data: Raw PCM audio data (16kHz, 16-bit, mono)
+            audio_data: Raw PCM audio data (16-bit, mono), as bytes or an int16 array
             output_path: Path to save the audio file
-            format: Output format (wav, mp3, ogg)
+            format: Output format (wav, mp3, ogg, flac)
+            sample_rate: Sample rate of audio_data in Hz (default: 16kHz)
         """
         print(f"Exporting audio to {output_path} in {format} format")
         try:
-            # First convert the PCM data to WAV
-            wav_data = io.BytesIO()
-            with wave.open(wav_data, "wb") as wf:
-                wf.setnchannels(1)  # mono
-                wf.setsampwidth(2)  # 16-bit
-                wf.setframerate(16000)  # 16kHz
-                wf.writeframes(audio_data)
-            
-            # Convert to the desired format using pydub
-            wav_data.seek(0)
-            audio = AudioSegment.from_wav(wav_data)
-            
-            format = format.lower()
-            if format == "wav":
-                audio.export(output_path, format="wav")
-            elif format == "mp3":
-                audio.export(output_path, format="mp3")
-            elif format == "ogg":
-                audio.export(output_path, format="ogg")
-            else:
-                raise ValueError(f"Unsupported format: {format}")
-                
+            with self.open_sink(output_path, format, sample_rate) as sink:
+                sink.write(audio_data)
         except Exception as e:
             print(f"Error exporting audio: {str(e)}")
             raise
@@ -0,0 +1,175 @@
+from typing import Optional
+import numpy as np
+
+# Punctuation that ends a sentence or a clause, in English and Japanese
+SENTENCE_END = ".!?。！？"
+CLAUSE_END = ",;:、，；："
+
+
+class GapPolicy:
+    """Chooses the pause between two segments from the punctuation and a language change."""
+
+    def __init__(self, sentence_gap_ms: int = 500, clause_gap_ms: int = 250,
+                 continuation_gap_ms: int = 100, language_change_gap_ms: int = 150):
+        """Create the policy.
+
+        Args:
+            sentence_gap_ms: Pause after a segment that ends a sentence.
+            clause_gap_ms: Pause after a segment that ends with a comma or similar.
+            continuation_gap_ms: Pause after a segment that ends mid-sentence.
+            language_change_gap_ms: Extra pause when the language changes between segments.
+        """
+        self.sentence_gap_ms = sentence_gap_ms
+        self.clause_gap_ms = clause_gap_ms
+        self.continuation_gap_ms = continuation_gap_ms
+        self.language_change_gap_ms = language_change_gap_ms
+
+    def gap_ms(self, previous_text: str, previous_language: str, next_language: str) -> int:
+        """Return the pause in milliseconds between a segment and the one after it."""
+        last_char = previous_text.rstrip()[-1:]
+        if last_char and last_char in SENTENCE_END:
+            gap = self.sentence_gap_ms
+        elif last_char and last_char in CLAUSE_END:
+            gap = self.clause_gap_ms
+        else:
+            gap = self.continuation_gap_ms
+        if previous_language[:2] != next_language[:2]:
+            gap += self.language_change_gap_ms
+        return gap
+
+
+class PostProcessor:
+    """Evens out synthesized segments before they are written.
+
+    Trims leading and trailing silence and applies a gain to each segment so its RMS level
+    (measured over the non-silent part) approaches a common target, which evens out the
+    loudness differences between voices and providers. Everything works on int16 NumPy
+    arrays in a few vectorized passes.
+    """
+
+    def __init__(self, sample_rate: int = 16000, target_dbfs: float = -20.0,
+                 trim_threshold_dbfs: float = -45.0, max_gain_db: float = 12.0,
+                 frame_ms: int = 10, padding_ms: int = 20, gap_policy: Optional[GapPolicy] = None):
+        """Create the stage.
+
+        Args:
+            sample_rate: Default sample rate of the audio in Hz.
+            target_dbfs: Target RMS level of each segment, in dB relative to full scale.
+            trim_threshold_dbfs: Frames quieter than this are silence.
+            max_gain_db: Largest amplification applied to a quiet segment.
+            frame_ms: Length of the frames the energy is measured over.
+            padding_ms: Silence kept before the first and after the last loud frame.
+            gap_policy: Pauses between segments (default: GapPolicy()).
+        """
+        self.sample_rate = sample_rate
+        self.target_dbfs = target_dbfs
+        self.trim_threshold_dbfs = trim_threshold_dbfs
+        self.max_gain_db = max_gain_db
+        self.frame_ms = frame_ms
+        self.padding_ms = padding_ms
+        self.gap_policy = gap_policy or GapPolicy()
+
+    @classmethod
+    def from_config(cls, config) -> Optional["PostProcessor"]:
+        """Build the stage described by config, or None if post-processing is disabled."""
+        if not config.postprocess_enabled:
+            return None
+        return cls(
+            target_dbfs=config.postprocess_target_dbfs,
+            trim_threshold_dbfs=config.postprocess_trim_threshold_dbfs,
+            gap_policy=GapPolicy(
+                sentence_gap_ms=config.sentence_gap_ms,
+                clause_gap_ms=config.clause_gap_ms,
+                continuation_gap_ms=config.continuation_gap_ms,
+                language_change_gap_ms=config.language_change_gap_ms,
+            ),
+        )
+
+    def process(self, audio_data, sample_rate: Optional[int] = None) -> np.ndarray:
+        """Trim and level one segment.
+
+        Args:
+            audio_data: Raw PCM audio data (16-bit, mono), as bytes or an int16 array
+            sample_rate: Sample rate of audio_data in Hz (default: self.sample_rate)
+
+        Returns:
+            The processed segment as a little-endian int16 array
+        """
+        sample_rate = sample_rate or self.sample_rate
+        frame_size = max(1, sample_rate * self.frame_ms // 1000)
+        padding = sample_rate * self.padding_ms // 1000
+        samples = np.frombuffer(audio_data, dtype="<i2")
+        frame_energy = self._frame_energy(samples, frame_size)
+        loud = np.flatnonzero(frame_energy > self._power(self.trim_threshold_dbfs))
+        if loud.size == 0:
+            return samples[:0]
+
+        start = max(0, loud[0] * frame_size - padding)
+        end = min(len(samples), (loud[-1] + 1) * frame_size + padding)
+        return self._apply_gain(samples[start:end], self._gain(frame_energy[loud].mean()))
+
+    def stream(self, sample_rate: Optional[int] = None) -> "SegmentStream":
+        """Return a SegmentStream that processes one segment arriving in chunks."""
+        return SegmentStream(self, sample_rate or self.sample_rate)
+
+    def gap_ms(self, previous_text: str, previous_language: str, next_language: str) -> int:
+        """Return the pause in milliseconds between two segments (see GapPolicy)."""
+        return self.gap_policy.gap_ms(previous_text, previous_language, next_language)
+
+    def _gain(self, rms_power: float) -> float:
+        return min(np.sqrt(self._power(self.target_dbfs) / rms_power), 10 ** (self.max_gain_db / 20))
+
+    @staticmethod
+    def _apply_gain(samples: np.ndarray, gain: float) -> np.ndarray:
+        if abs(gain - 1.0) < 1e-3:
+            return samples
+        return np.clip(samples * np.float32(gain), -32768, 32767).astype("<i2")
+
+    @staticmethod
+    def _frame_energy(samples: np.ndarray, frame_size: int) -> np.ndarray:
+        # Mean power of each frame; the last, partial frame is zero-padded
+        frames = -(-len(samples) // frame_size)
+        padded = np.zeros(frames * frame_size, dtype=np.float32)
+        padded[:len(samples)] = samples
+        return np.square(padded).reshape(frames, frame_size).mean(axis=1)
+
+    @staticmethod
+    def _power(dbfs: float) -> float:
+        return (32768.0 * 10 ** (dbfs / 20)) ** 2
+
+
+class SegmentStream:
+    """PostProcessor for one segment whose PCM arrives in chunks, for progressive playback.
+
+    Chunks pass through as they arrive instead of waiting for the end of the segment, so
+    the processing is an approximation of PostProcessor.process: leading silence is
+    trimmed down to the padding, and the gain is measured on the first chunk that holds
+    audio above the trim threshold and applied to the rest of the segment. Trailing
+    silence is kept.
+    """
+
+    def __init__(self, postprocessor: PostProcessor, sample_rate: int):
+        self.postprocessor = postprocessor
+        self.frame_size = max(1, sample_rate * postprocessor.frame_ms // 1000)
+        self.padding = sample_rate * postprocessor.padding_ms // 1000
+        # Set once the first loud chunk has arrived
+        self.gain: Optional[float] = None
+        # The end of the leading silence so far, kept as padding before the first loud frame
+        self._lead = np.zeros(0, dtype="<i2")
+
+    def process(self, chunk) -> np.ndarray:
+        """Process the next chunk of raw PCM (16-bit, mono); return the samples to play."""
+        postprocessor = self.postprocessor
+        samples = np.frombuffer(chunk, dtype="<i2")
+        if self.gain is not None:
+            return postprocessor._apply_gain(samples, self.gain)
+
+        samples = np.concatenate([self._lead, samples])
+        frame_energy = postprocessor._frame_energy(samples, self.frame_size)
+        loud = np.flatnonzero(frame_energy > postprocessor._power(postprocessor.trim_threshold_dbfs))
+        if loud.size == 0:
+            self._lead = samples[len(samples) - self.padding:] if self.padding else samples[:0]
+            return samples[:0]
+        self.gain = postprocessor._gain(frame_energy[loud].mean())
+        start = max(0, loud[0] * self.frame_size - self.padding)
+        return postprocessor._apply_gain(samples[start:], self.gain)
@@ -0,0 +1,123 @@
+import functools
+from math import gcd
+from typing import Tuple
+import numpy as np
+
+# Zero crossings of the sinc kernel on each side, and the Kaiser window shape
+_ZERO_CROSSINGS = 8
+_KAISER_BETA = 8.0
+# Fraction of the lower Nyquist frequency kept, leaving room for the filter's transition band
+_ROLLOFF = 0.94
+# Output samples computed per vectorized block, to bound the size of temporary arrays
+_BLOCK = 16384
+
+
+@functools.lru_cache(maxsize=32)
+def _polyphase_kernel(up: int, down: int) -> Tuple[np.ndarray, int]:
+    """Return the polyphase filter bank for resampling by up/down, and its half width in input samples.
+
+    Row p holds the taps for output samples whose position falls p/up of the way between two
+    input samples; column j + half multiplies the input sample at offset j from the nearest
+    preceding one.
+    """
+    scale = max(up, down)
+    width = _ZERO_CROSSINGS * scale
+    half = width // up + 1
+    offsets = np.arange(-half, half + 1)
+    # Distance from each tap to the output position, in units of the upsampled rate
+    m = np.arange(up)[:, None] - offsets[None, :] * up
+    x = m / scale
+    window = np.i0(_KAISER_BETA * np.sqrt(np.clip(1 - (m / width) ** 2, 0, None))) / np.i0(_KAISER_BETA)
+    kernel = _ROLLOFF * np.sinc(_ROLLOFF * x) * window * up / scale
+    kernel[np.abs(m) > width] = 0.0
+    return kernel.astype(np.float32), half
+
+
+class Resampler:
+    """Converts 16-bit mono PCM between sample rates with a windowed-sinc polyphase filter.
+
+    Audio can be fed in chunks of any size: the resampler keeps the input history its
+    filter needs, so chunked output is identical to resampling the whole signal at once.
+    Filter kernels are cached per rate pair and shared between instances.
+    """
+
+    def __init__(self, from_rate: int, to_rate: int):
+        """Create a resampler.
+
+        Args:
+            from_rate: Sample rate of the input in Hz.
+            to_rate: Sample rate of the output in Hz.
+        """
+        divisor = gcd(from_rate, to_rate)
+        self.from_rate = from_rate
+        self.to_rate = to_rate
+        self.up = to_rate // divisor
+        self.down = from_rate // divisor
+        self._kernel, self._half = _polyphase_kernel(self.up, self.down)
+        self._offsets = np.arange(-self._half, self._half + 1)
+        # Input history, starting at absolute input index _buffer_start (zeros before the signal)
+        self._buffer = np.zeros(self._half, dtype=np.float32)
+        self._buffer_start = -self._half
+        self._received = 0
+        self._produced = 0
+
+    def process(self, audio_data) -> np.ndarray:
+        """Resample the next chunk of input.
+
+        Args:
+            audio_data: Raw PCM audio data (16-bit, mono), as bytes or an int16 array
+
+        Returns:
+            The output samples that can be computed so far, as a little-endian int16 array
+        """
+        samples = np.frombuffer(audio_data, dtype="<i2")
+        self._buffer = np.concatenate([self._buffer, samples.astype(np.float32)])
+        self._received += len(samples)
+        # Output n needs input up to index n * down // up + half
+        ready = ((self._received - self._half) * self.up - 1) // self.down + 1
+        return self._emit(max(ready, self._produced))
+
+    def pending(self) -> bool:
+        """Return True if flush would return more output."""
+        return self._produced < -(-self._received * self.up // self.down)
+
+    def flush(self) -> np.ndarray:
+        """Return the remaining output once all input has been processed."""
+        total = -(-self._received * self.up // self.down)
+        self._buffer = np.concatenate([self._buffer, np.zeros(self._half + 1, dtype=np.float32)])
+        return self._emit(total)
+
+    def _emit(self, end: int) -> np.ndarray:
+        blocks = []
+        for block_start in range(self._produced, end, _BLOCK):
+            n = np.arange(block_start, min(block_start + _BLOCK, end), dtype=np.int64)
+            position = n * self.down
+            nearest = position // self.up
+            taps = self._buffer[(nearest - self._buffer_start)[:, None] + self._offsets[None, :]]
+            values = np.einsum("ij,ij->i", taps, self._kernel[position % self.up])
+            blocks.append(np.clip(np.rint(values), -32768, 32767).astype("<i2"))
+        self._produced = max(self._produced, end)
+
+        # Drop input that no later output needs
+        keep_from = self._produced * self.down // self.up - self._half
+        if keep_from > self._buffer_start:
+            self._buffer = self._buffer[keep_from - self._buffer_start:]
+            self._buffer_start = keep_from
+        return np.concatenate(blocks) if blocks else np.zeros(0, dtype="<i2")
+
+
+def resample(audio_data, from_rate: int, to_rate: int) -> np.ndarray:
+    """Resample a complete segment of 16-bit mono PCM.
+
+    Args:
+        audio_data: Raw PCM audio data (16-bit, mono), as bytes or an int16 array
+        from_rate: Sample rate of audio_data in Hz
+        to_rate: Requested sample rate in Hz
+
+    Returns:
+        The resampled audio as a little-endian int16 array
+    """
+    if from_rate == to_rate:
+        return np.frombuffer(audio_data, dtype="<i2")
+    resampler = Resampler(from_rate, to_rate)
+    return np.concatenate([resampler.process(audio_data), resampler.flush()])
@@ -0,0 +1,416 @@
+"""Incremental audio writers.
+
+An AudioSink receives PCM audio (16-bit, mono) piece by piece and writes it to its
+destination as it arrives, so memory use does not depend on the length of the output.
+"""
+import hashlib
+import io
+import os
+import shutil
+import struct
+import subprocess
+import threading
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Union
+import numpy as np
+from src.cache import make_cache_key
+from src.speech.exceptions import TTSInvalidInputError
+
+try:
+    import soundfile
+except (ImportError, OSError):
+    # soundfile is missing, or libsndfile could not be loaded
+    soundfile = None
+
+# Largest data chunk a WAV header can describe: the RIFF size (36 header bytes, the data
+# and its padding byte) must fit in 32 bits
+WAV_MAX_DATA_SIZE = 0xFFFFFFFF - 36 - 1
+
+# libsndfile (format, subtype) for the compressed formats it can encode in-process
+SOUNDFILE_FORMATS = {
+    "flac": ("FLAC", "PCM_16"),
+    "ogg": ("OGG", "VORBIS"),
+    "mp3": ("MP3", "MPEG_LAYER_III"),
+}
+
+# MPEG audio Layer III bitrates (kbit/s) and sample rates, by MPEG version (3: MPEG-1, 2: MPEG-2, 0: MPEG-2.5)
+_MP3_BITRATES = {
+    3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+# Samples an mp3 decoder drops from the start of a file (its own delay)
+MP3_DECODER_DELAY = 529
+
+# Largest block of silence written at once
+_SILENCE_BLOCK = bytes(64 * 1024)
+
+
+class AudioSink(ABC):
+    """Destination for a stream of 16-bit mono PCM audio."""
+
+    def __init__(self, sample_rate: int = 16000):
+        self.sample_rate = sample_rate
+        self.bytes_written = 0
+
+    @abstractmethod
+    def write(self, audio_data) -> None:
+        """Append PCM audio (bytes, or any buffer such as an int16 NumPy array)."""
+        pass
+
+    def write_silence(self, duration_ms: int) -> None:
+        """Append duration_ms of silence."""
+        remaining = self.sample_rate * duration_ms // 1000 * 2
+        while remaining > 0:
+            block = _SILENCE_BLOCK[:min(remaining, len(_SILENCE_BLOCK))]
+            self.write(block)
+            remaining -= len(block)
+
+    @abstractmethod
+    def close(self) -> None:
+        """Finish the output. The sink cannot be written to afterwards."""
+        pass
+
+    @abstractmethod
+    def abort(self) -> None:
+        """Stop writing and discard the partial output, if the sink created it."""
+        pass
+
+    def __enter__(self) -> "AudioSink":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class WavFileSink(AudioSink):
+    """Writes a WAV file incrementally.
+
+    The header is written up front with placeholder sizes, which are patched in
+    when the sink is closed, so only the data being written is held in memory.
+    WAV sizes are 32-bit, so a write that would take the data past WAV_MAX_DATA_SIZE
+    (about 37 hours at 16 kHz) fails at once rather than when the sink is closed.
+    """
+
+    def __init__(self, output: Union[str, BinaryIO], sample_rate: int = 16000):
+        """Open a WAV sink.
+
+        Args:
+            output: Path of the file to create, or a writable, seekable binary file object.
+                   File objects are left open when the sink is closed.
+            sample_rate: Sample rate of the audio in Hz.
+        """
+        super().__init__(sample_rate)
+        self._path = output if isinstance(output, str) else None
+        self._file = open(output, "wb") if self._path else output
+        self._start = self._file.tell()
+        self._file.write(self._header(0))
+
+    def _header(self, data_size: int) -> bytes:
+        return (
+            b"RIFF" + struct.pack("<I", 36 + data_size) + b"WAVE"
+            + b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, self.sample_rate, self.sample_rate * 2, 2, 16)
+            + b"data" + struct.pack("<I", data_size)
+        )
+
+    def write(self, audio_data) -> None:
+        data = memoryview(audio_data).cast("B")
+        if self.bytes_written + len(data) > WAV_MAX_DATA_SIZE:
+            raise TTSInvalidInputError(
+                f"Audio exceeds the WAV size limit of {WAV_MAX_DATA_SIZE} bytes; use mp3, ogg or flac"
+            )
+        self._file.write(data)
+        self.bytes_written += len(data)
+
+    def close(self) -> None:
+        if self.bytes_written % 2:
+            # RIFF chunks are padded to an even size
+            self._file.write(b"\x00")
+        end = self._file.tell()
+        self._file.seek(self._start)
+        self._file.write(self._header(self.bytes_written))
+        self._file.seek(end)
+        if self._path:
+            self._file.close()
+
+    def abort(self) -> None:
+        if self._path:
+            self._file.close()
+            try:
+                os.unlink(self._path)
+            except FileNotFoundError:
+                pass
+
+
+def soundfile_supports(format: str) -> bool:
+    """Return True if the installed libsndfile can encode format ('flac', 'ogg', 'mp3') in-process."""
+    if soundfile is None or format not in SOUNDFILE_FORMATS:
+        return False
+    return soundfile.check_format(*SOUNDFILE_FORMATS[format])
+
+
+class SoundFileSink(AudioSink):
+    """Encodes a compressed audio file (flac, ogg/vorbis, mp3) in-process with libsndfile.
+
+    Audio is encoded as it is written, without starting an encoder process.
+    """
+
+    def __init__(self, output: Union[str, BinaryIO], format: str, sample_rate: int = 16000):
+        """Open the encoder.
+
+        Args:
+            output: Path of the file to create, or a writable, seekable binary file object.
+            format: 'flac', 'ogg' or 'mp3' (see soundfile_supports).
+            sample_rate: Sample rate of the audio in Hz.
+        """
+        super().__init__(sample_rate)
+        self._path = output if isinstance(output, str) else None
+        container, subtype = SOUNDFILE_FORMATS[format]
+        self._file = soundfile.SoundFile(
+            output, "w", samplerate=sample_rate, channels=1, format=container, subtype=subtype
+        )
+
+    def write(self, audio_data) -> None:
+        samples = np.frombuffer(audio_data, dtype="<i2")
+        self._file.write(samples)
+        self.bytes_written += samples.nbytes
+
+    def close(self) -> None:
+        self._file.close()
+
+    def abort(self) -> None:
+        self._file.close()
+        if self._path:
+            try:
+                os.unlink(self._path)
+            except FileNotFoundError:
+                pass
+
+
+class EncodedFileSink(AudioSink):
+    """Writes a compressed audio file by piping PCM into an ffmpeg encoder.
+
+    Used for formats the installed libsndfile cannot encode. Audio is encoded as it is
+    written, so the uncompressed output is never held in memory.
+    """
+
+    def __init__(self, output: Union[str, BinaryIO], format: str, sample_rate: int = 16000):
+        """Start the encoder.
+
+        Args:
+            output: Path of the file to create, or a writable binary file object.
+            format: Output container format understood by ffmpeg (e.g. 'mp3', 'ogg', 'flac').
+            sample_rate: Sample rate of the audio in Hz.
+        """
+        super().__init__(sample_rate)
+        self._path = output if isinstance(output, str) else None
+        self._process = subprocess.Popen(
+            [
+                "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+                "-f", "s16le", "-ar", str(sample_rate), "-ac", "1", "-i", "pipe:0",
+                "-f", format, self._path or "pipe:1",
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL if self._path else subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        self._copier = None
+        if not self._path:
+            # Drain the encoder's output while input is still being written
+            self._copier = threading.Thread(
+                target=shutil.copyfileobj, args=(self._process.stdout, output), daemon=True
+            )
+            self._copier.start()
+
+    def write(self, audio_data) -> None:
+        data = memoryview(audio_data).cast("B")
+        self._process.stdin.write(data)
+        self.bytes_written += len(data)
+
+    def close(self) -> None:
+        self._process.stdin.close()
+        stderr = self._process.stderr.read()
+        if self._copier is not None:
+            self._copier.join()
+        if self._process.wait() != 0:
+            raise RuntimeError(f"Encoding failed: {stderr.decode(errors='replace').strip()}")
+
+    def abort(self) -> None:
+        self._process.kill()
+        self._process.wait()
+        if self._copier is not None:
+            self._copier.join()
+        if self._path:
+            try:
+                os.unlink(self._path)
+            except FileNotFoundError:
+                pass
+
+
+def _mp3_frame_length(header: bytes) -> int:
+    """Return the length of the MPEG audio Layer III frame starting with header, or 0 if it is not one."""
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE6 != 0xE2:
+        return 0
+    version = header[1] >> 3 & 3
+    if version == 1:
+        return 0
+    bitrate = _MP3_BITRATES[3 if version == 3 else 2][header[2] >> 4] * 1000
+    sample_rate = (_MP3_SAMPLE_RATES[version] + (0,))[header[2] >> 2 & 3]
+    if not bitrate or not sample_rate:
+        return 0
+    return (144 if version == 3 else 72) * bitrate // sample_rate + (header[2] >> 1 & 1)
+
+
+def _mp3_tag_offset(header: bytes) -> int:
+    """Return the offset of a Xing/Info tag within the frame starting with header."""
+    mono = header[3] >> 6 == 3
+    side_info = (17 if mono else 32) if header[1] >> 3 & 3 == 3 else (9 if mono else 17)
+    return 4 + side_info + (0 if header[1] & 1 else 2)
+
+
+def mp3_audio_frames(data: bytes) -> bytes:
+    """Return the MPEG audio frames of an mp3 file, without tags or a Xing/Info header frame.
+
+    Streams of bare frames can be concatenated into a valid mp3: every frame is
+    self-describing, and an encoder's first frame never refers back to earlier data.
+    The Xing/Info frame is dropped because it describes one part only.
+    """
+    start, end = 0, len(data)
+    if data[:3] == b"ID3" and len(data) >= 10:
+        # ID3v2 tag with a syncsafe size
+        start = 10 + ((data[6] & 0x7F) << 21 | (data[7] & 0x7F) << 14 | (data[8] & 0x7F) << 7 | data[9] & 0x7F)
+    if end - start >= 128 and data[end - 128:end - 125] == b"TAG":
+        end -= 128
+    frame_length = _mp3_frame_length(data[start:start + 4])
+    if frame_length:
+        tag_offset = start + _mp3_tag_offset(data[start:start + 4])
+        if data[tag_offset:tag_offset + 4] in (b"Xing", b"Info"):
+            start += frame_length
+    return data[start:end]
+
+
+def mp3_samples_per_frame(header: bytes) -> int:
+    """Return the number of samples per channel in the Layer III frame starting with header."""
+    return 1152 if header[1] >> 3 & 3 == 3 else 576
+
+
+def mp3_frame_count(frames: bytes) -> int:
+    """Return the number of frames in a stream of bare MPEG audio frames."""
+    count = offset = 0
+    while True:
+        frame_length = _mp3_frame_length(frames[offset:offset + 4])
+        if not frame_length:
+            return count
+        count += 1
+        offset += frame_length
+
+
+def mp3_xing_frame(header: bytes, frames: int, size: int) -> bytes:
+    """Build a Xing header frame stating the frame count and byte size of a whole mp3.
+
+    Args:
+        header: Header of the stream's first audio frame; the Xing frame uses the same format.
+        frames: Number of audio frames in the file.
+        size: Size of the file in bytes, including the Xing frame.
+    """
+    # Same version, bitrate and channel mode; no CRC and no padding
+    header = bytes([header[0], header[1] | 1, header[2] & ~2 & 0xFF, header[3]])
+    frame = bytearray(_mp3_frame_length(header))
+    frame[:4] = header
+    tag_offset = _mp3_tag_offset(header)
+    # Flags: frame count and byte size present
+    frame[tag_offset:tag_offset + 16] = b"Xing" + struct.pack(">III", 3, frames, size)
+    return bytes(frame)
+
+
+class Mp3PartSink(AudioSink):
+    """Builds an mp3 file from independently encoded parts joined at frame boundaries.
+
+    Each write becomes one part, together with any silence written just before it (the
+    pause before a segment). Parts are encoded in-process with libsndfile and kept in a
+    cache keyed by a hash of their PCM, so audio that appears again in another request
+    is copied instead of encoded. A Xing frame describing the whole file is written
+    first and filled in on close.
+
+    A part decodes longer than its input by the encoder delay plus the padding of its last
+    frame: 1100-1700 samples, or 70-110 ms at 16 kHz and twice that at 8 kHz. The sink
+    keeps count of this excess and shortens the following pauses by it, so pauses and the
+    total length do not drift. Each segment may still start up to one part's excess late,
+    and pauses shorter than the excess carry the rest over to the next pause.
+    """
+
+    def __init__(self, output: Union[str, BinaryIO], cache, sample_rate: int = 16000):
+        """Open the sink.
+
+        Args:
+            output: Path of the file to create, or a writable, seekable binary file object.
+            cache: Cache of encoded parts with get(key) and put(key, value), e.g. a TwoTierCache.
+            sample_rate: Sample rate of the audio in Hz.
+        """
+        super().__init__(sample_rate)
+        self._path = output if isinstance(output, str) else None
+        self._file = open(output, "wb") if self._path else output
+        self._start = self._file.tell()
+        self._cache = cache
+        self._pending_silence = 0
+        self._header = None
+        self._frames = 0
+        # Decoded samples ahead of the input so far; the decoder drops its delay once per file
+        self._excess = -MP3_DECODER_DELAY
+
+    def write_silence(self, duration_ms: int) -> None:
+        self._pending_silence += self.sample_rate * duration_ms // 1000
+
+    def write(self, audio_data) -> None:
+        samples = np.frombuffer(audio_data, dtype="<i2")
+        # Take back the excess of earlier parts from the pause before this one
+        cut = min(max(self._excess, 0), self._pending_silence)
+        self._pending_silence -= cut
+        self._excess -= cut
+        if not self._pending_silence and not len(samples):
+            return
+        key = make_cache_key(
+            "mp3", self.sample_rate, self._pending_silence, hashlib.sha256(np.ascontiguousarray(samples)).hexdigest()
+        )
+        frames = self._cache.get(key)
+        if frames is None:
+            frames = self._encode(np.concatenate([np.zeros(self._pending_silence, dtype="<i2"), samples]))
+            self._cache.put(key, frames)
+        if self._header is None:
+            # Reserve room for the Xing frame, which has the size of a frame in this format
+            self._header = frames[:4]
+            self._file.write(mp3_xing_frame(self._header, 0, 0))
+        self._file.write(frames)
+        frame_count = mp3_frame_count(frames)
+        self._frames += frame_count
+        self._excess += frame_count * mp3_samples_per_frame(frames) - self._pending_silence - len(samples)
+        self.bytes_written += (self._pending_silence + len(samples)) * 2
+        self._pending_silence = 0
+
+    def _encode(self, samples: np.ndarray) -> bytes:
+        buffer = io.BytesIO()
+        with SoundFileSink(buffer, "mp3", self.sample_rate) as sink:
+            sink.write(samples)
+        return mp3_audio_frames(buffer.getvalue())
+
+    def close(self) -> None:
+        if self._pending_silence:
+            self.write(b"")
+        if self._header is not None:
+            end = self._file.tell()
+            self._file.seek(self._start)
+            self._file.write(mp3_xing_frame(self._header, self._frames, end - self._start))
+            self._file.seek(end)
+        if self._path:
+            self._file.close()
+
+    def abort(self) -> None:
+        if self._path:
+            self._file.close()
+            try:
+                os.unlink(self._path)
+            except FileNotFoundError:
+                pass
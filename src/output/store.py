@@ -0,0 +1,485 @@
+import asyncio
+import contextlib
+import hashlib
+import heapq
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import AsyncIterator, BinaryIO, Callable, ContextManager, Dict, Iterator, List, Optional, Tuple
+
+MEDIA_TYPES = {
+    "wav": "audio/wav",
+    "mp3": "audio/mpeg",
+    "ogg": "audio/ogg",
+    "flac": "audio/flac",
+}
+
+
+def media_type(filename: str) -> str:
+    """Return the MIME type of an audio file name."""
+    return MEDIA_TYPES.get(os.path.splitext(filename)[1].lstrip(".").lower(), "application/octet-stream")
+
+
+def content_etag(data: bytes) -> str:
+    """Return a strong HTTP entity tag derived from the SHA-256 of the content."""
+    return f'"{hashlib.sha256(data).hexdigest()[:32]}"'
+
+
+def file_etag(path: str) -> str:
+    """Return content_etag of a file's contents, reading it in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def _is_plain_name(name: str) -> bool:
+    # Request IDs and file names come from URLs; never let them leave the store directory
+    return bool(name) and not name.startswith(".") and os.path.basename(name) == name
+
+
+class StoredAudio:
+    """A generated audio file, held either in memory (data) or on disk (path).
+
+    size is its length in bytes and etag an entity tag derived from its content, so
+    identical audio always gets the same tag.
+    """
+
+    def __init__(self, filename: str, size: int, etag: str, data: Optional[bytes] = None,
+                 path: Optional[str] = None):
+        self.filename = filename
+        self.size = size
+        self.etag = etag
+        self.data = data
+        self.path = path
+        self.media_type = media_type(filename)
+
+
+class AudioStore(ABC):
+    """Holds generated audio until the client fetches it or it expires.
+
+    Entries are addressed by request ID and file name. Audio is written through
+    writer(), so a store can decide where the bytes go before they are produced.
+    """
+
+    @abstractmethod
+    def writer(self, request_id: str, filename: str) -> ContextManager[BinaryIO]:
+        """Return a context manager yielding a writable, seekable binary file.
+
+        The entry becomes visible when the block exits without an exception; if it
+        raises, whatever was written is discarded.
+        """
+        pass
+
+    def disk_writer(self, request_id: str, filename: str) -> ContextManager[BinaryIO]:
+        """Return a writer() whose output is written to disk, for audio of unbounded size.
+
+        Stores that already write to disk return writer().
+        """
+        return self.writer(request_id, filename)
+
+    @contextlib.asynccontextmanager
+    async def awriter(self, request_id: str, filename: str, disk: bool = False) -> AsyncIterator[BinaryIO]:
+        """Async version of writer() (or disk_writer() if disk is set) for use on an event loop.
+
+        Opening the entry and finalizing it (hashing the content, renaming the file into
+        place) run on a worker thread, so a large output does not block the loop.
+        """
+        manager = self.disk_writer(request_id, filename) if disk else self.writer(request_id, filename)
+        output = await asyncio.to_thread(manager.__enter__)
+        try:
+            yield output
+        except BaseException as e:
+            if not await asyncio.to_thread(manager.__exit__, type(e), e, e.__traceback__):
+                raise
+        else:
+            await asyncio.to_thread(manager.__exit__, None, None, None)
+
+    @abstractmethod
+    def get(self, request_id: str, filename: str) -> Optional[StoredAudio]:
+        """Return the entry, or None if it does not exist or has expired."""
+        pass
+
+    @abstractmethod
+    def delete(self, request_id: str) -> bool:
+        """Delete every file of a request. Returns False if there was none."""
+        pass
+
+    @abstractmethod
+    def purge_expired(self) -> int:
+        """Delete expired entries and return how many were deleted."""
+        pass
+
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        """Return the number of stored entries and bytes, and counters of removed entries."""
+        pass
+
+
+class _SpillingBuffer:
+    """Writable, seekable binary file kept in memory until it grows past a threshold.
+
+    The first write that would take it past the threshold calls open_spill() for a file
+    to continue in, copies what was written so far into it and delegates to it from then
+    on. open_spill may raise instead, which aborts the write.
+    """
+
+    def __init__(self, threshold: int, open_spill: Callable[[], BinaryIO]):
+        self._file: BinaryIO = io.BytesIO()
+        self._threshold = threshold
+        self._open_spill = open_spill
+        self.spilled = False
+
+    def write(self, data) -> int:
+        # Writes before the end never grow the file, so position + length is its new size
+        if not self.spilled and self._file.tell() + len(data) > self._threshold:
+            self._spill()
+        return self._file.write(data)
+
+    def getvalue(self) -> bytes:
+        return self._file.getvalue()
+
+    def _spill(self) -> None:
+        file = self._open_spill()
+        position = self._file.tell()
+        file.write(self._file.getvalue())
+        file.seek(position)
+        self._file = file
+        self.spilled = True
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+class MemoryAudioStore(AudioStore):
+    """Keeps generated audio in memory, bounded by a total size and a time to live.
+
+    When a new entry does not fit, expired entries are dropped first, then the oldest.
+    Entries larger than spill_bytes are moved to spill_store while they are written, so
+    a long render never has to fit in memory; without a spill store, a write that grows
+    past the limit fails as soon as it does.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float, spill_store: Optional[AudioStore] = None,
+                 spill_bytes: Optional[int] = None):
+        """Create the store.
+
+        Args:
+            max_bytes: Total size of the audio kept in memory.
+            ttl_seconds: How long an entry stays available after it is written.
+            spill_store: Store receiving the entries larger than spill_bytes (default: none).
+            spill_bytes: Size from which an entry is written to spill_store
+                (default and maximum: max_bytes).
+        """
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.spill_store = spill_store
+        self.spill_bytes = min(spill_bytes or max_bytes, max_bytes)
+        self._lock = threading.Lock()
+        # (request_id, filename) -> (expiry time, data, etag), oldest first
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, bytes, str]]" = OrderedDict()
+        self.current_bytes = 0
+        self._stats = {"expired": 0, "evicted": 0, "deleted": 0, "bytes_reclaimed": 0}
+
+    @contextlib.contextmanager
+    def writer(self, request_id: str, filename: str) -> Iterator[BinaryIO]:
+        with contextlib.ExitStack() as stack:
+            def open_spill() -> BinaryIO:
+                if self.spill_store is None:
+                    raise ValueError(f"Audio exceeds the audio store limit of {self.max_bytes} bytes")
+                return stack.enter_context(self.spill_store.writer(request_id, filename))
+
+            buffer = _SpillingBuffer(self.spill_bytes, open_spill)
+            yield buffer
+            if not buffer.spilled:
+                self.put(request_id, filename, buffer.getvalue())
+                return
+        # The spill store's writer has committed the entry; drop an older one kept in memory
+        with self._lock:
+            self._remove((request_id, filename), "deleted")
+
+    def disk_writer(self, request_id: str, filename: str) -> ContextManager[BinaryIO]:
+        """Write straight to the spill store; without one, this is writer()."""
+        if self.spill_store is None:
+            return self.writer(request_id, filename)
+        return self.spill_store.writer(request_id, filename)
+
+    def put(self, request_id: str, filename: str, data: bytes) -> None:
+        """Store data for a request.
+
+        Raises:
+            ValueError: If data is larger than the whole store.
+        """
+        if len(data) > self.max_bytes:
+            raise ValueError(f"Audio of {len(data)} bytes exceeds the audio store limit of {self.max_bytes} bytes")
+        key = (request_id, filename)
+        etag = content_etag(data)
+        with self._lock:
+            self._remove(key, "deleted")
+            self._purge_expired(time.monotonic())
+            while self.current_bytes + len(data) > self.max_bytes:
+                self._remove(next(iter(self._entries)), "evicted")
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, data, etag)
+            self.current_bytes += len(data)
+
+    def get(self, request_id: str, filename: str) -> Optional[StoredAudio]:
+        with self._lock:
+            entry = self._entries.get((request_id, filename))
+            if entry is not None and entry[0] > time.monotonic():
+                return StoredAudio(filename, len(entry[1]), entry[2], data=entry[1])
+        if self.spill_store is not None:
+            return self.spill_store.get(request_id, filename)
+        return None
+
+    def delete(self, request_id: str) -> bool:
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == request_id]
+            for key in keys:
+                self._remove(key, "deleted")
+        spilled = self.spill_store is not None and self.spill_store.delete(request_id)
+        return bool(keys) or spilled
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            purged = self._purge_expired(time.monotonic())
+        if self.spill_store is not None:
+            purged += self.spill_store.purge_expired()
+        return purged
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of stored entries and bytes, and counters of removed entries.
+
+        expired and evicted count entries dropped after their TTL and to make room;
+        deleted counts explicit deletes. bytes_reclaimed covers all three. With a spill
+        store, spilled_entries and spilled_bytes are the entries and bytes it holds.
+        """
+        with self._lock:
+            stats = dict(self._stats, entries=len(self._entries), bytes=self.current_bytes)
+        if self.spill_store is not None:
+            spilled = self.spill_store.stats()
+            stats.update(spilled_entries=spilled["entries"], spilled_bytes=spilled["bytes"])
+        return stats
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _purge_expired(self, now: float) -> int:
+        # Entries share one TTL, so insertion order is expiry order
+        purged = 0
+        while self._entries:
+            key, (expires_at, _, _) = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            self._remove(key, "expired")
+            purged += 1
+        return purged
+
+    def _remove(self, key: Tuple[str, str], reason: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= len(entry[1])
+            self._stats[reason] += 1
+            self._stats["bytes_reclaimed"] += len(entry[1])
+
+
+class DiskAudioStore(AudioStore):
+    """Writes generated audio to files under a directory, one subdirectory per request.
+
+    Useful when outputs are too large to keep in memory. Files are written under a
+    temporary name and renamed into place when complete. The store keeps an index of
+    its requests with an expiry min-heap, so purging touches only expired entries and
+    never scans the directory; when the total size exceeds max_bytes, the requests
+    closest to expiry are evicted.
+    """
+
+    def __init__(self, directory: str, ttl_seconds: float, max_bytes: Optional[int] = None):
+        """Create the store, indexing audio left in the directory by a previous run.
+
+        Args:
+            directory: Directory holding the audio files.
+            ttl_seconds: How long a file stays available after it is written.
+            max_bytes: Disk quota for the directory (default: unlimited).
+        """
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # request_id -> (expiry time, bytes); the heap holds (expiry time, request_id) and
+        # may contain stale items for requests that were deleted or written again
+        self._entries: Dict[str, Tuple[float, int]] = {}
+        self._expiry: List[Tuple[float, str]] = []
+        # request_id -> {filename: etag}; files indexed at startup are hashed on first access
+        self._etags: Dict[str, Dict[str, str]] = {}
+        self.current_bytes = 0
+        self._stats = {"expired": 0, "evicted": 0, "deleted": 0, "bytes_reclaimed": 0}
+        os.makedirs(directory, exist_ok=True)
+        self._index_existing()
+
+    @contextlib.contextmanager
+    def writer(self, request_id: str, filename: str) -> Iterator[BinaryIO]:
+        if not (_is_plain_name(request_id) and _is_plain_name(filename)):
+            raise ValueError(f"Invalid audio file name: {request_id}/{filename}")
+        request_dir = os.path.join(self.directory, request_id)
+        os.makedirs(request_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=request_dir, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w+b") as file:
+                yield file
+            size = os.path.getsize(temp_path)
+            # Hashed once here, while the file is still in the page cache, so serving it is free
+            etag = file_etag(temp_path)
+            os.replace(temp_path, os.path.join(request_dir, filename))
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(temp_path)
+            raise
+
+        with self._lock:
+            _, previous_size = self._entries.get(request_id, (0.0, 0))
+            self._index(request_id, time.time() + self.ttl_seconds, previous_size + size)
+            self._etags.setdefault(request_id, {})[filename] = etag
+            victims = self._over_quota(keep=request_id)
+        self._remove_dirs(victims)
+
+    def get(self, request_id: str, filename: str) -> Optional[StoredAudio]:
+        if not (_is_plain_name(request_id) and _is_plain_name(filename)):
+            return None
+        with self._lock:
+            entry = self._entries.get(request_id)
+            etag = self._etags.get(request_id, {}).get(filename)
+        if entry is None or entry[0] <= time.time():
+            return None
+        path = os.path.join(self.directory, request_id, filename)
+        if not os.path.isfile(path):
+            return None
+        try:
+            size = os.path.getsize(path)
+            if etag is None:
+                etag = file_etag(path)
+                with self._lock:
+                    if request_id in self._entries:
+                        self._etags.setdefault(request_id, {})[filename] = etag
+        except OSError:
+            return None
+        return StoredAudio(filename, size, etag, path=path)
+
+    def delete(self, request_id: str) -> bool:
+        with self._lock:
+            entry = self._entries.pop(request_id, None)
+            if entry is None:
+                return False
+            self._etags.pop(request_id, None)
+            self.current_bytes -= entry[1]
+            self._stats["deleted"] += 1
+            self._stats["bytes_reclaimed"] += entry[1]
+        self._remove_dirs([request_id])
+        return True
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        victims = []
+        with self._lock:
+            while self._expiry and self._expiry[0][0] <= now:
+                expires_at, request_id = heapq.heappop(self._expiry)
+                if self._is_current(expires_at, request_id):
+                    self._unindex(request_id, "expired")
+                    victims.append(request_id)
+        self._remove_dirs(victims)
+        return len(victims)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of stored requests and bytes, and counters of removed requests.
+
+        expired and evicted count requests removed by purge_expired and by the disk quota;
+        deleted counts explicit deletes. bytes_reclaimed covers all three.
+        """
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), bytes=self.current_bytes)
+
+    def _index_existing(self) -> None:
+        # One scan at startup; afterwards the index is maintained as files are written
+        for entry in os.scandir(self.directory):
+            if not entry.is_dir() or not _is_plain_name(entry.name):
+                continue
+            files = [file for file in os.scandir(entry.path) if file.is_file()]
+            mtime = max([file.stat().st_mtime for file in files], default=entry.stat().st_mtime)
+            self._index(entry.name, mtime + self.ttl_seconds, sum(file.stat().st_size for file in files))
+
+    def _index(self, request_id: str, expires_at: float, size: int) -> None:
+        previous = self._entries.get(request_id)
+        if previous is not None:
+            self.current_bytes -= previous[1]
+        self._entries[request_id] = (expires_at, size)
+        self.current_bytes += size
+        heapq.heappush(self._expiry, (expires_at, request_id))
+
+    def _is_current(self, expires_at: float, request_id: str) -> bool:
+        entry = self._entries.get(request_id)
+        return entry is not None and entry[0] == expires_at
+
+    def _unindex(self, request_id: str, reason: str) -> None:
+        _, size = self._entries.pop(request_id)
+        self._etags.pop(request_id, None)
+        self.current_bytes -= size
+        self._stats[reason] += 1
+        self._stats["bytes_reclaimed"] += size
+
+    def _over_quota(self, keep: str) -> List[str]:
+        """Unindex the requests closest to expiry until the store fits its quota; return them."""
+        victims = []
+        if self.max_bytes is None:
+            return victims
+        skipped = []
+        while self.current_bytes > self.max_bytes and self._expiry:
+            expires_at, request_id = heapq.heappop(self._expiry)
+            if not self._is_current(expires_at, request_id):
+                continue
+            if request_id == keep:
+                # Never evict the audio that was just written
+                skipped.append((expires_at, request_id))
+                continue
+            self._unindex(request_id, "evicted")
+            victims.append(request_id)
+        for item in skipped:
+            heapq.heappush(self._expiry, item)
+        return victims
+
+    def _remove_dirs(self, request_ids: List[str]) -> None:
+        for request_id in request_ids:
+            shutil.rmtree(os.path.join(self.directory, request_id), ignore_errors=True)
+
+
+def create_audio_store(config, default_directory: str) -> AudioStore:
+    """Build the audio store described by config.
+
+    The memory store spills entries larger than config.audio_store_spill_mb to a disk
+    store in the same directory the disk store would use.
+
+    Args:
+        config: Config with audio_store ('memory' or 'disk') and its limits.
+        default_directory: Directory used by the disk store if config.audio_store_dir is unset.
+
+    Raises:
+        ValueError: If config.audio_store names an unknown store.
+    """
+    if config.audio_store not in ("memory", "disk"):
+        raise ValueError(f"Unsupported audio store: {config.audio_store}")
+    disk_store = DiskAudioStore(
+        config.audio_store_dir or default_directory,
+        config.audio_store_ttl_seconds,
+        config.audio_store_disk_mb * 1024 * 1024
+    )
+    if config.audio_store == "memory":
+        return MemoryAudioStore(
+            config.audio_store_mb * 1024 * 1024,
+            config.audio_store_ttl_seconds,
+            spill_store=disk_store,
+            spill_bytes=config.audio_store_spill_mb * 1024 * 1024
+        )
+    return disk_store
@@ -0,0 +1,46 @@
+import threading
+from typing import Dict
+from src.agent import TTSAgent
+from src.config import Config
+
+class AgentRegistry:
+    """Process-wide pool of long-lived TTSAgents.
+
+    Building an agent creates the provider client (and its connection pool) and the
+    sentence tokenizer, so agents are built once per TTS service and reused by every
+    request. Voices are chosen per call (see TTSAgent.synthesize), so one agent serves
+    every voice combination of its service.
+    """
+
+    def __init__(self):
+        self._agents: Dict[str, TTSAgent] = {}
+        self._lock = threading.Lock()
+
+    def get(self, tts_service: str) -> TTSAgent:
+        """Return the shared agent for a TTS service, creating it on first use.
+
+        Args:
+            tts_service: Name of the TTS service (e.g. 'aws_polly', 'google_cloud').
+
+        Returns:
+            The agent for the service.
+
+        Raises:
+            ValueError: If an invalid TTS service name is provided.
+        """
+        agent = self._agents.get(tts_service)
+        if agent is not None:
+            return agent
+        with self._lock:
+            agent = self._agents.get(tts_service)
+            if agent is None:
+                config = Config()
+                config.tts_service = tts_service
+                agent = TTSAgent(config)
+                self._agents[tts_service] = agent
+            return agent
+
+    def agents(self) -> Dict[str, TTSAgent]:
+        """Return a snapshot of the agents created so far, keyed by TTS service."""
+        with self._lock:
+            return dict(self._agents)
@@ -0,0 +1,113 @@
+"""Document sessions: the segment plan and audio of recently rendered documents.
+
+Editors re-render the same document after small edits. DocumentSessionStore keeps,
+for each document ID, the segments of the last render with a key and the synthesized
+audio of each, so the next render can align the new segments with the old ones and
+only synthesize what changed (see TTSAgent.synthesize_document).
+"""
+import threading
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Tuple
+
+
+class DocumentSession:
+    """The last render of one document."""
+
+    def __init__(self, language_segments: List[Tuple[str, str]], keys: List[str], audio: List[bytes]):
+        """Create the session.
+
+        Args:
+            language_segments: (language_code, text) segments of the render, in order
+            keys: Key of each segment, identifying everything that shapes its audio
+            audio: Synthesized audio of each segment, as returned by the TTS service
+        """
+        self.language_segments = language_segments
+        self.keys = keys
+        self.audio = audio
+        self.size = sum(len(audio_data) for audio_data in audio)
+
+    def reusable_audio(self, keys: List[str]) -> List[Optional[bytes]]:
+        """Align the segment keys of a new render with this one.
+
+        The key sequences are aligned with difflib.SequenceMatcher, so segments that were
+        inserted, deleted or moved only affect their own span.
+
+        Args:
+            keys: Segment keys of the new render, in order
+
+        Returns:
+            The audio of each new segment found unchanged in this render, else None
+        """
+        audio: List[Optional[bytes]] = [None] * len(keys)
+        matcher = SequenceMatcher(None, self.keys, keys, autojunk=False)
+        for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+            if tag == "equal":
+                audio[new_start:new_end] = self.audio[old_start:old_end]
+        return audio
+
+
+class DocumentSessionStore:
+    """Per-process LRU of document sessions, bounded by the total size of their audio."""
+
+    def __init__(self, max_bytes: int):
+        """Initialize the store.
+
+        Args:
+            max_bytes: Maximum total audio size. Sessions larger than this are not stored.
+        """
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._sessions: "OrderedDict[str, DocumentSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"reused_segments": 0, "synthesized_segments": 0}
+
+    def get(self, document_id: str) -> Optional[DocumentSession]:
+        with self._lock:
+            session = self._sessions.get(document_id)
+            if session is not None:
+                self._sessions.move_to_end(document_id)
+            return session
+
+    def put(self, document_id: str, session: DocumentSession) -> None:
+        """Store the latest render of a document, replacing the previous one."""
+        with self._lock:
+            old = self._sessions.pop(document_id, None)
+            if old is not None:
+                self.current_bytes -= old.size
+            if session.size > self.max_bytes:
+                return
+            self._sessions[document_id] = session
+            self.current_bytes += session.size
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._sessions.popitem(last=False)
+                self.current_bytes -= evicted.size
+
+    def discard(self, document_id: str) -> bool:
+        """Forget a document; return whether it had a session."""
+        with self._lock:
+            session = self._sessions.pop(document_id, None)
+            if session is not None:
+                self.current_bytes -= session.size
+            return session is not None
+
+    def record(self, reused: int, synthesized: int) -> None:
+        """Count the segments of a render that were reused and synthesized."""
+        with self._lock:
+            self._stats["reused_segments"] += reused
+            self._stats["synthesized_segments"] += synthesized
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of documents and bytes held, and the reused/synthesized segment counters."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["documents"] = len(self._sessions)
+            stats["bytes"] = self.current_bytes
+            return stats
+
+    @classmethod
+    def from_config(cls, config) -> Optional["DocumentSessionStore"]:
+        """Build the session store described by config, or None if sessions are disabled."""
+        if config.document_session_mb <= 0:
+            return None
+        return cls(config.document_session_mb * 1024 * 1024)
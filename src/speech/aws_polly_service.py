@@ -1,22 +1,48 @@
 import boto3
-from botocore.exceptions import BotoCoreError, ClientError
-from src.speech.tts_service import TTSService
-from src.speech.exceptions import TTSConnectionError, TTSInvalidInputError, TTSSynthesisError
+from botocore.config import Config as BotoConfig
+from botocore.exceptions import (
+    BotoCoreError, ClientError, ConnectionClosedError, ConnectTimeoutError,
+    EndpointConnectionError, ReadTimeoutError
+)
+from typing import Iterator
+from src.speech.ssml import SSML
+from src.speech.tts_service import DEFAULT_CHUNK_SIZE, TTSService
+from src.speech.exceptions import (
+    TTSError, TTSConnectionError, TTSInvalidInputError, TTSSynthesisError,
+    TTSServiceUnavailableError, TTSThrottlingError
+)
+
+THROTTLING_ERROR_CODES = {"ThrottlingException", "Throttling", "TooManyRequestsException", "RequestLimitExceeded"}
+TRANSIENT_BOTOCORE_ERRORS = (ConnectionClosedError, ConnectTimeoutError, EndpointConnectionError, ReadTimeoutError)
 
 class AWSPollyService(TTSService):
+    # Highest PCM rate Polly offers (8000 and 16000 are supported)
+    sample_rate = 16000
+    # Billed characters per SynthesizeSpeech request
+    max_text_length = 3000
+    # A request has one voice; <lang> tags only change the pronunciation
+    ssml_mode = "lang"
+
     def __init__(self, config):
         self.polly_client = boto3.client(
             "polly",
             region_name=config.aws_region_name,
             aws_access_key_id=config.aws_access_key_id,
-            aws_secret_access_key=config.aws_secret_access_key
+            aws_secret_access_key=config.aws_secret_access_key,
+            # Long-lived client: keep enough warm connections for concurrent segment requests.
+            # Retries are handled by SpeechService, so botocore makes a single attempt.
+            config=BotoConfig(
+                max_pool_connections=config.max_pool_connections,
+                tcp_keepalive=True,
+                retries={"total_max_attempts": 1}
+            )
         )
 
     def synthesize(self, language: str, text: str, voice_id: str = "Joanna") -> bytes:
         """Synthesizes speech from the given text and language using AWS Polly.
 
         Args:
-            language: The language of the text.
+            language: The language of the text, or SSML if text is an SSML document.
             text: The text to synthesize.
             voice_id: The voice ID to use for synthesis (default: Joanna).
 
@@ -32,20 +58,62 @@ class AWSPollyService(TTSService):
             raise TTSInvalidInputError("Text cannot be empty")
 
         try:
-            response = self.polly_client.synthesize_speech(
-                Text=text,
-                OutputFormat="pcm",
-                VoiceId=voice_id,
-                SampleRate="16000"
-            )
+            response = self._request(language, text, voice_id)
             audio_stream = response["AudioStream"].read()
             return audio_stream
         except (BotoCoreError, ClientError) as e:
-            if "AccessDenied" in str(e) or "UnrecognizedClientException" in str(e):
-                raise TTSConnectionError(f"AWS Polly authentication error: {e}")
-            elif "ValidationException" in str(e) or "InvalidParameterValue" in str(e):
-                raise TTSInvalidInputError(f"Invalid input for AWS Polly: {e}")
-            else:
-                raise TTSSynthesisError(f"AWS Polly synthesis error: {e}")
+            raise self._wrap_error(e)
         except Exception as e:
             raise TTSSynthesisError(f"Unexpected error during AWS Polly synthesis: {e}")
+
+    def synthesize_stream(self, language: str, text: str, voice_id: str = "Joanna",
+                          chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        """Synthesizes speech, yielding PCM chunks as they are read from Polly's response stream.
+
+        See synthesize for arguments and raised exceptions.
+        """
+        if not text.strip():
+            raise TTSInvalidInputError("Text cannot be empty")
+
+        try:
+            response = self._request(language, text, voice_id)
+        except (BotoCoreError, ClientError) as e:
+            raise self._wrap_error(e)
+        except Exception as e:
+            raise TTSSynthesisError(f"Unexpected error during AWS Polly synthesis: {e}")
+
+        audio_stream = response["AudioStream"]
+        try:
+            for chunk in audio_stream.iter_chunks(chunk_size):
+                yield chunk
+        except (BotoCoreError, ClientError) as e:
+            raise self._wrap_error(e)
+        finally:
+            audio_stream.close()
+
+    def _request(self, language: str, text: str, voice_id: str):
+        return self.polly_client.synthesize_speech(
+            Text=text,
+            TextType="ssml" if language == SSML else "text",
+            OutputFormat="pcm",
+            VoiceId=voice_id,
+            SampleRate=str(self.sample_rate)
+        )
+
+    def _wrap_error(self, e: Exception) -> TTSError:
+        if isinstance(e, ClientError):
+            code = e.response.get("Error", {}).get("Code")
+            status = e.response.get("ResponseMetadata", {}).get("HTTPStatusCode") or 0
+            if code in THROTTLING_ERROR_CODES or status == 429:
+                return TTSThrottlingError(f"AWS Polly throttled the request: {e}")
+            if status >= 500 or code == "ServiceFailureException":
+                return TTSServiceUnavailableError(f"AWS Polly service error: {e}")
+        elif isinstance(e, TRANSIENT_BOTOCORE_ERRORS):
+            return TTSServiceUnavailableError(f"AWS Polly connection error: {e}")
+
+        if "AccessDenied" in str(e) or "UnrecognizedClientException" in str(e):
+            return TTSConnectionError(f"AWS Polly authentication error: {e}")
+        elif "ValidationException" in str(e) or "InvalidParameterValue" in str(e):
+            return TTSInvalidInputError(f"Invalid input for AWS Polly: {e}")
+        else:
+            return TTSSynthesisError(f"AWS Polly synthesis error: {e}")
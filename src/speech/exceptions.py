@@ -14,4 +14,18 @@ class TTSInvalidInputError(TTSError):
 
 class TTSSynthesisError(TTSError):
     """Raised when there's an error during speech synthesis."""
-    pass 
\ No newline at end of file
+    pass
+
+class TTSThrottlingError(TTSSynthesisError):
+    """Raised when the TTS service rejects a request because of rate limits or quota.
+
+    The request may succeed if retried later.
+    """
+    pass
+
+class TTSServiceUnavailableError(TTSSynthesisError):
+    """Raised on transient service failures (5xx responses, timeouts, dropped connections).
+
+    The request may succeed if retried later.
+    """
+    pass
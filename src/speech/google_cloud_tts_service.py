@@ -1,19 +1,58 @@
 import os
+import struct
 from google.cloud import texttospeech
+from google.cloud.texttospeech_v1.services.text_to_speech.transports import TextToSpeechGrpcTransport
 from google.api_core import exceptions as google_exceptions
+from src.speech.ssml import SSML
 from src.speech.tts_service import TTSService
-from src.speech.exceptions import TTSConnectionError, TTSInvalidInputError, TTSSynthesisError
+from src.speech.exceptions import (
+    TTSConnectionError, TTSInvalidInputError, TTSSynthesisError,
+    TTSServiceUnavailableError, TTSThrottlingError
+)
+
+def strip_wav_header(audio_content: bytes) -> bytes:
+    """Return the PCM data of a LINEAR16 response, which Google wraps in a WAV header."""
+    if audio_content[:4] != b"RIFF" or audio_content[8:12] != b"WAVE":
+        return audio_content
+    position = 12
+    while position + 8 <= len(audio_content):
+        chunk_id = audio_content[position:position + 4]
+        chunk_size = struct.unpack("<I", audio_content[position + 4:position + 8])[0]
+        if chunk_id == b"data":
+            return audio_content[position + 8:position + 8 + chunk_size]
+        position += 8 + chunk_size + (chunk_size & 1)
+    return audio_content
 
 class GoogleCloudTTSService(TTSService):
+    # Native rate of Google's voices; other output rates are resampled from it
+    sample_rate = 24000
+    # Bytes of input per request
+    max_text_length = 5000
+    # <voice> tags switch voices within one request
+    ssml_mode = "voice"
+
     def __init__(self, config):
-        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = config.google_cloud_credentials_path
-        self.client = texttospeech.TextToSpeechClient()
+        if config.google_cloud_credentials_path:
+            os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = config.google_cloud_credentials_path
+        # Long-lived client: keep the HTTP/2 channel alive between requests
+        channel = TextToSpeechGrpcTransport.create_channel(options=[
+            ("grpc.keepalive_time_ms", 30000),
+            ("grpc.keepalive_timeout_ms", 10000),
+            ("grpc.keepalive_permit_without_calls", 1),
+            ("grpc.max_send_message_length", -1),
+            ("grpc.max_receive_message_length", -1),
+        ])
+        self.client = texttospeech.TextToSpeechClient(transport=TextToSpeechGrpcTransport(channel=channel))
+
+    def text_length(self, text: str) -> int:
+        """Google limits the UTF-8 encoded size of the input."""
+        return len(text.encode("utf-8"))
 
     def synthesize(self, language: str, text: str, voice_id: str = "en-US-Standard-A") -> bytes:
         """Synthesizes speech from the given text and language using Google Cloud TTS.
 
         Args:
-            language: The language of the text.
+            language: The language of the text, or SSML if text is an SSML document.
             text: The text to synthesize.
             voice_id: The voice ID to use for synthesis (default: en-US-Standard-A).
 
@@ -29,26 +68,39 @@ class GoogleCloudTTSService(TTSService):
             raise TTSInvalidInputError("Text cannot be empty")
 
         try:
-            synthesis_input = texttospeech.SynthesisInput(text=text)
+            if language == SSML:
+                synthesis_input = texttospeech.SynthesisInput(ssml=text)
+                # The request's own voice reads anything outside <voice> tags; its locale
+                # is the start of the voice name (e.g. en-US-Standard-A)
+                language = "-".join(voice_id.split("-")[:2])
+            else:
+                synthesis_input = texttospeech.SynthesisInput(text=text)
             voice = texttospeech.VoiceSelectionParams(
                 language_code=language,
                 name=voice_id
             )
             audio_config = texttospeech.AudioConfig(
                 audio_encoding=texttospeech.AudioEncoding.LINEAR16,
-                sample_rate_hertz=16000
+                sample_rate_hertz=self.sample_rate
             )
 
+            # Retries are handled by SpeechService
             response = self.client.synthesize_speech(
                 input=synthesis_input,
                 voice=voice,
-                audio_config=audio_config
+                audio_config=audio_config,
+                retry=None
             )
-            return response.audio_content
+            return strip_wav_header(response.audio_content)
         except google_exceptions.PermissionDenied as e:
             raise TTSConnectionError(f"Google Cloud TTS authentication error: {e}")
         except google_exceptions.InvalidArgument as e:
             raise TTSInvalidInputError(f"Invalid input for Google Cloud TTS: {e}")
+        except google_exceptions.ResourceExhausted as e:
+            raise TTSThrottlingError(f"Google Cloud TTS quota exceeded: {e}")
+        except (google_exceptions.ServiceUnavailable, google_exceptions.InternalServerError,
+                google_exceptions.DeadlineExceeded) as e:
+            raise TTSServiceUnavailableError(f"Google Cloud TTS service error: {e}")
         except google_exceptions.GoogleAPIError as e:
             raise TTSSynthesisError(f"Google Cloud TTS synthesis error: {e}")
         except Exception as e:
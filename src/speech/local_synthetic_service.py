@@ -0,0 +1,117 @@
+import asyncio
+import random
+import threading
+import time
+import zlib
+import xml.etree.ElementTree as ElementTree
+from typing import AsyncIterator, Iterator, Optional
+import numpy as np
+from src.speech.ssml import SSML
+from src.speech.tts_service import AsyncTTSService, DEFAULT_CHUNK_SIZE, TTSService
+from src.speech.exceptions import TTSInvalidInputError, TTSServiceUnavailableError
+
+class LocalSyntheticTTSService(TTSService):
+    """Offline TTS backend for load testing, profiling and development.
+
+    Returns deterministic tones instead of speech: the pitch depends on the language and
+    voice, and the duration is proportional to the length of the text. Network behaviour
+    is simulated with a configurable latency, jitter and error rate, so the rest of the
+    pipeline can be exercised realistically without credentials or network access.
+
+    SSML requests are rendered part by part, as if each <voice>/<lang> part were a
+    separate segment and each <break> a pause, so batched and unbatched requests
+    produce the same audio.
+    """
+
+    ssml_mode = "voice"
+
+    def __init__(self, config) -> None:
+        self.latency = config.synthetic_latency_ms / 1000
+        self.jitter = config.synthetic_jitter_ms / 1000
+        self.error_rate = config.synthetic_error_rate
+        self.ms_per_char = config.synthetic_ms_per_char
+        self._random = random.Random(config.synthetic_seed)
+        self._random_lock = threading.Lock()
+
+    def synthesize(self, language: str, text: str, voice_id: Optional[str] = None) -> bytes:
+        """Synthesizes a tone for the given text after the simulated service latency.
+
+        Args:
+            language: The language of the text.
+            text: The text to synthesize.
+            voice_id: Optional voice ID; changes the pitch of the tone.
+
+        Returns:
+            The synthesized audio data as bytes (16kHz, 16-bit, mono PCM).
+
+        Raises:
+            TTSInvalidInputError: If the text is empty.
+            TTSServiceUnavailableError: For simulated service errors.
+        """
+        self._validate(text)
+        time.sleep(self._simulate_call())
+        return self.render(language, text, voice_id)
+
+    def synthesize_stream(self, language: str, text: str, voice_id: Optional[str] = None,
+                          chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        self._validate(text)
+        time.sleep(self._simulate_call())
+        audio_data = self.render(language, text, voice_id)
+        for start in range(0, len(audio_data), chunk_size):
+            yield audio_data[start:start + chunk_size]
+
+    def render(self, language: str, text: str, voice_id: Optional[str] = None) -> bytes:
+        """Return the deterministic audio for a segment, without simulated latency or errors."""
+        if language == SSML:
+            return self._render_ssml(ElementTree.fromstring(text), "en", voice_id)
+        num_samples = int(len(text.strip()) * self.ms_per_char * self.sample_rate / 1000)
+        base_frequency = 440.0 if language.startswith("en") else 660.0
+        frequency = base_frequency + zlib.crc32((voice_id or "").encode("utf-8")) % 200
+        t = np.arange(num_samples) / self.sample_rate
+        return (np.sin(2 * np.pi * frequency * t) * 8000).astype("<i2").tobytes()
+
+    def _render_ssml(self, element, language: str, voice_id: Optional[str]) -> bytes:
+        if element.tag == "break":
+            milliseconds = int(element.get("time", "0ms").rstrip("ms") or 0)
+            return bytes(2 * (milliseconds * self.sample_rate // 1000))
+        if element.tag == "voice":
+            voice_id = element.get("name", voice_id)
+        language = element.get("{http://www.w3.org/XML/1998/namespace}lang", language)
+        parts = [self.render(language, element.text, voice_id)] if element.text else []
+        for child in element:
+            parts.append(self._render_ssml(child, language, voice_id))
+            if child.tail:
+                parts.append(self.render(language, child.tail, voice_id))
+        return b"".join(parts)
+
+    def _validate(self, text: str) -> None:
+        if not text.strip():
+            raise TTSInvalidInputError("Text cannot be empty")
+
+    def _simulate_call(self) -> float:
+        """Return the simulated latency of a call, or raise a simulated service error."""
+        with self._random_lock:
+            failed = self.error_rate > 0 and self._random.random() < self.error_rate
+            latency = self.latency + (self._random.uniform(-self.jitter, self.jitter) if self.jitter else 0)
+        if failed:
+            raise TTSServiceUnavailableError("Simulated service error")
+        return max(0.0, latency)
+
+
+class AsyncLocalSyntheticTTSService(AsyncTTSService):
+    """Native asyncio version of LocalSyntheticTTSService; the simulated latency does not hold a thread."""
+
+    def __init__(self, service: LocalSyntheticTTSService) -> None:
+        self.service = service
+        self.sample_rate = service.sample_rate
+
+    async def synthesize(self, language: str, text: str, voice_id: Optional[str] = None) -> bytes:
+        self.service._validate(text)
+        await asyncio.sleep(self.service._simulate_call())
+        return self.service.render(language, text, voice_id)
+
+    async def synthesize_stream(self, language: str, text: str, voice_id: Optional[str] = None,
+                                chunk_size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        audio_data = await self.synthesize(language, text, voice_id)
+        for start in range(0, len(audio_data), chunk_size):
+            yield audio_data[start:start + chunk_size]
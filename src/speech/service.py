@@ -1,9 +1,23 @@
-from typing import List, Dict, Optional, Tuple
+import asyncio
+import itertools
+import time
+from collections import deque
+from typing import AsyncIterator, Iterable, Iterator, List, Dict, Optional, Tuple
+from src.cache import TwoTierCache, make_cache_key
 from src.config import Config
 from src.speech.aws_polly_service import AWSPollyService
 from src.speech.google_cloud_tts_service import GoogleCloudTTSService
+from src.speech.local_synthetic_service import AsyncLocalSyntheticTTSService, LocalSyntheticTTSService
+from src.speech.singleflight import SingleFlight
+from src.speech.ssml import SSML, SSML_MODES, speak, ssml_fragment
+from src.speech.throttle import RetryPolicy, shared_rate_limiter, shared_retry_budget
+from src.speech.tts_service import AsyncTTSService, TTSService, ThreadedAsyncTTSService, shared_provider_executor
 from src.speech.exceptions import TTSError, TTSConnectionError, TTSInvalidInputError, TTSSynthesisError
 
+# Chunks of a streamed segment buffered while earlier segments are still being yielded
+STREAM_QUEUE_CHUNKS = 32
+
+
 class SpeechService:
     def __init__(self, config: Config):
         """Initialize the speech service with the specified TTS service.
@@ -16,14 +30,42 @@ class SpeechService:
         """
         self.config = config
         self.tts_service_name = config.tts_service
+        # Native asyncio backend, if the service has one. Otherwise the async methods
+        # run the blocking tts_service on the shared provider pool.
+        self.async_tts_service: Optional[AsyncTTSService] = None
         if self.tts_service_name == "aws_polly":
             self.tts_service = AWSPollyService(config)
         elif self.tts_service_name == "google_cloud":
             self.tts_service = GoogleCloudTTSService(config)
+        elif self.tts_service_name == "local_synthetic":
+            self.tts_service = LocalSyntheticTTSService(config)
+            self.async_tts_service = AsyncLocalSyntheticTTSService(self.tts_service)
         else:
             raise ValueError(f"Invalid TTS service name: {self.tts_service_name}")
         self.english_voice_id = config.english_voice_id
         self.japanese_voice_id = config.japanese_voice_id
+        # Render runs of segments as one SSML request where the provider allows (batch_segments)
+        self.ssml_batching = config.ssml_batching
+
+        # Segments of one request in flight at once; the provider calls of every request
+        # run on one process-wide pool sized to the provider's connection pool
+        self.max_workers = max(1, config.max_workers)
+        self._executor = shared_provider_executor(config.max_pool_connections)
+
+        # Cache of synthesized segments, shared by all threads using this service
+        self.cache = TwoTierCache.from_config(config)
+
+        # Rate limit and retry budget shared by every request to this provider in the process
+        self.rate_limiter = shared_rate_limiter(self.tts_service_name, config.rate_limit_tps, config.rate_limit_burst)
+        self.retry_policy = RetryPolicy(
+            config.max_retries,
+            config.retry_base_delay,
+            config.retry_max_delay,
+            shared_retry_budget(self.tts_service_name, config.retry_budget_ratio)
+        )
+
+        # Concurrent requests for the same segment share one provider call
+        self.single_flight = SingleFlight()
 
     def synthesize_segment(self, text: str, language: str, voice_id: Optional[str] = None) -> bytes:
         """Synthesize speech for a single text segment.
@@ -41,11 +83,134 @@ class SpeechService:
             TTSInvalidInputError: If the input text or parameters are invalid.
             TTSSynthesisError: If there's an error during speech synthesis.
         """
+        segment_key = self._segment_key(text, language, voice_id)
+        if self.cache is not None:
+            cached = self.cache.get(segment_key)
+            if cached is not None:
+                return cached
+        return self.single_flight.do(segment_key, self._synthesize_uncached, segment_key, text, language, voice_id)
+
+    def _synthesize_uncached(self, segment_key: str, text: str, language: str, voice_id: Optional[str]) -> bytes:
+        try:
+            audio_data = self._call_provider(self.tts_service.synthesize, language, text, voice_id)
+        except TTSError as e:
+            # Re-raise TTS errors with service name for better error tracking
+            raise type(e)(f"{self.tts_service_name}: {str(e)}")
+
+        if self.cache is not None:
+            self.cache.put(segment_key, audio_data)
+        return audio_data
+
+    def synthesize_segment_stream(self, text: str, language: str, voice_id: Optional[str] = None) -> Iterator[bytes]:
+        """Synthesize speech for a single text segment, yielding audio chunks as they arrive.
+
+        Cached segments are yielded as a single chunk. Otherwise chunks are passed on as the
+        TTS service delivers them; the segment is only buffered in full if caching is enabled.
+
+        Args:
+            text: The text to synthesize.
+            language: The language of the text.
+            voice_id: Optional voice ID to use for synthesis.
+
+        Yields:
+            Chunks of synthesized audio data as bytes.
+
+        Raises:
+            The same exceptions as synthesize_segment.
+        """
+        segment_key = self._segment_key(text, language, voice_id)
+        if self.cache is not None:
+            cached = self.cache.get(segment_key)
+            if cached is not None:
+                yield cached
+                return
+
+        stream = getattr(self.tts_service, "synthesize_stream", None)
+        if stream is None:
+            yield self.synthesize_segment(text, language, voice_id)
+            return
+
+        chunks = [] if self.cache is not None else None
         try:
-            return self.tts_service.synthesize(language, text, voice_id)
+            # Only opening the stream is retried; once audio has been passed on, errors are final
+            stream_chunks = self._call_provider(self._open_stream, stream, language, text, voice_id)
+            for chunk in stream_chunks:
+                if chunks is not None:
+                    chunks.append(chunk)
+                yield chunk
         except TTSError as e:
             # Re-raise TTS errors with service name for better error tracking
             raise type(e)(f"{self.tts_service_name}: {str(e)}")
+        if chunks is not None:
+            self.cache.put(segment_key, b"".join(chunks))
+
+    @staticmethod
+    def _open_stream(stream, language: str, text: str, voice_id: Optional[str]):
+        # Read up to the first chunk, so that errors raised when the request is made surface here
+        chunks = stream(language, text, voice_id)
+        first_chunk = next(chunks, None)
+        return itertools.chain([first_chunk] if first_chunk is not None else [], chunks)
+
+    def _call_provider(self, func, *args):
+        """Call the TTS service through the shared rate limiter, retrying transient errors."""
+        self.retry_policy.record_request()
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            try:
+                return func(*args)
+            except TTSError as e:
+                if not self.retry_policy.should_retry(e, attempt):
+                    raise
+            time.sleep(self.retry_policy.backoff(attempt))
+            attempt += 1
+
+    async def _acall_provider(self, func, *args):
+        """Asynchronous version of _call_provider for coroutine functions."""
+        self.retry_policy.record_request()
+        attempt = 0
+        while True:
+            wait = self.rate_limiter.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                return await func(*args)
+            except TTSError as e:
+                if not self.retry_policy.should_retry(e, attempt):
+                    raise
+            await asyncio.sleep(self.retry_policy.backoff(attempt))
+            attempt += 1
+
+    @property
+    def sample_rate(self) -> int:
+        """Sample rate of the audio returned by this service (the provider's native rate)."""
+        return getattr(self.tts_service, "sample_rate", TTSService.sample_rate)
+
+    @property
+    def max_text_length(self) -> Optional[int]:
+        """Longest text the service accepts per call, measured by text_length (None: no limit)."""
+        return getattr(self.tts_service, "max_text_length", TTSService.max_text_length)
+
+    def text_length(self, text: str) -> int:
+        """Return the length of text as the service counts it against max_text_length."""
+        text_length = getattr(self.tts_service, "text_length", None)
+        return text_length(text) if text_length is not None else len(text)
+
+    def _segment_key(self, text: str, language: str, voice_id: Optional[str]) -> str:
+        normalized_text = " ".join(text.split())
+        return make_cache_key(self.tts_service_name, voice_id, language, normalized_text, self.sample_rate, "pcm")
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Return hit/miss counters of the synthesis cache (empty if caching is disabled)."""
+        return self.cache.stats() if self.cache is not None else {}
+
+    def single_flight_stats(self) -> Dict[str, int]:
+        """Return the number of provider calls made and the number of requests coalesced into them."""
+        return self.single_flight.stats()
+
+    def retry_stats(self) -> Dict[str, int]:
+        """Return the number of retries made and the number refused by the retry budget."""
+        return self.retry_policy.stats()
 
     def synthesize_all_segments(self, segments: List[Dict[str, str]]) -> List[bytes]:
         """Synthesize speech for multiple text segments.
@@ -54,41 +219,380 @@ class SpeechService:
             segments: List of dictionaries containing text and language for each segment.
 
         Returns:
-            List of synthesized audio data as bytes.
+            List of synthesized audio data as bytes, in the same order as the input.
+            Segments are sent to the TTS service in parallel when config.max_workers > 1.
 
         Raises:
             TTSConnectionError: If there are connection/authentication issues with the TTS service.
             TTSInvalidInputError: If any input text or parameters are invalid.
             TTSSynthesisError: If there's an error during speech synthesis.
         """
-        audio_segments = []
-        for segment in segments:
-            try:
-                audio_data = self.synthesize_segment(
-                    text=segment["text"],
-                    language=segment["language"],
-                    voice_id=segment.get("voice_id")
-                )
-                audio_segments.append(audio_data)
-            except TTSError as e:
-                # Add segment information to the error message
-                raise type(e)(f"Error in segment '{segment['text'][:50]}...': {str(e)}")
-        return audio_segments
+        return self._synthesize_many([
+            (segment["text"], segment["language"], segment.get("voice_id"))
+            for segment in segments
+        ])
 
-    def synthesize_all(self, language_segments: List[Tuple[str, str]]) -> List[bytes]:
+    def synthesize_all(self, language_segments: List[Tuple[str, str]],
+                       english_voice_id: Optional[str] = None,
+                       japanese_voice_id: Optional[str] = None) -> List[bytes]:
         """Convert text to speech using appropriate models/voices.
         
         Args:
             language_segments: List of (language_code, text) tuples
+            english_voice_id: Voice for English segments (default: the configured English voice)
+            japanese_voice_id: Voice for Japanese segments (default: the configured Japanese voice)
             
         Returns:
-            List of audio segments as bytes
+            List of audio segments as bytes, in the same order as language_segments
+        """
+        return self._synthesize_many(self._voice_jobs(language_segments, english_voice_id, japanese_voice_id))
+
+    def _voice_jobs(self, language_segments: List[Tuple[str, str]],
+                    english_voice_id: Optional[str],
+                    japanese_voice_id: Optional[str]) -> List[Tuple[str, str, Optional[str]]]:
+        return list(self._iter_voice_jobs(language_segments, english_voice_id, japanese_voice_id))
+
+    def _iter_voice_jobs(self, language_segments: Iterable[Tuple[str, str]],
+                         english_voice_id: Optional[str],
+                         japanese_voice_id: Optional[str]) -> Iterator[Tuple[str, str, Optional[str]]]:
+        english_voice_id = english_voice_id or self.english_voice_id
+        japanese_voice_id = japanese_voice_id or self.japanese_voice_id
+        # SSML documents name their voices inside; the request itself uses the English voice
+        for lang, text in language_segments:
+            yield text, lang, english_voice_id if lang.startswith("en") or lang == SSML else japanese_voice_id
+
+    def batch_segments(self, language_segments: List[Tuple[str, str]], gaps_ms: List[int],
+                       english_voice_id: Optional[str] = None,
+                       japanese_voice_id: Optional[str] = None,
+                       max_length: Optional[int] = None,
+                       separate_first: bool = False) -> List[Tuple[int, str, str]]:
+        """Group segments into provider requests, rendering runs of segments as one SSML request.
+
+        With config.ssml_batching and a service that accepts SSML, consecutive segments are
+        joined into one document, each in a <lang> (and, where the service supports it,
+        <voice>) tag, with a <break> of the pause before it. A service that cannot switch
+        voices within a request (ssml_mode 'lang') only batches segments read by the same
+        voice (the English voice, e.g. a bilingual voice set for both languages); otherwise
+        each segment stays a request of its own. Documents are kept within
+        max_length, measured by text_length.
+
+        Args:
+            language_segments: List of (language_code, text) tuples
+            gaps_ms: Pause before each segment in milliseconds
+            english_voice_id: Voice for English segments (default: the configured English voice)
+            japanese_voice_id: Voice for Japanese segments (default: the configured Japanese voice)
+            max_length: Longest request, measured by text_length (None: no limit)
+            separate_first: Keep the first segment a request of its own, so its audio
+                arrives as soon as possible
+
+        Returns:
+            List of (first_segment_index, language_code, text) tuples, one per request, where
+            batched requests have the language SSML; pass the (language_code, text) pairs
+            to synthesize_all and friends
+        """
+        mode = getattr(self.tts_service, "ssml_mode", None)
+        if not self.ssml_batching or mode not in SSML_MODES:
+            return [(index, lang, text) for index, (lang, text) in enumerate(language_segments)]
+
+        jobs = self._voice_jobs(language_segments, english_voice_id, japanese_voice_id)
+        # Batched requests are made with the English voice (see _voice_jobs)
+        request_voice_id = english_voice_id or self.english_voice_id
+        # Each batch is a list of segment indexes with the SSML fragment of each, and its length
+        batches: List[Tuple[List[int], List[str], int]] = []
+        for index, (text, language, voice_id) in enumerate(jobs):
+            if batches:
+                indexes, fragments, length = batches[-1]
+                fragment = ssml_fragment(mode, language, text, voice_id, gaps_ms[index])
+                fragment_length = self.text_length(fragment)
+                batchable = (
+                    not (separate_first and indexes[0] == 0)
+                    and (mode == "voice" or jobs[indexes[0]][2] == voice_id == request_voice_id)
+                    and (max_length is None or length + fragment_length <= max_length)
+                )
+                if batchable:
+                    indexes.append(index)
+                    fragments.append(fragment)
+                    batches[-1] = (indexes, fragments, length + fragment_length)
+                    continue
+            fragment = ssml_fragment(mode, language, text, voice_id)
+            batches.append(([index], [fragment], self.text_length(speak([fragment]))))
+
+        requests = []
+        for indexes, fragments, _ in batches:
+            if len(indexes) == 1:
+                lang, text = language_segments[indexes[0]]
+                requests.append((indexes[0], lang, text))
+            else:
+                requests.append((indexes[0], SSML, speak(fragments)))
+        return requests
+
+    def iter_synthesize_all(self, language_segments: Iterable[Tuple[str, str]],
+                            english_voice_id: Optional[str] = None,
+                            japanese_voice_id: Optional[str] = None) -> Iterator[bytes]:
+        """Like synthesize_all, but yield each segment's audio in order as soon as it is ready.
+
+        At most config.max_workers segments are synthesized ahead of the consumer, so
+        memory use stays bounded however many segments there are. Segments are read from
+        language_segments only as they are needed, so it may be a generator producing them
+        while earlier segments are synthesized.
+
+        Args:
+            language_segments: (language_code, text) tuples: a list or any iterable
+            english_voice_id: Voice for English segments (default: the configured English voice)
+            japanese_voice_id: Voice for Japanese segments (default: the configured Japanese voice)
+
+        Yields:
+            Audio segments as bytes, in the same order as language_segments
+        """
+        return self._iter_many(self._iter_voice_jobs(language_segments, english_voice_id, japanese_voice_id))
+
+    def _synthesize_many(self, jobs: List[Tuple[str, str, Optional[str]]]) -> List[bytes]:
+        """Synthesize (text, language, voice_id) jobs, in parallel when config.max_workers > 1.
+
+        Args:
+            jobs: List of (text, language, voice_id) tuples.
+
+        Returns:
+            List of synthesized audio data as bytes, in the same order as jobs.
+
+        Raises:
+            TTSError: The error of the first failing segment (in input order), naming that segment.
+        """
+        return list(self._iter_many(jobs))
+
+    def _iter_many(self, jobs: Iterable[Tuple[str, str, Optional[str]]]) -> Iterator[bytes]:
+        if self.max_workers < 2 or (isinstance(jobs, list) and len(jobs) < 2):
+            for job in jobs:
+                yield self._synthesize_job(*job)
+            return
+
+        pending = iter(jobs)
+        window = deque(
+            self._executor.submit(self._synthesize_job, *job)
+            for job in itertools.islice(pending, self.max_workers)
+        )
+        try:
+            while window:
+                audio_data = window.popleft().result()
+                for job in itertools.islice(pending, 1):
+                    window.append(self._executor.submit(self._synthesize_job, *job))
+                yield audio_data
+        finally:
+            # Don't spend provider calls on segments whose result will be discarded
+            for future in window:
+                future.cancel()
+
+    def _synthesize_job(self, text: str, language: str, voice_id: Optional[str]) -> bytes:
+        try:
+            return self.synthesize_segment(text=text, language=language, voice_id=voice_id)
+        except TTSError as e:
+            # Add segment information to the error message
+            raise type(e)(f"Error in segment '{text[:50]}...': {str(e)}")
+
+    def _async_backend(self) -> AsyncTTSService:
+        if self.async_tts_service is not None:
+            return self.async_tts_service
+        return ThreadedAsyncTTSService(self.tts_service, self._executor)
+
+    async def asynthesize_segment(self, text: str, language: str, voice_id: Optional[str] = None) -> bytes:
+        """Asynchronous version of synthesize_segment that does not block the event loop.
+
+        Args:
+            text: The text to synthesize.
+            language: The language of the text.
+            voice_id: Optional voice ID to use for synthesis.
+
+        Returns:
+            The synthesized audio data as bytes.
+
+        Raises:
+            TTSConnectionError: If there are connection/authentication issues with the TTS service.
+            TTSInvalidInputError: If the input text or parameters are invalid.
+            TTSSynthesisError: If there's an error during speech synthesis.
         """
-        return [
-            self.synthesize_segment(
-                text=text,
-                language=lang,
-                voice_id=self.english_voice_id if lang.startswith("en") else self.japanese_voice_id
-            ) 
-            for lang, text in language_segments
-        ]
+        segment_key = self._segment_key(text, language, voice_id)
+        if self.cache is not None:
+            cached = await self._run_cache_io(self.cache.get, segment_key)
+            if cached is not None:
+                return cached
+        return await self.single_flight.do_async(
+            segment_key, self._asynthesize_uncached, segment_key, text, language, voice_id
+        )
+
+    async def _asynthesize_uncached(self, segment_key: str, text: str, language: str,
+                                    voice_id: Optional[str]) -> bytes:
+        try:
+            audio_data = await self._acall_provider(self._async_backend().synthesize, language, text, voice_id)
+        except TTSError as e:
+            # Re-raise TTS errors with service name for better error tracking
+            raise type(e)(f"{self.tts_service_name}: {str(e)}")
+
+        if self.cache is not None:
+            await self._run_cache_io(self.cache.put, segment_key, audio_data)
+        return audio_data
+
+    async def asynthesize_segment_stream(self, text: str, language: str,
+                                         voice_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        """Asynchronous version of synthesize_segment_stream."""
+        segment_key = self._segment_key(text, language, voice_id)
+        if self.cache is not None:
+            cached = await self._run_cache_io(self.cache.get, segment_key)
+            if cached is not None:
+                yield cached
+                return
+
+        chunks = [] if self.cache is not None else None
+        try:
+            # Only opening the stream is retried; once audio has been passed on, errors are final
+            first_chunk, stream_chunks = await self._acall_provider(self._aopen_stream, language, text, voice_id)
+            if first_chunk is not None:
+                if chunks is not None:
+                    chunks.append(first_chunk)
+                yield first_chunk
+            async for chunk in stream_chunks:
+                if chunks is not None:
+                    chunks.append(chunk)
+                yield chunk
+        except TTSError as e:
+            # Re-raise TTS errors with service name for better error tracking
+            raise type(e)(f"{self.tts_service_name}: {str(e)}")
+        if chunks is not None:
+            await self._run_cache_io(self.cache.put, segment_key, b"".join(chunks))
+
+    async def _aopen_stream(self, language: str, text: str, voice_id: Optional[str]):
+        # Read up to the first chunk, so that errors raised when the request is made surface here
+        chunks = self._async_backend().synthesize_stream(language, text, voice_id)
+        try:
+            return await chunks.__anext__(), chunks
+        except StopAsyncIteration:
+            return None, chunks
+
+    async def _run_cache_io(self, func, *args):
+        # The memory tier is cheap; only the disk tier is worth moving off the event loop
+        if self.cache.disk is None:
+            return func(*args)
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def asynthesize_all(self, language_segments: List[Tuple[str, str]],
+                              english_voice_id: Optional[str] = None,
+                              japanese_voice_id: Optional[str] = None) -> List[bytes]:
+        """Asynchronous version of synthesize_all.
+
+        At most config.max_workers segments are in flight at once.
+
+        Args:
+            language_segments: List of (language_code, text) tuples
+            english_voice_id: Voice for English segments (default: the configured English voice)
+            japanese_voice_id: Voice for Japanese segments (default: the configured Japanese voice)
+
+        Returns:
+            List of audio segments as bytes, in the same order as language_segments
+        """
+        return await self._asynthesize_many(self._voice_jobs(language_segments, english_voice_id, japanese_voice_id))
+
+    async def aiter_synthesize_all(self, language_segments: List[Tuple[str, str]],
+                                   english_voice_id: Optional[str] = None,
+                                   japanese_voice_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        """Like asynthesize_all, but yield each segment's audio as soon as it and every
+        segment before it have been synthesized.
+
+        Args:
+            language_segments: List of (language_code, text) tuples
+            english_voice_id: Voice for English segments (default: the configured English voice)
+            japanese_voice_id: Voice for Japanese segments (default: the configured Japanese voice)
+
+        Yields:
+            Audio segments as bytes, in the same order as language_segments
+        """
+        jobs = self._voice_jobs(language_segments, english_voice_id, japanese_voice_id)
+        async for audio_data in self._aiter_many(jobs):
+            yield audio_data
+
+    async def _asynthesize_many(self, jobs: List[Tuple[str, str, Optional[str]]]) -> List[bytes]:
+        return [audio_data async for audio_data in self._aiter_many(jobs)]
+
+    async def _aiter_many(self, jobs: List[Tuple[str, str, Optional[str]]]) -> AsyncIterator[bytes]:
+        async def run(text: str, language: str, voice_id: Optional[str]) -> bytes:
+            try:
+                return await self.asynthesize_segment(text=text, language=language, voice_id=voice_id)
+            except TTSError as e:
+                # Add segment information to the error message
+                raise type(e)(f"Error in segment '{text[:50]}...': {str(e)}")
+
+        # Keep at most max_workers segments in flight, started in order and never more than
+        # max_workers ahead of the consumer, so finished audio cannot pile up
+        pending = iter(jobs)
+        window = deque(asyncio.ensure_future(run(*job)) for job in itertools.islice(pending, self.max_workers))
+        try:
+            while window:
+                audio_data = await window[0]
+                window.popleft()
+                for job in itertools.islice(pending, 1):
+                    window.append(asyncio.ensure_future(run(*job)))
+                yield audio_data
+        finally:
+            # Stop pending work if the consumer failed or went away early, and collect the
+            # remaining outcomes so their errors are not reported as unhandled
+            for task in window:
+                task.cancel()
+            await asyncio.gather(*window, return_exceptions=True)
+
+    async def aiter_synthesize_all_chunks(self, language_segments: List[Tuple[str, str]],
+                                          english_voice_id: Optional[str] = None,
+                                          japanese_voice_id: Optional[str] = None
+                                          ) -> AsyncIterator[Tuple[int, bytes]]:
+        """Like aiter_synthesize_all, but yield audio chunks as the TTS service delivers them.
+
+        Segments are synthesized concurrently, in a window of config.max_workers segments
+        that moves on once a segment has been fully yielded. Chunks of the earliest
+        unfinished segment are yielded as they arrive; later segments buffer at most
+        STREAM_QUEUE_CHUNKS chunks each until every segment before them is complete.
+
+        Args:
+            language_segments: List of (language_code, text) tuples
+            english_voice_id: Voice for English segments (default: the configured English voice)
+            japanese_voice_id: Voice for Japanese segments (default: the configured Japanese voice)
+
+        Yields:
+            (segment_index, chunk) tuples, in segment order
+        """
+        jobs = self._voice_jobs(language_segments, english_voice_id, japanese_voice_id)
+
+        async def run(queue: asyncio.Queue, text: str, language: str, voice_id: Optional[str]) -> None:
+            # The queue receives the segment's chunks, then None when done, or the error that stopped it
+            try:
+                async for chunk in self.asynthesize_segment_stream(text, language, voice_id):
+                    await queue.put(chunk)
+                await queue.put(None)
+            except TTSError as e:
+                # Add segment information to the error message
+                await queue.put(type(e)(f"Error in segment '{text[:50]}...': {str(e)}"))
+            except Exception as e:
+                await queue.put(e)
+
+        def start(job: Tuple[str, str, Optional[str]]) -> Tuple[asyncio.Queue, asyncio.Future]:
+            queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_CHUNKS)
+            return queue, asyncio.ensure_future(run(queue, *job))
+
+        pending = iter(jobs)
+        window = deque(start(job) for job in itertools.islice(pending, self.max_workers))
+        try:
+            index = 0
+            while window:
+                queue, _ = window[0]
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        break
+                    if isinstance(item, BaseException):
+                        raise item
+                    yield index, item
+                window.popleft()
+                for job in itertools.islice(pending, 1):
+                    window.append(start(job))
+                index += 1
+        finally:
+            tasks = [task for _, task in window]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
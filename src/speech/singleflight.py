@@ -0,0 +1,95 @@
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into a single call.
+
+    The first caller for a key runs the function. Callers that arrive with the same key
+    while it is still running wait for it and receive the same result or exception.
+    Once the call finishes, the next caller for the key starts a new one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._tasks: Dict[Tuple[int, Hashable], asyncio.Task] = {}
+        self._stats = {"calls": 0, "coalesced": 0}
+
+    def do(self, key: Hashable, func: Callable, *args) -> Any:
+        """Run func(*args), or wait for the call already in flight for key.
+
+        Args:
+            key: Identifies calls that may share a result.
+            func: Function to call if no call for key is in flight.
+            args: Arguments for func.
+
+        Returns:
+            The result of the (possibly shared) call.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self._stats["calls"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def do_async(self, key: Hashable, func: Callable, *args) -> Any:
+        """Asynchronous version of do for coroutine functions.
+
+        The shared call runs in its own task, so cancelling one waiting caller does not
+        cancel the call for the others.
+        """
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        with self._lock:
+            task = self._tasks.get(flight_key)
+            if task is None:
+                task = loop.create_task(func(*args))
+                self._tasks[flight_key] = task
+                task.add_done_callback(lambda finished: self._finish_task(flight_key, finished))
+                self._stats["calls"] += 1
+            else:
+                self._stats["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    def _finish_task(self, flight_key: Tuple[int, Hashable], task: asyncio.Task) -> None:
+        with self._lock:
+            if self._tasks.get(flight_key) is task:
+                del self._tasks[flight_key]
+        if not task.cancelled():
+            # Mark the exception as retrieved in case every waiter was cancelled
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of calls made and the number of calls coalesced into them."""
+        with self._lock:
+            return dict(self._stats)
@@ -0,0 +1,46 @@
+import re
+from typing import List, Optional
+from xml.sax.saxutils import escape, quoteattr
+
+# Language code of requests whose text is an SSML document rather than plain text
+SSML = "ssml"
+
+# How a provider switches between segments inside one SSML request:
+# - voice: <voice name="..."> tags, so segments of any voices can share a request
+# - lang: <lang xml:lang="..."> tags, which change the pronunciation but not the voice,
+#   so only segments read by the same voice can share a request
+SSML_MODES = ("voice", "lang")
+
+# Locales used in xml:lang for the detector's language codes
+SSML_LANGUAGES = {"en": "en-US", "ja": "ja-JP"}
+
+# Characters that are not allowed anywhere in an XML 1.0 document, even escaped
+_INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]")
+
+
+def escape_text(text: str) -> str:
+    """Return text as SSML character data: markup characters escaped, invalid characters removed."""
+    return escape(_INVALID_XML_CHARS.sub("", text))
+
+
+def ssml_fragment(mode: str, language: str, text: str, voice_id: Optional[str], break_ms: int = 0) -> str:
+    """Return the SSML of one segment, preceded by a pause of break_ms.
+
+    Args:
+        mode: The provider's SSML mode ('voice' or 'lang').
+        language: Language code of the segment ('en', 'ja' or a locale).
+        text: Plain text of the segment; it is escaped here.
+        voice_id: Voice of the segment (only written in 'voice' mode).
+        break_ms: Pause before the segment in milliseconds (0: none).
+    """
+    fragment = f"<lang xml:lang={quoteattr(SSML_LANGUAGES.get(language, language))}>{escape_text(text)}</lang>"
+    if mode == "voice" and voice_id:
+        fragment = f"<voice name={quoteattr(voice_id)}>{fragment}</voice>"
+    if break_ms > 0:
+        fragment = f'<break time="{int(break_ms)}ms"/>{fragment}'
+    return fragment
+
+
+def speak(fragments: List[str]) -> str:
+    """Return the SSML document made of fragments."""
+    return "<speak>" + "".join(fragments) + "</speak>"
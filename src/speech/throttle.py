@@ -0,0 +1,171 @@
+"""Client-side rate limiting and retry with backoff for TTS service calls.
+
+Rate limiters and retry budgets are shared per provider by every SpeechService in the
+process (see shared_rate_limiter and shared_retry_budget), so concurrent requests
+together stay within the provider's quota.
+"""
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from src.speech.exceptions import TTSError, TTSServiceUnavailableError, TTSThrottlingError
+
+# Default (requests per second, burst) per provider, matching the providers' default quotas
+PROVIDER_RATE_LIMITS: Dict[str, Tuple[float, int]] = {
+    "aws_polly": (80.0, 100),
+    "google_cloud": (16.0, 16),
+}
+
+# Errors that may succeed when retried
+RETRYABLE_ERRORS = (TTSThrottlingError, TTSServiceUnavailableError)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        """Initialize a token bucket rate limiter.
+
+        Args:
+            rate: Tokens added per second. A rate of 0 or less disables limiting.
+            burst: Maximum number of tokens the bucket holds.
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token, returning how many seconds the caller must wait before using it.
+
+        Callers that find the bucket empty go into debt, so waiting callers are served
+        in the order they arrived.
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self) -> None:
+        """Take a token, sleeping until it may be used."""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+
+class RetryBudget:
+    def __init__(self, ratio: float, max_balance: int = 10):
+        """Initialize a retry budget.
+
+        Every request deposits `ratio` retries into the budget (up to max_balance) and every
+        retry withdraws one, so retries stay a bounded fraction of traffic during an outage.
+
+        Args:
+            ratio: Retries earned per request.
+            max_balance: Maximum number of retries that can be saved up.
+        """
+        self.ratio = ratio
+        self.max_balance = max_balance
+        self._balance = float(max_balance)
+        self._lock = threading.Lock()
+
+    def record_request(self) -> None:
+        with self._lock:
+            self._balance = min(self.max_balance, self._balance + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._balance < 1:
+                return False
+            self._balance -= 1
+            return True
+
+
+class RetryPolicy:
+    def __init__(self, max_retries: int, base_delay: float, max_delay: float,
+                 budget: Optional[RetryBudget] = None):
+        """Initialize a retry policy with exponential backoff and full jitter.
+
+        Args:
+            max_retries: Maximum number of retries per call.
+            base_delay: Upper bound of the first backoff delay in seconds.
+            max_delay: Upper bound of any backoff delay in seconds.
+            budget: Optional budget limiting retries across calls.
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self._lock = threading.Lock()
+        self._stats = {"retries": 0, "budget_exhausted": 0}
+
+    def record_request(self) -> None:
+        if self.budget is not None:
+            self.budget.record_request()
+
+    def should_retry(self, error: TTSError, attempt: int) -> bool:
+        """Decide whether a failed call should be retried.
+
+        Args:
+            error: The error raised by the call.
+            attempt: Number of retries already made for this call.
+        """
+        if not isinstance(error, RETRYABLE_ERRORS) or attempt >= self.max_retries:
+            return False
+        if self.budget is not None and not self.budget.try_spend():
+            self._count("budget_exhausted")
+            return False
+        self._count("retries")
+        return True
+
+    def backoff(self, attempt: int) -> float:
+        """Return the delay in seconds before retry number attempt (0-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of retries made and the number refused by the retry budget."""
+        with self._lock:
+            return dict(self._stats)
+
+
+_shared_lock = threading.Lock()
+_rate_limiters: Dict[str, TokenBucket] = {}
+_retry_budgets: Dict[str, RetryBudget] = {}
+
+
+def shared_rate_limiter(provider: str, rate: Optional[float] = None, burst: Optional[int] = None) -> TokenBucket:
+    """Return the process-wide rate limiter for a provider, creating it on first use.
+
+    Args:
+        provider: TTS service name.
+        rate: Requests per second (default: PROVIDER_RATE_LIMITS, unlimited for unknown providers).
+        burst: Bucket size (default: PROVIDER_RATE_LIMITS, or the rate rounded up).
+    """
+    with _shared_lock:
+        limiter = _rate_limiters.get(provider)
+        if limiter is None:
+            default_rate, default_burst = PROVIDER_RATE_LIMITS.get(provider, (0.0, 1))
+            rate = default_rate if rate is None else rate
+            burst = (default_burst if rate == default_rate else int(rate + 0.999)) if burst is None else burst
+            limiter = TokenBucket(rate, burst)
+            _rate_limiters[provider] = limiter
+        return limiter
+
+
+def shared_retry_budget(provider: str, ratio: float) -> RetryBudget:
+    """Return the process-wide retry budget for a provider, creating it on first use."""
+    with _shared_lock:
+        budget = _retry_budgets.get(provider)
+        if budget is None:
+            budget = RetryBudget(ratio)
+            _retry_budgets[provider] = budget
+        return budget
@@ -1,7 +1,19 @@
+import asyncio
+import concurrent.futures
+import functools
+import threading
 from abc import ABC, abstractmethod
-from typing import Optional
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import AsyncIterator, Iterator, Optional
 from .exceptions import TTSError, TTSConnectionError, TTSInvalidInputError, TTSSynthesisError
 
+# Bytes read per chunk when streaming audio (an even number, so chunks hold whole 16-bit samples)
+DEFAULT_CHUNK_SIZE = 8192
+# Chunks ThreadedAsyncTTSService reads from a provider stream ahead of the consumer
+STREAM_READ_AHEAD_CHUNKS = 4
+# How often a producer blocked on a full queue checks that the event loop is still running
+STREAM_STOP_POLL_SECONDS = 0.5
+
 class TTSService(ABC):
     """Abstract base class for Text-to-Speech services.
     
@@ -10,7 +22,7 @@ class TTSService(ABC):
     according to the specifications defined in this interface.
 
     Audio Format Specifications:
-    - Sample Rate: 16kHz
+    - Sample Rate: the service's sample_rate attribute (16kHz unless the provider's native rate differs)
     - Bit Depth: 16-bit
     - Channels: Mono
     - Format: PCM (raw audio data)
@@ -20,6 +32,24 @@ class TTSService(ABC):
     - For Japanese: 'ja' or specific variants like 'ja-JP'
     """
 
+    # Sample rate of the PCM returned by synthesize(): the rate the provider is asked for
+    sample_rate = 16000
+
+    # Longest text accepted by one synthesize() call, measured by text_length() (None: no limit)
+    max_text_length: Optional[int] = None
+
+    # How one SSML request switches between segments (see src.speech.ssml.SSML_MODES), or
+    # None if the service does not accept SSML. Services that set it treat text as an SSML
+    # document when synthesize() is called with the language SSML.
+    ssml_mode: Optional[str] = None
+
+    def text_length(self, text: str) -> int:
+        """Return the length of text as the provider counts it against max_text_length.
+
+        Characters by default; providers that limit the encoded size override this.
+        """
+        return len(text)
+
     @abstractmethod
     def __init__(self, config) -> None:
         """Initialize the TTS service with configuration.
@@ -39,7 +69,8 @@ class TTSService(ABC):
         """Synthesizes speech from the given text and language.
 
         Args:
-            language: The language code for the text ('en', 'ja', or service-specific variants).
+            language: The language code for the text ('en', 'ja', or service-specific variants),
+                     or SSML if text is an SSML document (only if ssml_mode is set).
             text: The text to synthesize. Must not be empty.
             voice_id: Optional voice identifier. If not provided, a default voice for the
                      specified language should be used.
@@ -73,3 +104,159 @@ class TTSService(ABC):
         5. Should handle service-specific language code variants appropriately
         """
         pass
+
+    def synthesize_stream(self, language: str, text: str, voice_id: Optional[str] = None,
+                          chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        """Synthesizes speech, yielding the PCM audio in chunks as it becomes available.
+
+        The default implementation yields the result of synthesize as a single chunk.
+        Services that receive audio as a stream should override this to yield chunks
+        as they arrive, so callers can start using audio before the whole segment is read.
+
+        Args:
+            language: The language code for the text.
+            text: The text to synthesize. Must not be empty.
+            voice_id: Optional voice identifier.
+            chunk_size: Preferred chunk size in bytes. Chunks other than the last must
+                       contain whole samples.
+
+        Yields:
+            Chunks of audio data in the same format as synthesize.
+
+        Raises:
+            The same exceptions as synthesize.
+        """
+        yield self.synthesize(language, text, voice_id)
+
+
+class AsyncTTSService(ABC):
+    """Asynchronous counterpart of TTSService.
+
+    Implementations follow the same audio format, language code and error contract
+    as TTSService.synthesize, but must not block the event loop while waiting on the service.
+    """
+
+    # Sample rate of the PCM returned by synthesize()
+    sample_rate = 16000
+
+    @abstractmethod
+    async def synthesize(self, language: str, text: str, voice_id: Optional[str] = None) -> bytes:
+        """Synthesizes speech from the given text and language.
+
+        See TTSService.synthesize for arguments, return value and raised exceptions.
+        """
+        pass
+
+    async def synthesize_stream(self, language: str, text: str, voice_id: Optional[str] = None,
+                                chunk_size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """Asynchronous version of TTSService.synthesize_stream.
+
+        The default implementation yields the result of synthesize as a single chunk.
+        """
+        yield await self.synthesize(language, text, voice_id)
+
+
+class ThreadedAsyncTTSService(AsyncTTSService):
+    """Adapts a blocking TTSService to AsyncTTSService by running it on an executor."""
+
+    def __init__(self, service: TTSService, executor: Optional[Executor] = None) -> None:
+        """Wrap a blocking TTS service.
+
+        Args:
+            service: The blocking TTS service to run.
+            executor: Executor to run blocking calls on (default: the event loop's default executor).
+        """
+        self.service = service
+        self.executor = executor
+        self.sample_rate = getattr(service, "sample_rate", TTSService.sample_rate)
+
+    async def synthesize(self, language: str, text: str, voice_id: Optional[str] = None) -> bytes:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(self.service.synthesize, language, text, voice_id)
+        )
+
+    async def synthesize_stream(self, language: str, text: str, voice_id: Optional[str] = None,
+                                chunk_size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        # Read the blocking stream on the executor and hand chunks to the event loop as they
+        # arrive. The queue is bounded, so the provider is read no faster than the consumer reads.
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_READ_AHEAD_CHUNKS)
+        stopped = threading.Event()
+        stream = getattr(self.service, "synthesize_stream", None)
+
+        def put(item) -> None:
+            if stopped.is_set():
+                return
+            try:
+                future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+            except RuntimeError:
+                # The event loop is closed; nobody is listening any more
+                stopped.set()
+                return
+            # Wait for room in the queue; the consumer drains it when it stops, and a loop
+            # that closed without doing so never will
+            while True:
+                try:
+                    future.result(timeout=STREAM_STOP_POLL_SECONDS)
+                    return
+                except concurrent.futures.TimeoutError:
+                    if loop.is_closed():
+                        stopped.set()
+                        return
+                except concurrent.futures.CancelledError:
+                    return
+
+        def produce() -> None:
+            try:
+                if stream is None:
+                    put(self.service.synthesize(language, text, voice_id))
+                else:
+                    chunks = stream(language, text, voice_id, chunk_size)
+                    try:
+                        for chunk in chunks:
+                            if stopped.is_set():
+                                break
+                            put(chunk)
+                    finally:
+                        chunks.close()
+            except BaseException as e:
+                put(e)
+            else:
+                put(None)
+
+        loop.run_in_executor(self.executor, produce)
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            stopped.set()
+            # Unblock a producer waiting for room; it puts nothing more once stopped is set
+            while not queue.empty():
+                queue.get_nowait()
+
+
+_shared_lock = threading.Lock()
+_shared_executor: Optional[ThreadPoolExecutor] = None
+
+
+def shared_provider_executor(max_workers: int) -> ThreadPoolExecutor:
+    """Return the process-wide executor for blocking TTS provider calls, creating it on first use.
+
+    Every request in the process sends its provider calls here, so concurrent requests
+    are limited by the provider's connection pool rather than by each request's window.
+
+    Args:
+        max_workers: Number of threads, normally config.max_pool_connections;
+            only used when the executor is created.
+    """
+    global _shared_executor
+    with _shared_lock:
+        if _shared_executor is None:
+            _shared_executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="tts-provider")
+        return _shared_executor
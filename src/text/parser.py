@@ -1,3 +1,9 @@
+import codecs
+from typing import BinaryIO, Iterable, Iterator, TextIO, Union
+
+# Characters read per chunk when streaming a text file
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
 class TextParser:
     def load_text(self, file_path: str) -> str:
         with open(file_path, "r", encoding="utf-8") as f:
@@ -8,3 +14,46 @@ class TextParser:
         # Remove extra whitespace and newlines
         text = " ".join(text.split())
         return text
+
+    def iter_text(self, source: Union[str, BinaryIO, TextIO, Iterable[Union[str, bytes]]],
+                  chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+        """Read text in bounded chunks, preprocessing it as it is read.
+
+        Whitespace is collapsed across chunk boundaries, so the chunks joined together
+        equal preprocess_text of the whole text, but the whole text is never held in memory.
+
+        Args:
+            source: Path of a UTF-8 text file, a text or binary file object, or an iterable of
+                str or UTF-8 bytes chunks (e.g. an HTTP request body)
+            chunk_size: Characters (or bytes) read from a file per chunk
+
+        Yields:
+            Preprocessed chunks of text; none is empty
+
+        Raises:
+            UnicodeDecodeError: If bytes are not valid UTF-8.
+        """
+        if isinstance(source, str):
+            with open(source, "r", encoding="utf-8") as f:
+                yield from self.iter_text(f, chunk_size)
+            return
+        if hasattr(source, "read"):
+            read = source.read
+            source = iter(lambda: read(chunk_size), read(0))
+
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        started = False
+        # Whitespace at the end of the last chunk, which becomes a space if more text follows
+        pending_space = False
+        for chunk in source:
+            text = decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+            words = text.split()
+            if not words:
+                pending_space = pending_space or bool(text)
+                continue
+            separator = " " if started and (pending_space or text[0].isspace()) else ""
+            yield separator + " ".join(words)
+            started = True
+            pending_space = text[-1].isspace()
+        # Raises on a truncated character at the end of the input
+        decoder.decode(b"", final=True)
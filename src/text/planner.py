@@ -0,0 +1,194 @@
+import re
+import zlib
+from collections import deque
+from typing import Callable, List, Optional, Tuple
+from src.text.segmenter import TextSegmenter
+
+# Where an overlong sentence may be split: after whitespace or a clause mark
+_CLAUSE_BREAK = re.compile(r"(?<=[\s、，,;；:：])")
+
+POLICIES = ("throughput", "latency")
+
+# Average number of sentences per chunk of plan_stable: a chunk ends after a sentence
+# whose hash is a multiple of this
+STABLE_GROUP_SIZE = 4
+
+
+class ChunkPlanner:
+    """Plans the chunks of text sent to the TTS service, one provider call each.
+
+    Sits between LanguageDetector and SpeechService. Adjacent segments of the same
+    language (and so the same voice) are merged, and every chunk is kept within the
+    provider's per-call limit by splitting at sentence boundaries (TextSegmenter), then
+    at clause marks or spaces, and only as a last resort inside a word.
+
+    Policies:
+    - throughput: pack sentences into as few chunks as the limit allows, minimizing calls.
+    - latency: make the first chunk at most first_chunk_length long so the first audio
+      arrives quickly, then pack the rest as throughput does.
+    """
+
+    def __init__(self, segmenter: TextSegmenter, max_length: Optional[int] = None,
+                 length: Callable[[str], int] = len, policy: str = "throughput",
+                 first_chunk_length: int = 100):
+        """Create the planner.
+
+        Args:
+            segmenter: Sentence segmenter used to find split points.
+            max_length: Longest chunk the provider accepts, measured by length (None: no limit).
+            length: Function measuring text as the provider counts it (e.g. UTF-8 bytes).
+            policy: 'throughput' or 'latency'.
+            first_chunk_length: Target length of the first chunk under the latency policy.
+
+        Raises:
+            ValueError: If policy is not a known policy.
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Invalid chunk policy {policy!r}; choose one of {list(POLICIES)}")
+        self.segmenter = segmenter
+        self.max_length = max_length
+        self.length = length
+        self.policy = policy
+        self.first_chunk_length = first_chunk_length
+
+    @classmethod
+    def from_config(cls, config, segmenter: TextSegmenter, max_length: Optional[int] = None,
+                    length: Callable[[str], int] = len) -> "ChunkPlanner":
+        """Build the planner described by config for a provider's limit.
+
+        config.max_chunk_length, if set, lowers the provider's limit.
+        """
+        if config.max_chunk_length:
+            max_length = min(max_length or config.max_chunk_length, config.max_chunk_length)
+        return cls(segmenter, max_length, length, config.chunk_policy, config.first_chunk_length)
+
+    def plan(self, language_segments: List[Tuple[str, str]], continued: bool = False) -> List[Tuple[str, str]]:
+        """Turn language segments into chunks.
+
+        Args:
+            language_segments: (language_code, text) tuples, in order
+            continued: The segments continue a text whose first chunk has already been
+                planned, so the latency policy's short first chunk does not apply
+
+        Returns:
+            (language_code, text) tuples, one per provider call
+        """
+        chunks: List[Tuple[str, str]] = []
+        for language, text in self._merge(language_segments):
+            self._pack(language, text, chunks, continued)
+        return chunks
+
+    def plan_stable(self, language_segments: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """Turn language segments into chunks whose boundaries only depend on the text near them.
+
+        Chunks of plan() are packed from the start of each language run, so an edit early in
+        a run moves every boundary after it. Here a chunk ends after a sentence whose hash
+        is a multiple of STABLE_GROUP_SIZE (content-defined chunking), at a language change,
+        or where the length limit requires it; an edit therefore only changes the chunks
+        around it, and a document re-rendered after an edit repeats the other chunks
+        exactly. The latency policy does not apply.
+
+        Args:
+            language_segments: (language_code, text) tuples, in order
+
+        Returns:
+            (language_code, text) tuples, one per provider call
+        """
+        chunks: List[Tuple[str, str]] = []
+        for language, text in self._merge(language_segments):
+            current: List[str] = []
+            current_length = 0
+            for sentence in self.segmenter.segment_by_sentence(text):
+                for piece in self._split(sentence, self.max_length):
+                    piece_length = self.length(piece)
+                    if current and self.max_length is not None and current_length + 1 + piece_length > self.max_length:
+                        chunks.append((language, " ".join(current)))
+                        current, current_length = [], 0
+                    current.append(piece)
+                    current_length += piece_length + (1 if len(current) > 1 else 0)
+                    if zlib.crc32(piece.encode("utf-8")) % STABLE_GROUP_SIZE == 0:
+                        chunks.append((language, " ".join(current)))
+                        current, current_length = [], 0
+            if current:
+                chunks.append((language, " ".join(current)))
+        return chunks
+
+    @staticmethod
+    def _merge(language_segments: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """Merge adjacent segments of the same language."""
+        merged: List[Tuple[str, str]] = []
+        for language, text in language_segments:
+            if merged and merged[-1][0] == language:
+                merged[-1] = (language, f"{merged[-1][1]} {text}")
+            else:
+                merged.append((language, text))
+        return merged
+
+    def _limit(self, chunks: List[Tuple[str, str]], continued: bool = False) -> Optional[int]:
+        """Return the length limit of the next chunk."""
+        if self.policy == "latency" and not chunks and not continued:
+            return min(self.first_chunk_length, self.max_length or self.first_chunk_length)
+        return self.max_length
+
+    def _pack(self, language: str, text: str, chunks: List[Tuple[str, str]], continued: bool) -> None:
+        limit = self._limit(chunks, continued)
+        if limit is None or self.length(text) <= limit:
+            chunks.append((language, text))
+            return
+
+        pieces = deque(
+            piece
+            for sentence in self.segmenter.segment_by_sentence(text)
+            for piece in self._split(sentence, self.max_length)
+        )
+        current: List[str] = []
+        current_length = 0
+        while pieces:
+            piece = pieces.popleft()
+            piece_length = self.length(piece)
+            # Pieces are joined with single spaces
+            if current and current_length + 1 + piece_length > limit:
+                chunks.append((language, " ".join(current)))
+                current, current_length = [], 0
+                limit = self._limit(chunks, continued)
+            if not current and piece_length > limit:
+                # Only the latency policy's first chunk is shorter than a piece: cut it there
+                # and put the rest of the piece back
+                head = self._split(piece, limit)[0]
+                rest = piece[piece.index(head) + len(head):].strip()
+                if rest:
+                    pieces.appendleft(rest)
+                piece, piece_length = head, self.length(head)
+            current.append(piece)
+            current_length += piece_length + (1 if len(current) > 1 else 0)
+        if current:
+            chunks.append((language, " ".join(current)))
+
+    def _split(self, text: str, limit: Optional[int]) -> List[str]:
+        """Split text longer than limit at clause marks or spaces, or else inside a word."""
+        if limit is None or self.length(text) <= limit:
+            return [text]
+        parts: List[str] = []
+        current = ""
+        for token in _CLAUSE_BREAK.split(text):
+            if current and self.length(current + token) > limit:
+                parts.append(current)
+                current = ""
+            while self.length(token) > limit:
+                cut = self._prefix_within(token, limit)
+                parts.append(token[:cut])
+                token = token[cut:]
+            current += token
+        parts.append(current)
+        return [part.strip() for part in parts if part.strip()]
+
+    def _prefix_within(self, text: str, limit: int) -> int:
+        """Return the length of the longest prefix of text within limit (at least 1 character)."""
+        low, high = 1, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.length(text[:middle]) <= limit:
+                low = middle
+            else:
+                high = middle - 1
+        return low
@@ -1,5 +1,12 @@
+import re
 from nltk.tokenize import PunktSentenceTokenizer
-from typing import List
+from typing import Iterable, Iterator, List
+
+# Japanese sentence ends, unless a closing bracket follows (the sentence ends after it)
+JAPANESE_SENTENCE_BREAK = re.compile(r"(?<=[。！？])(?![」』）])\s*")
+
+# Longest unfinished sentence iter_sentences carries between chunks before cutting it at a space
+MAX_PARTIAL_SENTENCE_LENGTH = 10000
 
 class TextSegmenter:
     def __init__(self):
@@ -9,6 +16,7 @@ class TextSegmenter:
         - Common abbreviations (Mr., Mrs., Dr., etc.)
         - Common sentence-final punctuation (.!?)
         - Special cases like decimal numbers and ellipses
+        - Japanese sentence ends (。！？), which Punkt does not split at
         """
         # Initialize with common English abbreviations
         self.tokenizer = PunktSentenceTokenizer()
@@ -31,4 +39,39 @@ class TextSegmenter:
         """
         if not text.strip():
             return [""]
-        return self.tokenizer.tokenize(text)
+        return [
+            part
+            for sentence in self.tokenizer.tokenize(text)
+            for part in JAPANESE_SENTENCE_BREAK.split(sentence)
+            if part
+        ]
+
+    def iter_sentences(self, chunks: Iterable[str],
+                       max_partial_length: int = MAX_PARTIAL_SENTENCE_LENGTH) -> Iterator[str]:
+        """Split streamed text into sentences, yielding each as soon as it is complete.
+
+        The last sentence of what has been read so far may continue in the next chunk, so it
+        is carried over and segmented again with the following text. Text without a sentence
+        end is cut at its last space once it exceeds max_partial_length, which bounds the
+        memory used however long the input is.
+
+        Args:
+            chunks: Preprocessed text (see TextParser.iter_text), in order.
+            max_partial_length: Longest unfinished sentence carried between chunks.
+
+        Yields:
+            The sentences of the text, as segment_by_sentence would return them
+        """
+        partial = ""
+        for chunk in chunks:
+            sentences = self.segment_by_sentence(partial + chunk)
+            partial = sentences.pop()
+            yield from sentences
+            while len(partial) > max_partial_length:
+                cut = partial.rfind(" ", 0, max_partial_length)
+                if cut <= 0:
+                    cut = max_partial_length
+                yield partial[:cut].strip()
+                partial = partial[cut:].lstrip()
+        if partial.strip():
+            yield partial
@@ -0,0 +1,295 @@
+import asyncio
+import io
+import os
+import struct
+import wave
+from src.agent import TTSAgent
+from src.config import Config
+from src.speech.exceptions import TTSInvalidInputError
+
+class PCMTTSService:
+    """Returns one 16-bit sample per character so segment boundaries are easy to check."""
+    def synthesize(self, language: str, text: str, voice_id: str = None) -> bytes:
+        return struct.pack(f"<{len(text)}h", *([1000] * len(text)))
+
+def create_agent():
+    config = Config()
+    config.tts_service = "aws_polly"
+    agent = TTSAgent(config)
+    agent.speech_service.tts_service = PCMTTSService()
+    return agent
+
+def test_astream_yields_header_then_segments_in_order():
+    agent = create_agent()
+
+    async def collect():
+        return [chunk async for chunk in agent.astream("Hello! こんにちは。")]
+
+    chunks = asyncio.run(collect())
+    header, first, silence, second = chunks
+
+    assert header[:4] == b"RIFF" and header[8:12] == b"WAVE"
+    assert struct.unpack("<I", header[40:44])[0] == 0xFFFFFFFF  # open-ended data chunk
+    assert len(first) == len("Hello!") * 2
+    assert silence == bytes(16000 // 2 * 2)  # 500ms of 16-bit silence
+    assert len(second) == len("こんにちは。") * 2
+
+def test_astream_empty_text_yields_header_only():
+    agent = create_agent()
+
+    async def collect():
+        return [chunk async for chunk in agent.astream("   ")]
+
+    chunks = asyncio.run(collect())
+    assert len(chunks) == 1
+    assert chunks[0][:4] == b"RIFF"
+
+def test_astream_passes_chunks_through_as_they_arrive():
+    agent = create_agent()
+
+    class ChunkedTTSService(PCMTTSService):
+        def synthesize_stream(self, language, text, voice_id=None, chunk_size=8192):
+            yield b"\x01\x00" * 2
+            yield b"\x02\x00" * 2
+
+    agent.speech_service.tts_service = ChunkedTTSService()
+
+    async def collect():
+        return [chunk async for chunk in agent.astream("Hello! こんにちは。")]
+
+    chunks = asyncio.run(collect())
+    assert chunks[1:] == [
+        b"\x01\x00" * 2, b"\x02\x00" * 2,
+        bytes(16000),
+        b"\x01\x00" * 2, b"\x02\x00" * 2,
+    ]
+
+def test_synthesize_writes_segments_with_silence(tmp_path):
+    agent = create_agent()
+    output_path = str(tmp_path / "output.wav")
+
+    _, segments = agent.synthesize("Hello! こんにちは。", output_path)
+
+    with wave.open(output_path, "rb") as wf:
+        frames = wf.readframes(wf.getnframes())
+    expected = agent.output_manager.merge_segments([
+        agent.speech_service.tts_service.synthesize("en", "Hello!"),
+        agent.speech_service.tts_service.synthesize("ja", "こんにちは。"),
+    ])
+    assert len(segments) == 2
+    assert frames == expected
+
+def test_asynthesize_failure_removes_output(tmp_path):
+    agent = create_agent()
+    output_path = str(tmp_path / "output.wav")
+
+    class FailingTTSService(PCMTTSService):
+        def synthesize(self, language, text, voice_id=None):
+            if language.startswith("ja"):
+                raise TTSInvalidInputError("unsupported text")
+            return super().synthesize(language, text, voice_id)
+
+    agent.speech_service.tts_service = FailingTTSService()
+    try:
+        asyncio.run(agent.asynthesize("Hello! こんにちは。", output_path))
+        assert False, "Should raise TTSInvalidInputError"
+    except TTSInvalidInputError:
+        pass
+    assert not os.path.exists(output_path)
+
+def test_every_entry_point_removes_output_on_failure(tmp_path):
+    agent = create_agent()
+
+    class FailingTTSService(PCMTTSService):
+        def synthesize(self, language, text, voice_id=None):
+            if language.startswith("ja"):
+                raise TTSInvalidInputError("unsupported text")
+            return super().synthesize(language, text, voice_id)
+
+    agent.speech_service.tts_service = FailingTTSService()
+    renders = {
+        "synthesize": lambda path: agent.synthesize("Hello! こんにちは。", path),
+        "synthesize_document": lambda path: agent.synthesize_document("doc", "Hello! こんにちは。", path),
+        "synthesize_file": lambda path: agent.synthesize_file(["Hello! こんにちは。"], path),
+    }
+    for name, render in renders.items():
+        output_path = str(tmp_path / f"{name}.wav")
+        try:
+            render(output_path)
+            assert False, f"{name} should raise TTSInvalidInputError"
+        except TTSInvalidInputError:
+            pass
+        assert not os.path.exists(output_path)
+
+def test_postprocessing_chooses_gaps_from_punctuation():
+    config = Config()
+    config.tts_service = "aws_polly"
+    config.postprocess_enabled = True
+    agent = TTSAgent(config)
+    agent.speech_service.tts_service = PCMTTSService()
+
+    async def collect():
+        return [chunk async for chunk in agent.astream("Hello! こんにちは。")]
+
+    silence = asyncio.run(collect())[2]
+    # Sentence end plus a language change
+    assert len(silence) == 16000 * (500 + 150) // 1000 * 2
+
+def test_astream_postprocesses_chunks():
+    config = Config()
+    config.tts_service = "aws_polly"
+    config.postprocess_enabled = True
+    agent = TTSAgent(config)
+
+    class ChunkedTTSService(PCMTTSService):
+        def synthesize_stream(self, language, text, voice_id=None, chunk_size=8192):
+            yield bytes(3200)
+            yield struct.pack("<1600h", *([300, -300] * 800))
+            yield struct.pack("<1600h", *([300, -300] * 800))
+
+    agent.speech_service.tts_service = ChunkedTTSService()
+
+    async def collect():
+        return [chunk async for chunk in agent.astream("Hello! こんにちは。")]
+
+    chunks = asyncio.run(collect())
+    # The silent chunk is trimmed down to the 20ms padding, the quiet ones are amplified by the same gain
+    padding = 16000 * 20 // 1000 * 2
+    assert len(chunks) == 1 + 2 + 1 + 2
+    assert chunks[1][:padding] == bytes(padding)
+    assert chunks[1][padding:] == chunks[2]
+    assert abs(struct.unpack("<h", chunks[2][:2])[0]) > 300
+
+def test_synthesize_resamples_to_requested_rate(tmp_path):
+    agent = create_agent()
+    output_path = str(tmp_path / "output.wav")
+
+    agent.synthesize("Hello! こんにちは。", output_path, sample_rate=8000)
+
+    with wave.open(output_path, "rb") as wf:
+        assert wf.getframerate() == 8000
+        # Half the samples of each 16kHz segment, plus 500ms of silence at 8kHz
+        assert wf.getnframes() == len("Hello!") // 2 + 4000 + len("こんにちは。") // 2
+
+def test_astream_resamples_to_requested_rate():
+    agent = create_agent()
+
+    async def collect():
+        return b"".join([chunk async for chunk in agent.astream("Hello! こんにちは。", sample_rate=8000)])
+
+    stream = asyncio.run(collect())
+    assert struct.unpack("<I", stream[24:28])[0] == 8000
+    assert len(stream) == 44 + (len("Hello!") // 2 + 4000 + len("こんにちは。") // 2) * 2
+
+def test_repeated_request_is_served_from_render_cache(tmp_path):
+    config = Config()
+    config.tts_service = "aws_polly"
+    config.render_cache_dir = str(tmp_path / "render")
+    agent = TTSAgent(config)
+    agent.speech_service.tts_service = PCMTTSService()
+    first_path = str(tmp_path / "first.wav")
+    first = agent.synthesize("Hello! こんにちは。", first_path)
+    assert not first.cache_hit
+
+    # A hit must not reach the provider
+    agent.speech_service.tts_service = None
+    output = io.BytesIO(b"prefix")
+    output.seek(0, io.SEEK_END)
+    output_path, segments = second = asyncio.run(agent.asynthesize("Hello!  こんにちは。", output, audio_format="wav"))
+
+    assert second.cache_hit
+    assert output_path is output
+    assert segments == first[1]
+    with open(first_path, "rb") as f:
+        assert output.getvalue() == b"prefix" + f.read()
+
+    # Settings that change the segmentation are part of the key
+    agent.config.neutral_attach = "next"
+    key = agent._render_key("Hello! こんにちは。", None, None, "wav", None)
+    agent.config.neutral_attach = "previous"
+    assert key != agent._render_key("Hello! こんにちは。", None, None, "wav", None)
+
+def test_synthesize_plans_chunks_within_provider_limit(tmp_path):
+    config = Config()
+    config.tts_service = "aws_polly"
+    config.max_chunk_length = 20
+    agent = TTSAgent(config)
+    agent.speech_service.tts_service = PCMTTSService()
+
+    _, segments = agent.synthesize("Hello there. How are you today? こんにちは。", str(tmp_path / "output.wav"))
+
+    assert segments == ["en: Hello there.", "en: How are you today?", "ja: こんにちは。"]
+
+def test_ssml_batching_makes_one_request_with_the_same_audio(tmp_path):
+    config = Config()
+    config.tts_service = "local_synthetic"
+    config.synthetic_latency_ms = 0
+    config.cache_enabled = False
+    text = "Hello there! こんにちは。 See you & goodbye."
+
+    paths = []
+    calls = []
+    for ssml_batching in (False, True):
+        config.ssml_batching = ssml_batching
+        agent = TTSAgent(config)
+        service = agent.speech_service.tts_service
+        synthesize = service.synthesize
+        service.synthesize = lambda language, text, voice_id=None: calls.append(language) or synthesize(
+            language, text, voice_id
+        )
+        paths.append(str(tmp_path / f"{ssml_batching}.wav"))
+        _, segments = agent.synthesize(text, paths[-1])
+        assert len(segments) == 3
+
+    # Three segments and two pauses, rendered by one SSML request
+    assert calls == ["en", "ja", "en", "ssml"]
+    with open(paths[0], "rb") as unbatched, open(paths[1], "rb") as batched:
+        assert unbatched.read() == batched.read()
+
+def test_synthesize_file_streams_text_in_blocks(tmp_path, monkeypatch):
+    import src.agent
+
+    agent = create_agent()
+    text = " ".join(["Hello there. How are you? こんにちは。元気ですか？"] * 20)
+    expected_path = str(tmp_path / "expected.wav")
+    _, segments = agent.synthesize(text, expected_path)
+
+    # Blocks much shorter than the text: language runs still continue across blocks
+    monkeypatch.setattr(src.agent, "TEXT_BLOCK_LENGTH", 100)
+    source = tmp_path / "text.txt"
+    source.write_text(text, encoding="utf-8")
+    output_path = str(tmp_path / "streamed.wav")
+    assert agent.synthesize_file(str(source), output_path, chunk_size=17) == (output_path, len(segments))
+
+    with open(expected_path, "rb") as expected, open(output_path, "rb") as streamed:
+        assert streamed.read() == expected.read()
+
+def test_synthesize_document_only_synthesizes_edited_segments(tmp_path):
+    agent = create_agent()
+    calls = []
+    synthesize = agent.speech_service.tts_service.synthesize
+    agent.speech_service.tts_service.synthesize = lambda language, text, voice_id=None: (
+        calls.append(text) or synthesize(language, text, voice_id)
+    )
+    agent.speech_service.cache = None
+    sentences = [f"This is sentence number {number}." for number in range(30)]
+    text = " ".join(sentences[:15]) + " 東京は大きい都市です。 " + " ".join(sentences[15:])
+
+    first = agent.synthesize_document("lesson-1", text, str(tmp_path / "first.wav"))
+    assert first.reused_segments == 0
+    assert len(calls) == len(first[1])
+
+    calls.clear()
+    edited = text.replace("sentence number 20.", "sentence number twenty.")
+    output_path = str(tmp_path / "second.wav")
+    second = agent.synthesize_document("lesson-1", edited, output_path)
+    assert calls == [segment.split(": ", 1)[1] for segment in second[1] if "twenty" in segment]
+    assert second.reused_segments == len(second[1]) - 1
+    assert agent.document_sessions.stats()["documents"] == 1
+
+    # The output is the same as a render of the edited text from scratch
+    agent.document_sessions.discard("lesson-1")
+    fresh_path = str(tmp_path / "fresh.wav")
+    agent.synthesize_document("lesson-1", edited, fresh_path)
+    with open(output_path, "rb") as reused, open(fresh_path, "rb") as fresh:
+        assert reused.read() == fresh.read()
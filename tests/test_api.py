@@ -0,0 +1,134 @@
+import os
+import sys
+import pytest
+
+pytest.importorskip("fastapi")
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api"))
+os.environ.setdefault("TTS_SYNTHETIC_LATENCY_MS", "0")
+import main
+
+client = TestClient(main.app)
+
+def synthesize_request(**overrides):
+    request = {
+        "text": "Hello! こんにちは。",
+        "tts_service": "local_synthetic",
+        "english_voice_id": "synthetic-en-1",
+        "japanese_voice_id": "synthetic-ja-1",
+        "audio_format": "wav",
+    }
+    request.update(overrides)
+    return request
+
+def test_synthesize_and_fetch_audio():
+    response = client.post("/synthesize", json=synthesize_request())
+    assert response.status_code == 200
+    body = response.json()
+    assert body["segments"] == ["en: Hello!", "ja: こんにちは。"]
+
+    audio = client.get(body["audio_url"])
+    assert audio.status_code == 200
+    assert audio.content[:4] == b"RIFF"
+
+def test_synthesize_stream():
+    response = client.post("/synthesize/stream", json=synthesize_request())
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "audio/wav"
+    assert response.content[:4] == b"RIFF"
+    assert len(response.content) > 44
+
+def test_synthesize_text_body():
+    def body():
+        yield "Hello! こんにちは。".encode("utf-8")[:9]
+        yield "Hello! こんにちは。".encode("utf-8")[9:]
+
+    response = client.post(
+        "/synthesize/text",
+        params={"tts_service": "local_synthetic", "english_voice_id": "synthetic-en-1",
+                "japanese_voice_id": "synthetic-ja-1"},
+        content=body()
+    )
+    assert response.status_code == 200
+    assert response.json()["segment_count"] == 2
+
+    # Written to disk, not held by the in-memory store
+    stored = main.audio_store.get(response.json()["request_id"], "output.wav")
+    assert stored.data is None and os.path.isfile(stored.path)
+
+    audio = client.get(response.json()["audio_url"])
+    assert audio.content[:4] == b"RIFF"
+
+def test_document_revisions_reuse_audio():
+    request = synthesize_request(text="Hello! How are you? こんにちは。")
+    first = client.put("/documents/lesson-1", json=request)
+    assert first.status_code == 200
+    assert first.json()["reused_segments"] == 0
+
+    second = client.put("/documents/lesson-1", json=request)
+    assert second.json()["reused_segments"] == len(second.json()["segments"])
+    assert client.get(second.json()["audio_url"]).content[:4] == b"RIFF"
+
+    assert client.delete("/documents/lesson-1", params={"tts_service": "local_synthetic"}).status_code == 200
+    assert client.delete("/documents/lesson-1", params={"tts_service": "local_synthetic"}).status_code == 404
+
+def test_synthesize_invalid_service():
+    response = client.post("/synthesize", json=synthesize_request(tts_service="invalid_service"))
+    assert response.status_code == 500
+
+def test_synthesize_sample_rate():
+    response = client.post("/synthesize", json=synthesize_request(sample_rate=8000))
+    assert response.status_code == 200
+    audio = client.get(response.json()["audio_url"])
+    assert int.from_bytes(audio.content[24:28], "little") == 8000
+
+    response = client.post("/synthesize", json=synthesize_request(sample_rate=12345))
+    assert response.status_code == 400
+
+def test_audio_is_served_once_from_the_store():
+    response = client.post("/synthesize", json=synthesize_request(audio_format="flac"))
+    assert response.status_code == 200
+    audio_url = response.json()["audio_url"]
+
+    audio = client.get(audio_url)
+    assert audio.status_code == 200
+    assert audio.headers["content-type"] == "audio/flac"
+    assert audio.content[:4] == b"fLaC"
+    assert client.get(audio_url).status_code == 404
+
+def test_delete_audio():
+    request_id = client.post("/synthesize", json=synthesize_request()).json()["request_id"]
+    assert client.delete(f"/audio/{request_id}").status_code == 200
+    assert client.delete(f"/audio/{request_id}").status_code == 404
+
+def test_audio_conditional_and_range_requests():
+    audio_url = client.post("/synthesize", json=synthesize_request()).json()["audio_url"]
+
+    partial = client.get(audio_url, headers={"Range": "bytes=0-3"})
+    assert partial.status_code == 206
+    assert partial.content == b"RIFF"
+    etag = partial.headers["etag"]
+    size = int(partial.headers["content-range"].split("/")[1])
+    assert partial.headers["content-range"] == f"bytes 0-3/{size}"
+
+    tail = client.get(audio_url, headers={"Range": "bytes=-2"})
+    assert tail.status_code == 206 and len(tail.content) == 2
+    assert client.get(audio_url, headers={"Range": f"bytes={size}-"}).status_code == 416
+    assert client.get(audio_url, headers={"If-None-Match": etag}).status_code == 304
+
+    # Partial and conditional responses leave the audio in place; a full download removes it
+    full = client.get(audio_url)
+    assert full.status_code == 200 and len(full.content) == size
+    assert full.content[-2:] == tail.content
+    assert client.get(audio_url).status_code == 404
+
+def test_cacheable_audio_is_kept(monkeypatch):
+    monkeypatch.setattr(main.config, "audio_cacheable", True)
+    audio_url = client.post("/synthesize", json=synthesize_request()).json()["audio_url"]
+
+    first = client.get(audio_url)
+    assert "immutable" in first.headers["cache-control"]
+    second = client.get(audio_url)
+    assert second.status_code == 200
+    assert second.headers["etag"] == first.headers["etag"]
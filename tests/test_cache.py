@@ -0,0 +1,128 @@
+import io
+import os
+import tempfile
+from src.cache import DiskCache, MemoryLRUCache, RenderCache, TwoTierCache, make_cache_key
+from src.config import Config
+from src.speech.service import SpeechService
+
+def test_cache_key_is_stable_and_distinct():
+    key = make_cache_key("aws_polly", "Joanna", "en", "Hello", 16000, "pcm")
+    assert key == make_cache_key("aws_polly", "Joanna", "en", "Hello", 16000, "pcm")
+    assert key != make_cache_key("aws_polly", "Matthew", "en", "Hello", 16000, "pcm")
+    assert key != make_cache_key("google_cloud", "Joanna", "en", "Hello", 16000, "pcm")
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryLRUCache(max_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    assert cache.get("a") == b"aaaa"  # "a" is now most recently used
+
+    cache.put("c", b"cccc")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"aaaa"
+    assert cache.get("c") == b"cccc"
+    assert cache.current_bytes == 8
+
+    cache.put("big", b"x" * 11)
+    assert cache.get("big") is None
+
+def test_disk_cache_persists_and_evicts():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache = DiskCache(temp_dir, max_bytes=100)
+        cache.put("aa01", b"x" * 40)
+        cache.put("bb02", b"y" * 40)
+
+        # A second instance (e.g. another worker process) sees the same entries
+        other = DiskCache(temp_dir, max_bytes=100)
+        assert other.get("aa01") == b"x" * 40
+        os.utime(other._path("bb02"), (0, 0))  # make "bb02" the least recently used
+
+        cache.put("cc03", b"z" * 40)
+        assert cache.get("bb02") is None
+        assert cache.get("aa01") == b"x" * 40
+        assert cache.get("cc03") == b"z" * 40
+
+def test_disk_cache_ignores_foreign_directories():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        os.makedirs(os.path.join(temp_dir, "parts", "ab"))
+        with open(os.path.join(temp_dir, "parts", "ab", "ab01"), "wb") as f:
+            f.write(b"p" * 80)
+        os.makedirs(os.path.join(temp_dir, "cc", "cc-subdir"))
+
+        cache = DiskCache(temp_dir, max_bytes=100)
+        assert cache._scan_size() == 0
+        cache.put("aa01", b"x" * 60)
+        cache.put("bb02", b"y" * 60)
+
+        assert cache.get("bb02") == b"y" * 60
+        assert os.path.isdir(os.path.join(temp_dir, "cc", "cc-subdir"))
+        assert os.path.getsize(os.path.join(temp_dir, "parts", "ab", "ab01")) == 80
+
+def test_part_cache_is_kept_apart_from_the_synthesis_cache():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config = Config()
+        config.cache_dir = os.path.join(temp_dir, "cache")
+        config.part_cache_enabled = True
+        config.part_cache_dir = None
+        parts = TwoTierCache.parts_from_config(config)
+        assert parts.disk.directory == os.path.join(temp_dir, "cache-parts")
+        assert parts.disk.max_bytes == config.part_cache_disk_mb * 1024 * 1024
+
+def test_two_tier_cache_stats():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache = TwoTierCache(MemoryLRUCache(1024), DiskCache(temp_dir, 1024))
+        assert cache.get("k") is None
+        cache.put("k", b"audio")
+        assert cache.get("k") == b"audio"
+
+        # A fresh memory tier falls back to disk and promotes the entry
+        cache = TwoTierCache(MemoryLRUCache(1024), DiskCache(temp_dir, 1024))
+        assert cache.get("k") == b"audio"
+        assert cache.get("k") == b"audio"
+        assert cache.stats() == {"memory_hits": 1, "disk_hits": 1, "misses": 0, "hits": 2, "memory_entries": 1}
+
+def test_speech_service_uses_cache():
+    config = Config()
+    config.tts_service = "aws_polly"
+    config.cache_enabled = True
+    config.cache_dir = None
+
+    service = SpeechService(config)
+    calls = []
+
+    class CountingTTSService:
+        def synthesize(self, language, text, voice_id=None):
+            calls.append(text)
+            return text.encode()
+
+    service.tts_service = CountingTTSService()
+    assert service.synthesize_segment("Hello  world", "en", "Joanna") == b"Hello  world"
+    # Whitespace differences normalize to the same cache entry
+    assert service.synthesize_segment("Hello world", "en", "Joanna") == b"Hello  world"
+    assert service.synthesize_segment("Hello world", "en", "Matthew") == b"Hello world"
+
+    assert calls == ["Hello  world", "Hello world"]
+    stats = service.cache_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+
+def test_render_cache_round_trip(tmp_path):
+    cache = RenderCache(DiskCache(str(tmp_path), max_bytes=1024 * 1024))
+    key = RenderCache.request_key("Hello   world", "aws_polly", "Joanna", "Mizuki", "wav", 16000)
+    assert key == RenderCache.request_key(" Hello world ", "aws_polly", "Joanna", "Mizuki", "wav", 16000)
+    assert key != RenderCache.request_key("Hello world", "aws_polly", "Joanna", "Mizuki", "mp3", 16000)
+
+    assert cache.get(key) is None
+    output = io.BytesIO(b"headRIFF....")
+    output.seek(4)
+    cache.put(key, output, ["en: Hello world"])
+    audio_file, segments = cache.get(key)
+    with audio_file:
+        assert audio_file.read() == b"RIFF...."
+    assert segments == ["en: Hello world"]
+    assert cache.stats() == {"hits": 1, "misses": 1}
+
+    # Outputs larger than the cache are skipped without being read
+    small = RenderCache(DiskCache(str(tmp_path / "small"), max_bytes=4))
+    small.put(key, io.BytesIO(b"RIFF...."), ["en: Hello world"])
+    assert small.get(key) is None
@@ -1,3 +1,4 @@
+import pytest
 from src.language.detector import LanguageDetector
 from src.config import Config
 
@@ -73,3 +74,36 @@ def test_segment_empty_text():
     
     whitespace_segments = detector.segment_by_language("   \n\t   ")
     assert len(whitespace_segments) == 0
+
+def test_segment_splits_mixed_sentences():
+    config = Config()
+    detector = LanguageDetector(config)
+
+    assert detector.segment_by_language("東京 is great") == [("ja", "東京"), ("en", "is great")]
+    assert detector.segment_by_language("私はiPhoneを使います。") == [
+        ("ja", "私は"), ("en", "iPhone"), ("ja", "を使います。")
+    ]
+    # Sentences without letters join their neighbours
+    assert detector.segment_by_language("Hello! 123. こんにちは。") == [("en", "Hello! 123."), ("ja", "こんにちは。")]
+    assert detector.segment_by_language("1. 日本語です") == [("ja", "1. 日本語です")]
+    assert detector.segment_by_language("!!!") == [("en", "!!!")]
+
+def test_segment_neutral_attach_rules():
+    config = Config()
+    config.neutral_attach = "previous"
+    assert LanguageDetector(config).segment_by_language("I have 3 匹の猫") == [("en", "I have 3"), ("ja", "匹の猫")]
+
+    config.neutral_attach = "next"
+    assert LanguageDetector(config).segment_by_language("I have 3 匹の猫") == [("en", "I have"), ("ja", "3 匹の猫")]
+    # Sentence ends stay with their sentence
+    assert LanguageDetector(config).segment_by_language("Hello. 今日は") == [("en", "Hello."), ("ja", "今日は")]
+
+    config.neutral_attach = "nearest"
+    with pytest.raises(ValueError):
+        LanguageDetector(config)
+
+def test_segment_lone_surrogates():
+    """Lone surrogates (valid in JSON strings) are neutral characters rather than an error."""
+    detector = LanguageDetector(Config())
+    assert detector.segment_by_language("Hello \ud800 world") == [("en", "Hello \ud800 world")]
+    assert detector.detect_language("\udc00日本") == "ja"
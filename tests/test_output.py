@@ -79,3 +79,232 @@ def test_invalid_format():
         assert False, "Should raise ValueError for invalid format"
     except ValueError as e:
         assert "Unsupported format" in str(e)
+
+def test_merge_segments_exact_layout():
+    """Test that segments are copied in order with exactly one silence gap between them."""
+    import numpy as np
+    manager = OutputManager()
+
+    segment1 = np.full(100, 1000, dtype=np.int16).tobytes()
+    segment2 = np.full(50, -2000, dtype=np.int16).tobytes()
+    merged = manager.merge_segments_array([segment1, segment2])
+
+    gap = 16000 * 500 // 1000
+    assert merged.dtype == np.int16
+    assert len(merged) == 100 + gap + 50
+    assert (merged[:100] == 1000).all()
+    assert (merged[100:100 + gap] == 0).all()
+    assert (merged[100 + gap:] == -2000).all()
+    assert manager.merge_segments([segment1, segment2]) == merged.tobytes()
+
+def test_merge_segments_empty():
+    """Test merging of no segments and of a single segment."""
+    manager = OutputManager()
+    segment = create_test_pcm(100)
+    assert manager.merge_segments([]) == b""
+    assert manager.merge_segments([segment]) == segment
+
+def test_wav_sink_patches_sizes_on_close():
+    """Test that the streaming WAV sink produces a valid file identical to the merged audio."""
+    manager = OutputManager()
+    segment1 = create_test_pcm(500)
+    segment2 = create_test_pcm(300, freq=660)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        wav_path = os.path.join(temp_dir, "test.wav")
+        with manager.open_sink(wav_path, "wav") as sink:
+            sink.write(segment1)
+            sink.write_silence(manager.silence_ms)
+            sink.write(segment2)
+
+        with wave.open(wav_path, 'rb') as wf:
+            assert wf.getnchannels() == 1
+            assert wf.getsampwidth() == 2
+            assert wf.getframerate() == 16000
+            assert wf.readframes(wf.getnframes()) == manager.merge_segments([segment1, segment2])
+        assert os.path.getsize(wav_path) == 44 + len(manager.merge_segments([segment1, segment2]))
+
+def test_wav_sink_abort_removes_partial_file():
+    """Test that aborting a sink (e.g. on a synthesis error) leaves no partial file."""
+    manager = OutputManager()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        wav_path = os.path.join(temp_dir, "test.wav")
+        try:
+            with manager.open_sink(wav_path, "wav") as sink:
+                sink.write(create_test_pcm(100))
+                raise RuntimeError("synthesis failed")
+        except RuntimeError:
+            pass
+        assert not os.path.exists(wav_path)
+
+def test_wav_sink_fails_as_soon_as_it_outgrows_the_format(monkeypatch):
+    """Test that a write past the 32-bit WAV size limit fails instead of the final close."""
+    import io
+    import pytest
+    from src.output import sink as sink_module
+    from src.speech.exceptions import TTSError
+    monkeypatch.setattr(sink_module, "WAV_MAX_DATA_SIZE", 3000)
+
+    sink = OutputManager().open_sink(io.BytesIO(), "wav")
+    sink.write(create_test_pcm(50))  # 1600 bytes
+    with pytest.raises(TTSError):
+        sink.write(create_test_pcm(50))
+    assert sink.bytes_written == 1600
+
+def test_open_sink_invalid_format():
+    """Test error handling for invalid sink formats."""
+    manager = OutputManager()
+    try:
+        manager.open_sink("test.invalid", "invalid")
+        assert False, "Should raise ValueError for invalid format"
+    except ValueError as e:
+        assert "Unsupported format" in str(e)
+
+def test_flac_export_round_trips():
+    """Test that FLAC export is lossless."""
+    import soundfile
+    manager = OutputManager()
+    audio_data = create_test_pcm(500)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        flac_path = os.path.join(temp_dir, "test.flac")
+        manager.export_audio(audio_data, flac_path, "flac")
+
+        samples, sample_rate = soundfile.read(flac_path, dtype="int16")
+        assert sample_rate == 16000
+        assert samples.tobytes() == audio_data
+
+def test_encoder_pool_metrics():
+    """Test that the encoder pool runs tasks and reports queue depth and throughput."""
+    from src.output.encoder import EncoderPool
+    pool = EncoderPool(max_workers=2)
+
+    assert pool.submit(sum, [1, 2, 3], audio_seconds=1.5).result() == 6
+    stats = pool.stats()
+    assert stats["workers"] == 2
+    assert stats["queue_depth"] == 0
+    assert stats["active"] == 0
+    assert stats["tasks"] == 1
+    assert stats["audio_seconds"] == 1.5
+    assert stats["encode_seconds_per_audio_second"] == stats["encode_seconds"] / 1.5
+
+def test_postprocessor_trims_edge_silence():
+    """Test that leading and trailing silence is trimmed down to the padding."""
+    import numpy as np
+    from src.output.postprocess import PostProcessor
+    processor = PostProcessor(padding_ms=0, max_gain_db=0)
+
+    tone = np.frombuffer(create_test_pcm(200), dtype=np.int16)
+    segment = np.concatenate([np.zeros(3200, np.int16), tone, np.zeros(4800, np.int16)])
+    processed = processor.process(segment.tobytes())
+
+    frame_size = 16000 * processor.frame_ms // 1000
+    assert len(tone) <= len(processed) < len(tone) + 2 * frame_size
+    assert processor.process(bytes(3200)).size == 0
+
+def test_postprocessor_levels_segments_to_target():
+    """Test that quiet and loud segments end up at the same RMS level."""
+    import numpy as np
+    from src.output.postprocess import PostProcessor
+    processor = PostProcessor(target_dbfs=-20.0)
+
+    loud = np.frombuffer(create_test_pcm(500), dtype=np.int16)
+    quiet = (loud // 8).astype(np.int16)
+
+    def rms_dbfs(samples):
+        return 20 * np.log10(np.sqrt(np.mean(samples.astype(np.float64) ** 2)) / 32768)
+
+    assert abs(rms_dbfs(processor.process(loud.tobytes())) + 20.0) < 0.5
+    assert abs(rms_dbfs(processor.process(quiet.tobytes())) + 20.0) < 0.5
+
+def test_postprocessor_stream_trims_and_levels_chunks():
+    """Test that a segment processed chunk by chunk is trimmed at the start and levelled."""
+    import numpy as np
+    from src.output.postprocess import PostProcessor
+    processor = PostProcessor(target_dbfs=-20.0)
+
+    quiet = (np.frombuffer(create_test_pcm(500), dtype=np.int16) // 8).astype(np.int16)
+    segment = np.concatenate([np.zeros(4000, np.int16), quiet, np.zeros(1600, np.int16)])
+    stream = processor.stream(16000)
+    chunks = [stream.process(segment[i:i + 1000].tobytes()) for i in range(0, len(segment), 1000)]
+
+    # The silent chunks yield nothing; the first loud one starts at most padding + a frame early
+    assert [chunk.size for chunk in chunks[:4]] == [0, 0, 0, 0]
+    streamed = np.concatenate(chunks)
+    padding, frame_size = 16000 * processor.padding_ms // 1000, 16000 * processor.frame_ms // 1000
+    assert len(quiet) + 1600 <= len(streamed) <= len(quiet) + 1600 + padding + frame_size
+    # About the gain of the whole-segment processing; the trailing silence is kept
+    processed = processor.process(segment.tobytes())
+    assert stream.gain > 1
+    assert np.array_equal(streamed[-1600:], np.zeros(1600, np.int16))
+    assert abs(20 * np.log10(np.abs(streamed).max() / np.abs(processed).max())) < 1.0
+    assert processor.stream(16000).process(bytes(3200)).size == 0
+
+def test_gap_policy():
+    """Test that pauses follow punctuation and language changes."""
+    from src.output.postprocess import GapPolicy
+    policy = GapPolicy(sentence_gap_ms=500, clause_gap_ms=250, continuation_gap_ms=100, language_change_gap_ms=150)
+
+    assert policy.gap_ms("Hello.", "en", "en") == 500
+    assert policy.gap_ms("こんにちは。", "ja", "en") == 650
+    assert policy.gap_ms("Well,", "en", "en") == 250
+    assert policy.gap_ms("I like", "en", "ja") == 250
+
+def test_resample_preserves_tone_and_length():
+    """Test resampling to lower and higher rates keeps the signal and the duration."""
+    import numpy as np
+    from src.output.resample import resample
+    tone = (np.sin(2 * np.pi * 1000 * np.arange(16000) / 16000) * 10000).astype(np.int16)
+
+    for rate in (8000, 24000, 44100):
+        resampled = resample(tone.tobytes(), 16000, rate)
+        assert len(resampled) == len(tone) * rate // 16000
+        t = np.arange(len(resampled)) / rate
+        expected = np.sin(2 * np.pi * 1000 * t) * 10000
+        middle = slice(len(resampled) // 4, 3 * len(resampled) // 4)
+        assert np.abs(resampled[middle] - expected[middle]).max() < 20
+
+def test_resampler_chunked_matches_whole():
+    """Test that feeding a resampler in chunks gives the same output as one call."""
+    import numpy as np
+    from src.output.resample import Resampler, resample
+    audio_data = create_test_pcm(500)
+
+    resampler = Resampler(24000, 16000)
+    chunks = [resampler.process(audio_data[i:i + 1000]) for i in range(0, len(audio_data), 1000)]
+    chunks.append(resampler.flush())
+    assert np.array_equal(np.concatenate(chunks), resample(audio_data, 24000, 16000))
+
+def test_mp3_parts_are_cached_and_concatenated():
+    """Test that an mp3 assembled from cached parts decodes to every part's audio."""
+    import io
+    import soundfile
+    from src.cache import MemoryLRUCache, TwoTierCache
+    from src.output.sink import Mp3PartSink
+    cache = TwoTierCache(MemoryLRUCache(1024 * 1024))
+    segment = create_test_pcm(500)
+
+    def render():
+        output = io.BytesIO()
+        with Mp3PartSink(output, cache) as sink:
+            sink.write(segment)
+            sink.write_silence(200)
+            sink.write(segment)
+            sink.write_silence(200)
+            sink.write(segment)
+        return output.getvalue()
+
+    first = render()
+    assert cache.stats()["hits"] == 0 and cache.stats()["misses"] == 3
+    # The same audio again is assembled from cached parts without encoding
+    assert render() == first
+    assert cache.stats()["hits"] == 3 and cache.stats()["misses"] == 3
+    # One Xing frame describes the whole file
+    assert first.count(b"Xing") == 1
+
+    samples, sample_rate = soundfile.read(io.BytesIO(first), dtype="int16")
+    assert sample_rate == 16000
+    # The pauses absorb the encoder delay and padding of each part; only the last part's remains
+    expected = (3 * 500 + 2 * 200) * 16
+    assert expected <= len(samples) <= expected + 1700
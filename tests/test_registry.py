@@ -0,0 +1,14 @@
+import pytest
+from src.registry import AgentRegistry
+
+def test_registry_reuses_agents():
+    registry = AgentRegistry()
+    agent = registry.get("aws_polly")
+    assert registry.get("aws_polly") is agent
+    assert registry.agents() == {"aws_polly": agent}
+
+def test_registry_invalid_service():
+    registry = AgentRegistry()
+    with pytest.raises(ValueError):
+        registry.get("invalid_service")
+    assert registry.agents() == {}
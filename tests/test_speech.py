@@ -104,3 +104,473 @@ def test_speech_service_error_propagation():
     with pytest.raises(TTSInvalidInputError) as exc:
         service.synthesize_segment("test", "en")
     assert "aws_polly: Test error" in str(exc.value)
+
+def test_speech_service_concurrent_preserves_order():
+    import threading
+    import time
+
+    config = Config()
+    config.tts_service = "aws_polly"
+    config.max_workers = 4
+
+    service = SpeechService(config)
+    mock_service = MockTTSService(config)
+    service.tts_service = mock_service
+
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def slow_synthesize(language, text, voice_id=None):
+        with lock:
+            active.append(text)
+            peak.append(len(active))
+        # Earlier segments finish last to make out-of-order completion likely
+        time.sleep(0.05 * (4 - int(text)))
+        with lock:
+            active.remove(text)
+        return text.encode()
+
+    mock_service.synthesize = slow_synthesize
+    results = service.synthesize_all([("en", "0"), ("ja", "1"), ("en", "2"), ("ja", "3")])
+
+    assert results == [b"0", b"1", b"2", b"3"]
+    assert max(peak) > 1
+
+def test_speech_service_concurrent_requests_share_the_provider_pool():
+    import threading
+    import time
+
+    config = Config()
+    config.tts_service = "aws_polly"
+    config.max_workers = 2
+
+    service = SpeechService(config)
+    mock_service = MockTTSService(config)
+    service.tts_service = mock_service
+
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def slow_synthesize(language, text, voice_id=None):
+        with lock:
+            active.append(text)
+            peak.append(len(active))
+        time.sleep(0.1)
+        with lock:
+            active.remove(text)
+        return text.encode()
+
+    mock_service.synthesize = slow_synthesize
+    requests = [
+        threading.Thread(target=service.synthesize_all, args=([("en", f"{i}a"), ("en", f"{i}b")],))
+        for i in range(4)
+    ]
+    for request in requests:
+        request.start()
+    for request in requests:
+        request.join()
+
+    # max_workers bounds each request, not the process
+    assert max(peak) > config.max_workers
+
+def test_speech_service_concurrent_error_names_segment():
+    config = Config()
+    config.tts_service = "aws_polly"
+    config.max_workers = 4
+
+    service = SpeechService(config)
+    mock_service = MockTTSService(config)
+    service.tts_service = mock_service
+
+    def failing_synthesize(language, text, voice_id=None):
+        if text == "broken":
+            raise TTSSynthesisError("Test error")
+        return text.encode()
+
+    mock_service.synthesize = failing_synthesize
+    with pytest.raises(TTSSynthesisError) as exc:
+        service.synthesize_all([("en", "fine"), ("en", "broken"), ("ja", "also fine")])
+    assert "Error in segment 'broken...'" in str(exc.value)
+
+def test_speech_service_iter_synthesize_all_stays_within_window():
+    config = Config()
+    config.tts_service = "aws_polly"
+    config.max_workers = 2
+
+    service = SpeechService(config)
+    mock_service = MockTTSService(config)
+    service.tts_service = mock_service
+
+    started = []
+
+    def recording_synthesize(language, text, voice_id=None):
+        started.append(text)
+        return text.encode()
+
+    mock_service.synthesize = recording_synthesize
+    segments = service.iter_synthesize_all([("en", str(i)) for i in range(6)])
+
+    assert next(segments) == b"0"
+    # The first segment plus at most max_workers segments ahead of the consumer
+    assert len(started) <= 3
+    assert list(segments) == [b"1", b"2", b"3", b"4", b"5"]
+
+def test_speech_service_async_preserves_order():
+    import asyncio
+    import time
+
+    config = Config()
+    config.tts_service = "aws_polly"
+    config.english_voice_id = "en-voice-4"
+    config.japanese_voice_id = "ja-voice-4"
+    config.max_workers = 4
+
+    service = SpeechService(config)
+    mock_service = MockTTSService(config)
+    service.tts_service = mock_service
+
+    def slow_synthesize(language, text, voice_id=None):
+        time.sleep(0.05)
+        return f"{language}:{text}:{voice_id}".encode()
+
+    mock_service.synthesize = slow_synthesize
+    segments = [("en", "Hello"), ("ja", "Konnichiwa"), ("en", "World"), ("ja", "Sekai")]
+
+    start = time.perf_counter()
+    results = asyncio.run(service.asynthesize_all(segments))
+    elapsed = time.perf_counter() - start
+
+    assert results == [
+        b"en:Hello:en-voice-4",
+        b"ja:Konnichiwa:ja-voice-4",
+        b"en:World:en-voice-4",
+        b"ja:Sekai:ja-voice-4",
+    ]
+    # All four calls overlap instead of running back to back
+    assert elapsed < 0.15
+
+def test_speech_service_async_native_backend_and_errors():
+    import asyncio
+    from src.speech.tts_service import AsyncTTSService
+
+    config = Config()
+    config.tts_service = "aws_polly"
+
+    class NativeAsyncService(AsyncTTSService):
+        async def synthesize(self, language, text, voice_id=None):
+            if text == "broken":
+                raise TTSConnectionError("Test error")
+            await asyncio.sleep(0)
+            return text.encode()
+
+    service = SpeechService(config)
+    service.async_tts_service = NativeAsyncService()
+
+    assert asyncio.run(service.asynthesize_segment("Hello", "en")) == b"Hello"
+    with pytest.raises(TTSConnectionError) as exc:
+        asyncio.run(service.asynthesize_all([("en", "ok"), ("en", "broken")]))
+    assert "Error in segment 'broken...'" in str(exc.value)
+    assert "aws_polly: Test error" in str(exc.value)
+
+def test_speech_service_chunk_stream_stays_within_window():
+    import asyncio
+    from src.speech import service as service_module
+    from src.speech.tts_service import AsyncTTSService
+
+    config = Config()
+    config.tts_service = "aws_polly"
+    config.max_workers = 2
+    config.cache_enabled = False
+
+    started = []
+    produced = []
+
+    class ChunkedService(AsyncTTSService):
+        async def synthesize(self, language, text, voice_id=None):
+            return b"".join([chunk async for chunk in self.synthesize_stream(language, text, voice_id)])
+
+        async def synthesize_stream(self, language, text, voice_id=None, chunk_size=2):
+            started.append(text)
+            for i in range(100):
+                produced.append(text)
+                yield f"{text}{i}".encode()
+
+    service = SpeechService(config)
+    service.async_tts_service = ChunkedService()
+
+    async def consume():
+        chunks = service.aiter_synthesize_all_chunks([("en", str(i)) for i in range(5)])
+        assert await chunks.__anext__() == (0, b"00")
+        for _ in range(5):
+            await asyncio.sleep(0)
+        # Only the window's segments have started, and the one waiting buffers a bounded number of chunks
+        assert started == ["0", "1"]
+        assert produced.count("1") <= service_module.STREAM_QUEUE_CHUNKS + 1
+        rest = [item async for item in chunks]
+        assert [index for index, _ in rest] == [0] * 99 + [i for i in range(1, 5) for _ in range(100)]
+
+    asyncio.run(consume())
+
+def test_threaded_stream_reads_no_faster_than_the_consumer():
+    import asyncio
+    import threading
+    from src.speech.tts_service import STREAM_READ_AHEAD_CHUNKS, ThreadedAsyncTTSService
+
+    read = []
+    finished = threading.Event()
+
+    class BlockingStreamService(MockTTSService):
+        def synthesize_stream(self, language, text, voice_id=None, chunk_size=8192):
+            try:
+                for i in range(100):
+                    read.append(i)
+                    yield bytes(chunk_size)
+            finally:
+                finished.set()
+
+    async def consume():
+        chunks = ThreadedAsyncTTSService(BlockingStreamService(None)).synthesize_stream("en", "text")
+        await chunks.__anext__()
+        await asyncio.sleep(0.2)
+        # The chunk handed out, a full queue and the one the producer is blocked on
+        assert len(read) <= STREAM_READ_AHEAD_CHUNKS + 2
+        # Closing the stream unblocks the producer, which stops reading the provider
+        await chunks.aclose()
+        assert await asyncio.get_running_loop().run_in_executor(None, finished.wait, 2)
+        assert len(read) <= STREAM_READ_AHEAD_CHUNKS + 3
+
+    asyncio.run(consume())
+
+def test_speech_service_per_call_voices():
+    config = Config()
+    config.tts_service = "aws_polly"
+    config.english_voice_id = "en-voice-5"
+    config.japanese_voice_id = "ja-voice-5"
+
+    service = SpeechService(config)
+    service.tts_service = MockTTSService(config)
+
+    segments = [("en", "Hello"), ("ja", "Konnichiwa")]
+    assert service.synthesize_all(segments, english_voice_id="Matthew") == [
+        b"en:Hello:Matthew",
+        b"ja:Konnichiwa:ja-voice-5",
+    ]
+    assert service.synthesize_all(segments, japanese_voice_id="Kazuha") == [
+        b"en:Hello:en-voice-5",
+        b"ja:Konnichiwa:Kazuha",
+    ]
+
+def test_speech_service_single_flight_coalesces_identical_requests():
+    import threading
+    import time
+
+    config = Config()
+    config.tts_service = "aws_polly"
+    config.cache_enabled = False
+
+    service = SpeechService(config)
+    mock_service = MockTTSService(config)
+    service.tts_service = mock_service
+
+    calls = []
+    started = threading.Event()
+
+    def slow_synthesize(language, text, voice_id=None):
+        calls.append(text)
+        started.set()
+        time.sleep(0.1)
+        return text.encode()
+
+    mock_service.synthesize = slow_synthesize
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(service.synthesize_segment("Hello", "en", "Joanna")))
+    leader.start()
+    started.wait()
+    followers = [
+        threading.Thread(target=lambda: results.append(service.synthesize_segment("Hello", "en", "Joanna")))
+        for _ in range(5)
+    ]
+    for thread in followers:
+        thread.start()
+    for thread in [leader] + followers:
+        thread.join()
+
+    assert results == [b"Hello"] * 6
+    assert calls == ["Hello"]
+    assert service.single_flight_stats() == {"calls": 1, "coalesced": 5}
+
+def test_speech_service_single_flight_async():
+    import asyncio
+    from src.speech.tts_service import AsyncTTSService
+
+    config = Config()
+    config.tts_service = "aws_polly"
+    config.cache_enabled = False
+    calls = []
+
+    class NativeAsyncService(AsyncTTSService):
+        async def synthesize(self, language, text, voice_id=None):
+            calls.append(text)
+            await asyncio.sleep(0.05)
+            return text.encode()
+
+    service = SpeechService(config)
+    service.async_tts_service = NativeAsyncService()
+
+    async def burst():
+        return await asyncio.gather(*[service.asynthesize_segment("Hello", "en") for _ in range(5)])
+
+    assert asyncio.run(burst()) == [b"Hello"] * 5
+    assert calls == ["Hello"]
+    assert service.single_flight_stats() == {"calls": 1, "coalesced": 4}
+
+def test_aws_polly_streams_audio_in_chunks():
+    import io
+    from botocore.response import StreamingBody
+    from src.speech.aws_polly_service import AWSPollyService
+
+    config = Config()
+    polly = AWSPollyService(config)
+    audio = bytes(range(256)) * 40
+    polly.polly_client = MagicMock()
+    polly.polly_client.synthesize_speech.return_value = {
+        "AudioStream": StreamingBody(io.BytesIO(audio), len(audio))
+    }
+
+    chunks = list(polly.synthesize_stream("en", "Hello", "Joanna", chunk_size=4096))
+    assert [len(chunk) for chunk in chunks] == [4096, 4096, 2048]
+    assert b"".join(chunks) == audio
+
+def test_speech_service_segment_stream_fills_cache():
+    import asyncio
+
+    config = Config()
+    config.tts_service = "aws_polly"
+
+    class ChunkedTTSService:
+        calls = 0
+
+        def synthesize(self, language, text, voice_id=None):
+            raise AssertionError("streaming should not fall back to synthesize")
+
+        def synthesize_stream(self, language, text, voice_id=None, chunk_size=8192):
+            self.calls += 1
+            yield b"ab"
+            yield b"cd"
+
+    service = SpeechService(config)
+    service.tts_service = ChunkedTTSService()
+
+    async def collect():
+        return [chunk async for chunk in service.asynthesize_segment_stream("Hello", "en", "Joanna")]
+
+    assert asyncio.run(collect()) == [b"ab", b"cd"]
+    # The assembled segment was cached, so the next request is served in one chunk
+    assert list(service.synthesize_segment_stream("Hello", "en", "Joanna")) == [b"abcd"]
+    assert service.tts_service.calls == 1
+
+def test_local_synthetic_service():
+    import asyncio
+
+    config = Config()
+    config.tts_service = "local_synthetic"
+    config.synthetic_latency_ms = 0
+    config.synthetic_ms_per_char = 100
+    service = SpeechService(config)
+
+    audio = service.synthesize_segment("Hello", "en", "synthetic-en-1")
+    assert len(audio) == 5 * 1600 * 2  # 100ms of 16kHz 16-bit audio per character
+    assert audio == service.tts_service.render("en", "Hello", "synthetic-en-1")  # deterministic
+    assert audio != service.tts_service.render("en", "Hello", "synthetic-en-2")
+    assert asyncio.run(service.asynthesize_all([("en", "Hello")])) == [
+        service.tts_service.render("en", "Hello", config.english_voice_id)
+    ]
+
+    with pytest.raises(TTSInvalidInputError):
+        service.synthesize_segment("  ", "en")
+
+def test_local_synthetic_service_simulated_errors():
+    config = Config()
+    config.tts_service = "local_synthetic"
+    config.synthetic_latency_ms = 0
+    config.synthetic_error_rate = 1.0
+    config.max_retries = 0
+    service = SpeechService(config)
+
+    with pytest.raises(TTSSynthesisError) as exc:
+        service.synthesize_segment("Hello", "en")
+    assert "Simulated service error" in str(exc.value)
+
+def test_ssml_fragment_escapes_text():
+    import xml.etree.ElementTree as ElementTree
+    from src.speech.ssml import speak, ssml_fragment
+
+    text = 'Tom & "Jerry" <b>say</b> ]]> hi\x07'
+    document = speak([ssml_fragment("voice", "ja", text, 'a"<voice>', 250)])
+    root = ElementTree.fromstring(document)
+
+    pause, voice = list(root)
+    assert pause.tag == "break" and pause.get("time") == "250ms"
+    assert voice.get("name") == 'a"<voice>'
+    lang = voice.find("lang")
+    assert lang.get("{http://www.w3.org/XML/1998/namespace}lang") == "ja-JP"
+    assert lang.text == 'Tom & "Jerry" <b>say</b> ]]> hi'
+
+def test_speech_service_batches_segments_into_ssml():
+    from src.speech.ssml import SSML
+
+    config = Config()
+    config.tts_service = "aws_polly"
+    config.english_voice_id = "en-voice"
+    config.japanese_voice_id = "ja-voice"
+    config.ssml_batching = True
+    service = SpeechService(config)
+    service.tts_service = MockTTSService(config)
+    segments = [("en", "Hello."), ("ja", "こんにちは。"), ("en", "Bye.")]
+    gaps = [0, 500, 500]
+
+    # Without SSML support every segment is a request
+    assert service.batch_segments(segments, gaps) == [(0, "en", "Hello."), (1, "ja", "こんにちは。"), (2, "en", "Bye.")]
+
+    # Voice switching: one request, with the pauses as breaks
+    service.tts_service.ssml_mode = "voice"
+    [(index, language, document)] = service.batch_segments(segments, gaps)
+    assert (index, language) == (0, SSML)
+    assert document.count('<break time="500ms"/>') == 2
+    assert '<voice name="ja-voice">' in document
+
+    # The latency policy keeps the first segment on its own; the length limit splits batches
+    assert [request[:2] for request in service.batch_segments(segments, gaps, separate_first=True)] == [
+        (0, "en"), (1, SSML)
+    ]
+    assert [request[:2] for request in service.batch_segments(segments, gaps, max_length=200)] == [
+        (0, SSML), (2, "en")
+    ]
+
+    # One voice per request: different voices fall back to a request per segment,
+    # a voice reading both languages is batched with <lang> tags
+    service.tts_service.ssml_mode = "lang"
+    assert [request[1] for request in service.batch_segments(segments, gaps)] == ["en", "ja", "en"]
+    [(_, language, document)] = service.batch_segments(segments, gaps, "both", "both")
+    assert language == SSML and '<lang xml:lang="ja-JP">' in document and "<voice" not in document
+
+    service.ssml_batching = False
+    assert len(service.batch_segments(segments, gaps)) == 3
+
+def test_aws_polly_sends_ssml_requests():
+    import io
+    from botocore.response import StreamingBody
+    from src.speech.aws_polly_service import AWSPollyService
+    from src.speech.ssml import SSML
+
+    polly = AWSPollyService(Config())
+    polly.polly_client = MagicMock()
+    polly.polly_client.synthesize_speech.return_value = {"AudioStream": StreamingBody(io.BytesIO(b"ab"), 2)}
+
+    polly.synthesize(SSML, "<speak>Hello</speak>", "Joanna")
+    assert polly.polly_client.synthesize_speech.call_args.kwargs["TextType"] == "ssml"
+    polly.synthesize("en", "Hello", "Joanna")
+    assert polly.polly_client.synthesize_speech.call_args.kwargs["TextType"] == "text"
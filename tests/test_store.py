@@ -0,0 +1,187 @@
+import os
+import tempfile
+import time
+import pytest
+from src.output.store import DiskAudioStore, MemoryAudioStore
+
+def test_memory_store_serves_and_deletes():
+    store = MemoryAudioStore(max_bytes=100, ttl_seconds=60)
+    with store.writer("req", "output.mp3") as output:
+        output.write(b"audio")
+
+    audio = store.get("req", "output.mp3")
+    assert audio.data == b"audio"
+    assert audio.path is None
+    assert audio.media_type == "audio/mpeg"
+    assert store.get("req", "output.wav") is None
+
+    assert store.delete("req")
+    assert store.get("req", "output.mp3") is None
+    assert not store.delete("req")
+
+def test_memory_store_evicts_oldest_over_limit():
+    store = MemoryAudioStore(max_bytes=10, ttl_seconds=60)
+    store.put("a", "output.wav", b"aaaa")
+    store.put("b", "output.wav", b"bbbb")
+    store.put("c", "output.wav", b"cccc")
+
+    assert store.get("a", "output.wav") is None
+    assert store.get("b", "output.wav").data == b"bbbb"
+    assert store.current_bytes == 8
+    with pytest.raises(ValueError):
+        store.put("big", "output.wav", b"x" * 11)
+
+def test_memory_store_expires_entries():
+    store = MemoryAudioStore(max_bytes=100, ttl_seconds=0.05)
+    store.put("a", "output.wav", b"aaaa")
+    time.sleep(0.1)
+
+    assert store.get("a", "output.wav") is None
+    assert store.purge_expired() == 1
+    assert store.current_bytes == 0
+
+def test_memory_store_discards_failed_writes():
+    store = MemoryAudioStore(max_bytes=100, ttl_seconds=60)
+    with pytest.raises(RuntimeError):
+        with store.writer("req", "output.wav") as output:
+            output.write(b"partial")
+            raise RuntimeError("synthesis failed")
+    assert store.get("req", "output.wav") is None
+
+def test_memory_store_fails_writes_as_soon_as_they_exceed_the_limit():
+    store = MemoryAudioStore(max_bytes=10, ttl_seconds=60)
+    with pytest.raises(ValueError):
+        with store.writer("req", "output.wav") as output:
+            output.write(b"x" * 8)
+            output.write(b"x" * 8)
+            pytest.fail("the write past the limit should have raised")
+    assert store.get("req", "output.wav") is None
+
+def test_memory_store_spills_large_entries_while_writing():
+    with tempfile.TemporaryDirectory() as directory:
+        disk = DiskAudioStore(directory, ttl_seconds=60)
+        store = MemoryAudioStore(max_bytes=100, ttl_seconds=60, spill_store=disk, spill_bytes=10)
+        with store.writer("small", "output.wav") as output:
+            output.write(b"audio")
+        with store.writer("big", "output.wav") as output:
+            output.write(b"RIFF0000")
+            output.write(b"x" * 20)
+            assert disk.stats()["entries"] == 0
+            # Patching the header after the spill still lands at the right offset
+            output.seek(4)
+            output.write(b"1234")
+
+        assert store.get("small", "output.wav").data == b"audio"
+        audio = store.get("big", "output.wav")
+        assert audio.data is None
+        with open(audio.path, "rb") as file:
+            assert file.read() == b"RIFF1234" + b"x" * 20
+        assert store.current_bytes == 5
+        assert store.stats()["spilled_entries"] == 1
+
+        with pytest.raises(RuntimeError):
+            with store.writer("failed", "output.wav") as output:
+                output.write(b"x" * 20)
+                raise RuntimeError("synthesis failed")
+        assert store.get("failed", "output.wav") is None
+
+        assert store.delete("big")
+        assert store.get("big", "output.wav") is None
+
+def test_async_writer_finalizes_off_the_event_loop():
+    import asyncio
+    import threading
+
+    store = MemoryAudioStore(max_bytes=100, ttl_seconds=60)
+    put = store.put
+    threads = []
+
+    def recording_put(*args):
+        threads.append(threading.get_ident())
+        put(*args)
+
+    store.put = recording_put
+
+    async def write():
+        async with store.awriter("req", "output.wav") as output:
+            output.write(b"audio")
+        with pytest.raises(RuntimeError):
+            async with store.awriter("failed", "output.wav") as output:
+                output.write(b"partial")
+                raise RuntimeError("synthesis failed")
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(write())
+    assert threads and loop_thread not in threads
+    assert store.get("req", "output.wav").data == b"audio"
+    assert store.get("failed", "output.wav") is None
+
+def test_disk_store_round_trip():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        store = DiskAudioStore(temp_dir, ttl_seconds=60)
+        with store.writer("req", "output.wav") as output:
+            output.write(b"audio")
+
+        audio = store.get("req", "output.wav")
+        with open(audio.path, "rb") as f:
+            assert f.read() == b"audio"
+        assert os.listdir(os.path.join(temp_dir, "req")) == ["output.wav"]
+
+        assert store.get("..", "output.wav") is None
+        assert store.delete("req")
+        assert not os.path.exists(os.path.join(temp_dir, "req"))
+
+def test_disk_store_purges_only_expired_entries():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        store = DiskAudioStore(temp_dir, ttl_seconds=0.05)
+        with store.writer("old", "output.wav") as output:
+            output.write(b"x" * 10)
+        time.sleep(0.1)
+        store.ttl_seconds = 60
+        with store.writer("new", "output.wav") as output:
+            output.write(b"y" * 20)
+
+        assert store.purge_expired() == 1
+        assert sorted(os.listdir(temp_dir)) == ["new"]
+        stats = store.stats()
+        assert stats["expired"] == 1
+        assert stats["bytes_reclaimed"] == 10
+        assert stats["entries"] == 1
+        assert stats["bytes"] == 20
+
+def test_disk_store_enforces_quota():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        store = DiskAudioStore(temp_dir, ttl_seconds=60, max_bytes=25)
+        for request_id in ("a", "b", "c"):
+            with store.writer(request_id, "output.wav") as output:
+                output.write(b"x" * 10)
+
+        assert store.get("a", "output.wav") is None
+        assert store.get("c", "output.wav") is not None
+        assert sorted(os.listdir(temp_dir)) == ["b", "c"]
+        assert store.stats()["evicted"] == 1
+
+def test_disk_store_indexes_existing_files():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        with DiskAudioStore(temp_dir, ttl_seconds=60).writer("req", "output.wav") as output:
+            output.write(b"audio")
+
+        store = DiskAudioStore(temp_dir, ttl_seconds=60)
+        assert store.get("req", "output.wav") is not None
+        assert store.stats()["bytes"] == 5
+
+def test_stores_tag_audio_by_content():
+    memory = MemoryAudioStore(max_bytes=100, ttl_seconds=60)
+    memory.put("a", "output.wav", b"audio")
+    memory.put("b", "output.wav", b"audio")
+    memory.put("c", "output.wav", b"other")
+    etag = memory.get("a", "output.wav").etag
+    assert etag.startswith('"') and memory.get("a", "output.wav").size == 5
+    assert memory.get("b", "output.wav").etag == etag
+    assert memory.get("c", "output.wav").etag != etag
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        with DiskAudioStore(temp_dir, ttl_seconds=60).writer("req", "output.wav") as output:
+            output.write(b"audio")
+        # Also for files indexed from a previous run
+        assert DiskAudioStore(temp_dir, ttl_seconds=60).get("req", "output.wav").etag == etag
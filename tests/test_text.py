@@ -1,4 +1,6 @@
+import pytest
 from src.text.parser import TextParser
+from src.text.planner import ChunkPlanner
 from src.text.segmenter import TextSegmenter
 
 def test_parser_whitespace():
@@ -62,3 +64,93 @@ def test_segmenter_empty_text():
     segments = segmenter.segment_by_sentence("")
     assert len(segments) == 1
     assert segments[0] == ""
+
+def test_segmenter_japanese_sentences():
+    """Test that Japanese sentence ends split sentences too."""
+    segmenter = TextSegmenter()
+    segments = segmenter.segment_by_sentence("こんにちは。「はい。」と言った。元気ですか？ Hello there.")
+    assert segments == ["こんにちは。", "「はい。」と言った。", "元気ですか？", "Hello there."]
+
+def test_planner_throughput_packs_sentences_within_limit():
+    """Test that the throughput policy packs whole sentences up to the provider limit."""
+    planner = ChunkPlanner(TextSegmenter(), max_length=60)
+    text = " ".join(f"This is sentence {i}." for i in range(10))
+    chunks = planner.plan([("en", text), ("ja", "短い。"), ("ja", "文です。")])
+
+    assert [language for language, _ in chunks] == ["en"] * 4 + ["ja"]
+    assert all(len(chunk) <= 60 for _, chunk in chunks)
+    assert chunks[0][1] == "This is sentence 0. This is sentence 1. This is sentence 2."
+    assert " ".join(chunk for _, chunk in chunks[:4]) == text
+    # Adjacent segments of one language are merged
+    assert chunks[4] == ("ja", "短い。 文です。")
+
+def test_planner_splits_overlong_sentences():
+    """Test that a sentence over the limit is cut at clause marks, or inside words if it has none."""
+    # Limits counted in UTF-8 bytes, as Google does: 3 bytes per kana or kanji
+    planner = ChunkPlanner(TextSegmenter(), max_length=45, length=lambda text: len(text.encode("utf-8")))
+    chunks = planner.plan([("ja", "今日はとても良い天気です、散歩に行きましょう。")])
+    assert chunks == [("ja", "今日はとても良い天気です、"), ("ja", "散歩に行きましょう。")]
+
+    chunks = planner.plan([("ja", "あ" * 25)])
+    assert [len(chunk) for _, chunk in chunks] == [15, 10]
+
+def test_planner_latency_keeps_first_chunk_short():
+    """Test that the latency policy sends a short first chunk, then packs the rest."""
+    planner = ChunkPlanner(TextSegmenter(), max_length=200, policy="latency", first_chunk_length=25)
+    text = " ".join(f"This is sentence {i}." for i in range(10))
+    chunks = planner.plan([("en", text)])
+
+    assert chunks[0] == ("en", "This is sentence 0.")
+    assert len(chunks) == 2
+    assert " ".join(chunk for _, chunk in chunks) == text
+
+    with pytest.raises(ValueError):
+        ChunkPlanner(TextSegmenter(), policy="fastest")
+
+def test_parser_iter_text_matches_preprocess_text(tmp_path):
+    """Streamed text is preprocessed across chunk boundaries exactly like the whole text."""
+    parser = TextParser()
+    text = "  Hello,  World!\n\nこんにちは。  元気\tですか？ \n The end.  "
+    expected = parser.preprocess_text(text)
+
+    encoded = text.encode("utf-8")
+    for size in (1, 2, 3, 5, 64):
+        # Byte chunks split multi-byte characters
+        chunks = [encoded[start:start + size] for start in range(0, len(encoded), size)]
+        assert "".join(parser.iter_text(chunks)) == expected
+
+    path = tmp_path / "text.txt"
+    path.write_bytes(encoded)
+    assert "".join(parser.iter_text(str(path), chunk_size=4)) == expected
+    with open(path, "rb") as f:
+        assert "".join(parser.iter_text(f, chunk_size=7)) == expected
+    assert list(parser.iter_text(["  ", "\n"])) == []
+
+def test_segmenter_iter_sentences_carries_partial_sentences():
+    """Sentences split across chunks come out whole, as if the text were segmented at once."""
+    parser = TextParser()
+    segmenter = TextSegmenter()
+    text = "Dr. Smith arrived at 3 p.m. today. He said hello! こんにちは。元気ですか？ Bye now."
+    chunks = [text[start:start + 6] for start in range(0, len(text), 6)]
+
+    assert list(segmenter.iter_sentences(parser.iter_text(chunks))) == segmenter.segment_by_sentence(text)
+
+    # Text without sentence ends is cut at a space once it grows too long
+    words = ["word"] * 50
+    sentences = list(segmenter.iter_sentences(parser.iter_text(w + " " for w in words), max_partial_length=32))
+    assert all(len(sentence) <= 32 for sentence in sentences)
+    assert " ".join(sentences) == " ".join(words)
+
+def test_planner_plan_stable_keeps_boundaries_around_edits():
+    """An edit only changes the stable chunks near it."""
+    planner = ChunkPlanner(TextSegmenter(), max_length=200)
+    sentences = [f"This is sentence number {number}." for number in range(40)]
+    chunks = planner.plan_stable([("en", " ".join(sentences))])
+    assert " ".join(text for _, text in chunks) == " ".join(sentences)
+    assert 1 < len(chunks) < len(sentences)
+    assert all(len(text) <= 200 for _, text in chunks)
+
+    edited = sentences[:3] + ["A new sentence was inserted here."] + sentences[3:]
+    edited_chunks = planner.plan_stable([("en", " ".join(edited))])
+    unchanged = set(chunks) & set(edited_chunks)
+    assert len(unchanged) >= len(chunks) - 2
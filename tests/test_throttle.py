@@ -0,0 +1,82 @@
+import pytest
+from src.config import Config
+from src.speech.exceptions import TTSInvalidInputError, TTSThrottlingError, TTSServiceUnavailableError
+from src.speech.service import SpeechService
+from src.speech.throttle import RetryBudget, RetryPolicy, TokenBucket
+
+def test_token_bucket_allows_burst_then_spaces_requests():
+    bucket = TokenBucket(rate=10.0, burst=3)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    # Callers beyond the burst queue up 1/rate apart
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+    assert bucket.reserve() == pytest.approx(0.2, abs=0.01)
+
+def test_token_bucket_unlimited():
+    bucket = TokenBucket(rate=0, burst=1)
+    assert all(bucket.reserve() == 0.0 for _ in range(100))
+
+def test_retry_policy_only_retries_transient_errors():
+    policy = RetryPolicy(max_retries=2, base_delay=0.1, max_delay=1.0)
+    assert policy.should_retry(TTSThrottlingError("slow down"), 0)
+    assert policy.should_retry(TTSServiceUnavailableError("503"), 1)
+    assert not policy.should_retry(TTSServiceUnavailableError("503"), 2)
+    assert not policy.should_retry(TTSInvalidInputError("bad text"), 0)
+    assert all(0 <= policy.backoff(attempt) <= min(1.0, 0.1 * 2 ** attempt) for attempt in range(10))
+
+def test_retry_budget_limits_retries():
+    policy = RetryPolicy(max_retries=5, base_delay=0, max_delay=0, budget=RetryBudget(ratio=0.5, max_balance=2))
+    error = TTSThrottlingError("slow down")
+    assert policy.should_retry(error, 0)
+    assert policy.should_retry(error, 0)
+    assert not policy.should_retry(error, 0)
+    policy.record_request()
+    policy.record_request()
+    assert policy.should_retry(error, 0)
+    assert policy.stats() == {"retries": 3, "budget_exhausted": 1}
+
+def test_speech_service_retries_throttled_calls():
+    config = Config()
+    config.tts_service = "aws_polly"
+    config.retry_base_delay = 0.001
+    config.cache_enabled = False
+
+    service = SpeechService(config)
+    attempts = []
+
+    class FlakyTTSService:
+        def synthesize(self, language, text, voice_id=None):
+            attempts.append(text)
+            if len(attempts) < 3:
+                raise TTSThrottlingError("Rate exceeded")
+            return b"audio"
+
+    service.tts_service = FlakyTTSService()
+    assert service.synthesize_segment("Hello", "en") == b"audio"
+    assert len(attempts) == 3
+
+    attempts.clear()
+    service.tts_service = FlakyTTSService()
+    service.retry_policy.max_retries = 1
+    with pytest.raises(TTSThrottlingError) as exc:
+        service.synthesize_segment("Hello again", "en")
+    assert "aws_polly: Rate exceeded" in str(exc.value)
+    assert len(attempts) == 2
+
+def test_aws_polly_maps_throttling_errors():
+    from botocore.exceptions import ClientError, ReadTimeoutError
+    from src.speech.aws_polly_service import AWSPollyService
+
+    polly = AWSPollyService(Config())
+    throttled = ClientError(
+        {"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"},
+         "ResponseMetadata": {"HTTPStatusCode": 400}},
+        "SynthesizeSpeech"
+    )
+    server_error = ClientError(
+        {"Error": {"Code": "ServiceFailureException", "Message": "Internal"},
+         "ResponseMetadata": {"HTTPStatusCode": 500}},
+        "SynthesizeSpeech"
+    )
+    assert isinstance(polly._wrap_error(throttled), TTSThrottlingError)
+    assert isinstance(polly._wrap_error(server_error), TTSServiceUnavailableError)
+    assert isinstance(polly._wrap_error(ReadTimeoutError(endpoint_url="https://polly")), TTSServiceUnavailableError)